@@ -1,22 +1,45 @@
 from flask import Flask, jsonify, request, render_template
 from flask_cors import CORS
-import requests
 import random
 import json
 import openai
 import os
 from dotenv import load_dotenv
 
+from common.http_client import HttpClient
+from common.change_feed import ChangeFeedFollower
+from common.address_stats import AddressStats
+
 load_dotenv()  # This loads environment variables from .env
 
 app = Flask(__name__)
 CORS(app)
 
+# Pooled keep-alive client (with timeouts and retries) for calls to the other services.
+http_client = HttpClient()
+
 # Set your OpenAI API key from environment variables
 openai.api_key = os.environ.get("OPENAI_API_KEY")
 
 # URL of the mempool service (running on port 5000)
-MEMPOOL_URL = "http://localhost:5000/transaction"
+MEMPOOL_BASE_URL = "http://localhost:5000"
+MEMPOOL_URL = f"{MEMPOOL_BASE_URL}/transaction"
+
+# Rolling per-address activity (EWMA amounts, 1m/5m/1h counts and volumes), kept up to
+# date from the mempool change feed so addresses hammering the pool stand out.
+address_stats = AddressStats(max_addresses=int(os.environ.get("ADDRESS_STATS_MAX", 10000)))
+
+# Number of most active addresses included in an analysis.
+TOP_ADDRESSES = 10
+
+def on_mempool_change(event):
+    if event["op"] == "added":
+        address_stats.observe(event["transaction"], event["ts"])
+
+# Statistics only start from the changes seen while the AVS runs; a snapshot carries no
+# arrival times, so resets leave them as they are.
+change_feed = ChangeFeedFollower(MEMPOOL_BASE_URL, lambda transactions: None, on_mempool_change,
+                                 client=http_client).start()
 
 @app.route('/')
 def index():
@@ -25,7 +48,7 @@ def index():
 def fetch_all_transactions():
     """Fetch all transactions from the mempool service."""
     try:
-        response = requests.get(MEMPOOL_URL)
+        response = http_client.get(MEMPOOL_URL)
         if response.ok:
             return response.json()
         else:
@@ -35,7 +58,7 @@ def fetch_all_transactions():
         print("Exception while fetching transactions:", e)
         return []
 
-def simulate_llm_analysis(transactions):
+def simulate_llm_analysis(transactions, active_addresses=()):
     """
     Use OpenAI's ChatCompletion API to analyze blockchain transaction data and provide a risk score.
     
@@ -72,7 +95,8 @@ def simulate_llm_analysis(transactions):
     "  \"explanation\": \"xxx\"\n"
     "}\n"
     "\n"
-    "Transaction data: " + json.dumps(transactions)
+    "Transaction data: " + json.dumps(transactions) + "\n"
+    "Most active addresses over the last hour (count and volume): " + json.dumps(list(active_addresses))
 )
     
     try:
@@ -108,13 +132,48 @@ def avs_analysis():
     """
     transactions = fetch_all_transactions()
     print("Fetched transactions:", json.dumps(transactions, indent=2))
+    active_addresses = address_stats.top("1h", TOP_ADDRESSES)
     
-    analysis_result = simulate_llm_analysis(transactions)
+    analysis_result = simulate_llm_analysis(transactions, active_addresses)
     
     return jsonify({
         "message": "AVS analysis complete.",
         "analysis": analysis_result,
-        "num_transactions": len(transactions)
+        "num_transactions": len(transactions),
+        "active_addresses": active_addresses
+    }), 200
+
+@app.route('/avs/addresses/<address>', methods=['GET'])
+def address_activity(address):
+    """
+    Recent activity of an address over all transaction types, or one with ?type=:
+    EWMA mean and std of amounts, and counts and volumes over 1m, 5m and 1h.
+    """
+    stats = address_stats.lookup(address, request.args.get('type', '*'))
+    if stats is None:
+        return jsonify({"error": "No recent activity for this address"}), 404
+    return jsonify(stats), 200
+
+@app.route('/avs/anomalies', methods=['POST'])
+def anomalies():
+    """
+    Anomaly flags (see AddressStats.flags) for a JSON transaction, or an array of them,
+    against the activity seen so far.
+    """
+    data = request.get_json(silent=True)
+    txs = data if isinstance(data, list) else [data]
+    if not all(isinstance(tx, dict) for tx in txs):
+        return jsonify({"error": "Expected a transaction or an array of transactions"}), 400
+    results = [{"id": tx.get("id"), "flags": address_stats.flags(tx)} for tx in txs]
+    return jsonify(results if isinstance(data, list) else results[0]), 200
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Monitoring counters: HTTP connection reuse and the address statistics."""
+    return jsonify({
+        'http': http_client.stats(),
+        'address_stats': address_stats.stats(),
+        'change_feed_cursor': change_feed.cursor,
     }), 200
 
 if __name__ == '__main__':
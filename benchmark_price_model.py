@@ -0,0 +1,61 @@
+import math
+import random
+import sys
+import time
+
+from common import price_model
+
+# Same constants as the token service.
+INITIAL_LIQUIDITY = 1000000
+TOTAL_CIRCULATION = 1000000
+
+transaction_types = ["buy", "sell", "add_liquidity", "remove_liquidity"]
+
+def create_columns(num_transactions):
+    """Random executed transactions, as (types, amounts) columns."""
+    types = random.choices(transaction_types, weights=[45, 45, 7, 3], k=num_transactions)
+    amounts = [round(random.uniform(1000, 100000), 2) for _ in range(num_transactions)]
+    return types, amounts
+
+def loop_price(types, amounts):
+    """The token dashboard's original per-transaction loop."""
+    liquidity = INITIAL_LIQUIDITY
+    trading_factor = 1.0
+    for tx_type, amt in zip(types, amounts):
+        if tx_type == "add_liquidity":
+            liquidity += amt
+        elif tx_type == "remove_liquidity":
+            liquidity -= amt
+        elif tx_type == "buy":
+            trading_factor *= (1 + 0.01 * (amt / TOTAL_CIRCULATION))
+        elif tx_type == "sell":
+            trading_factor *= (1 - 0.01 * (amt / TOTAL_CIRCULATION))
+    return 1.0 * (liquidity / INITIAL_LIQUIDITY) * trading_factor
+
+def reference_price(types, amounts):
+    """Price with exactly rounded sums of log1p factors, to measure the error of the others."""
+    log_factors = [math.log1p(price_model.trade_change(t, a, TOTAL_CIRCULATION)) for t, a in zip(types, amounts)]
+    liquidity = INITIAL_LIQUIDITY + math.fsum(price_model.liquidity_change(t, a) for t, a in zip(types, amounts))
+    return (liquidity / INITIAL_LIQUIDITY) * math.exp(math.fsum(log_factors))
+
+def timed(label, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<34} {time.perf_counter() - started:8.3f}s")
+    return result
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+    print(f"Benchmarking price computation over {count} executed transactions "
+          f"({'numpy' if price_model.np is not None else 'pure Python'} engine)...")
+    types, amounts = create_columns(count)
+    reference = reference_price(types, amounts)
+
+    loop = timed("original loop (current price)", loop_price, types, amounts)
+    current = timed("price_model.current_price", price_model.current_price,
+                    types, amounts, INITIAL_LIQUIDITY, TOTAL_CIRCULATION)
+    series = timed("price_model.price_series (full)", price_model.price_series,
+                   types, amounts, INITIAL_LIQUIDITY, TOTAL_CIRCULATION)
+
+    for label, value in (("original loop", loop), ("current_price", current), ("price_series[-1]", series[-1])):
+        print(f"{label:<18} price {value:.12g}  relative error {abs(value - reference) / abs(reference):.3e}")
@@ -0,0 +1,243 @@
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+# Sliding windows: name -> (seconds per bucket, number of buckets). A window's count and
+# volume cover its whole buckets, so they are exact to within one bucket.
+WINDOWS = {"1m": (5, 12), "5m": (30, 10), "1h": (300, 12)}
+
+# Participant fields whose addresses are tracked; a transaction counts for each of them.
+ADDRESS_FIELDS = ("buyer", "seller", "provider", "from", "to")
+
+# Key of the statistics over all of an address's transaction types.
+ALL_TYPES = "*"
+
+
+class WindowCounters:
+    """Transaction count and volume per time bucket, in one ring per window."""
+
+    __slots__ = ("epochs", "counts", "volumes")
+
+    def __init__(self):
+        size = sum(buckets for _, buckets in WINDOWS.values())
+        self.epochs = array("q", [-1]) * size
+        self.counts = array("q", bytes(8 * size))
+        self.volumes = array("d", bytes(8 * size))
+
+    def add(self, ts, amount):
+        offset = 0
+        for width, buckets in WINDOWS.values():
+            epoch = int(ts // width)
+            i = offset + epoch % buckets
+            if self.epochs[i] != epoch:
+                self.epochs[i] = epoch
+                self.counts[i] = 0
+                self.volumes[i] = 0.0
+            self.counts[i] += 1
+            self.volumes[i] += amount
+            offset += buckets
+
+    def totals(self, now):
+        """{window: (count, volume)} over the buckets still inside each window."""
+        totals = {}
+        offset = 0
+        for name, (width, buckets) in WINDOWS.items():
+            current = int(now // width)
+            count = 0
+            volume = 0.0
+            for i in range(offset, offset + buckets):
+                if current - buckets < self.epochs[i] <= current:
+                    count += self.counts[i]
+                    volume += self.volumes[i]
+            totals[name] = (count, volume)
+            offset += buckets
+        return totals
+
+
+class AmountStats:
+    """Exponentially weighted mean and variance of amounts, plus window counters."""
+
+    __slots__ = ("mean", "variance", "samples", "last_seen", "windows")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.variance = 0.0
+        self.samples = 0
+        self.last_seen = None
+        self.windows = WindowCounters()
+
+    def add(self, amount, ts, alpha):
+        if self.samples == 0:
+            self.mean = amount
+        else:
+            diff = amount - self.mean
+            increment = alpha * diff
+            self.mean += increment
+            self.variance = (1 - alpha) * (self.variance + diff * increment)
+        self.samples += 1
+        self.last_seen = ts
+        self.windows.add(ts, amount)
+
+    def zscore(self, amount, min_samples):
+        """How many standard deviations amount is from the mean, or None if unknown."""
+        if self.samples < min_samples or self.variance <= 0:
+            return None
+        return (amount - self.mean) / math.sqrt(self.variance)
+
+    def describe(self, now):
+        totals = self.windows.totals(now)
+        return {
+            "samples": self.samples,
+            "mean": self.mean,
+            "std": math.sqrt(self.variance),
+            "last_seen": self.last_seen,
+            "count": {name: count for name, (count, _) in totals.items()},
+            "volume": {name: volume for name, (_, volume) in totals.items()},
+        }
+
+
+class AddressStats:
+    """
+    Streaming per-address activity statistics, fed one transaction at a time.
+
+    For every address and transaction type (and over all types, "*") it keeps an
+    exponentially weighted mean and variance of the amount and the count and volume
+    over the last 1m / 5m / 1h in ring counters, so memory per address is fixed.
+    Only the `max_addresses` most recently active addresses are kept (least recently
+    active ones are evicted). The same statistics per transaction type over all
+    addresses give the baseline for population z-scores.
+    """
+
+    def __init__(self, max_addresses=10000, alpha=0.1, min_samples=5, z_threshold=3.0, burst_count=20):
+        self.max_addresses = max_addresses
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.z_threshold = z_threshold
+        self.burst_count = burst_count
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._addresses = OrderedDict()
+        self._baseline = {}
+
+    def __len__(self):
+        return len(self._addresses)
+
+    def observe(self, tx, ts=None):
+        """Record a transaction for each of its participant addresses."""
+        tx_type = tx.get("type")
+        amount = parse_amount(tx)
+        if not isinstance(tx_type, str) or amount is None:
+            return
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self._stats(self._baseline, tx_type).add(amount, ts, self.alpha)
+            for address in addresses_of(tx):
+                self._record(address, tx_type, amount, ts)
+
+    def lookup(self, address, tx_type=ALL_TYPES, now=None):
+        """Statistics of one address (for one type, default all), or None if untracked."""
+        now = time.time() if now is None else now
+        with self._lock:
+            by_type = self._addresses.get(address.lower())
+            stats = by_type and by_type.get(tx_type)
+            return stats.describe(now) if stats else None
+
+    def volume(self, address, window, tx_type=ALL_TYPES, now=None):
+        """An address's volume over a window ("1m", "5m" or "1h"); 0 if untracked."""
+        now = time.time() if now is None else now
+        with self._lock:
+            by_type = self._addresses.get(address.lower())
+            stats = by_type and by_type.get(tx_type)
+            return stats.windows.totals(now)[window][1] if stats else 0.0
+
+    def zscore(self, address, tx_type, amount):
+        """Z-score of an amount against the address's own history of that type, or None."""
+        with self._lock:
+            by_type = self._addresses.get(address.lower())
+            stats = by_type and by_type.get(tx_type)
+            return stats.zscore(amount, self.min_samples) if stats else None
+
+    def flags(self, tx, now=None):
+        """
+        Anomaly flags for a transaction, from the statistics recorded before it:
+        - "amount_outlier": amount z-score against a participant's own history of
+          this type is at least z_threshold
+        - "population_outlier": same, against all transactions of this type
+        - "burst": a participant made at least burst_count transactions in the last 1m
+        """
+        tx_type = tx.get("type")
+        amount = parse_amount(tx)
+        if not isinstance(tx_type, str) or amount is None:
+            return []
+        now = time.time() if now is None else now
+        flags = []
+        with self._lock:
+            baseline = self._baseline.get(tx_type)
+            z = baseline and baseline.zscore(amount, self.min_samples)
+            if z is not None and abs(z) >= self.z_threshold:
+                flags.append("population_outlier")
+            for address in addresses_of(tx):
+                by_type = self._addresses.get(address)
+                if not by_type:
+                    continue
+                stats = by_type.get(tx_type)
+                z = stats and stats.zscore(amount, self.min_samples)
+                if z is not None and abs(z) >= self.z_threshold and "amount_outlier" not in flags:
+                    flags.append("amount_outlier")
+                count, _ = by_type[ALL_TYPES].windows.totals(now)["1m"]
+                if count >= self.burst_count and "burst" not in flags:
+                    flags.append("burst")
+        return flags
+
+    def top(self, window="1h", limit=10, now=None):
+        """The addresses with the largest volume over a window, largest first."""
+        now = time.time() if now is None else now
+        with self._lock:
+            ranked = []
+            for address, by_type in self._addresses.items():
+                count, volume = by_type[ALL_TYPES].windows.totals(now)[window]
+                if count:
+                    ranked.append((volume, count, address))
+        ranked.sort(reverse=True)
+        return [{"address": address, "count": count, "volume": volume}
+                for volume, count, address in ranked[:limit]]
+
+    def stats(self):
+        with self._lock:
+            return {"addresses": len(self._addresses), "evicted": self.evicted,
+                    "max_addresses": self.max_addresses}
+
+    def _record(self, address, tx_type, amount, ts):
+        by_type = self._addresses.get(address)
+        if by_type is None:
+            by_type = self._addresses[address] = {}
+            if len(self._addresses) > self.max_addresses:
+                self._addresses.popitem(last=False)
+                self.evicted += 1
+        else:
+            self._addresses.move_to_end(address)
+        self._stats(by_type, tx_type).add(amount, ts, self.alpha)
+        self._stats(by_type, ALL_TYPES).add(amount, ts, self.alpha)
+
+    @staticmethod
+    def _stats(by_type, tx_type):
+        stats = by_type.get(tx_type)
+        if stats is None:
+            stats = by_type[tx_type] = AmountStats()
+        return stats
+
+
+def addresses_of(tx):
+    """The lower-cased participant addresses of a transaction."""
+    return {tx[field].lower() for field in ADDRESS_FIELDS if isinstance(tx.get(field), str)}
+
+
+def parse_amount(tx):
+    """A transaction's amount as a finite float, or None."""
+    try:
+        amount = float(tx.get("amount", 0))
+    except (TypeError, ValueError):
+        return None
+    return amount if math.isfinite(amount) else None
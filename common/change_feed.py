@@ -0,0 +1,60 @@
+import threading
+import time
+
+from common.http_client import HttpClient
+
+
+class ChangeFeedFollower:
+    """
+    Follows the mempool change feed (GET /transaction/changes) from a background thread.
+
+    on_reset(transactions) is called with a full snapshot when following starts, or
+    when the cursor has fallen out of the mempool's retained log (or the mempool was
+    restarted); on_change(event) is then called for every change event, in sequence
+    order. Callbacks run on the follower thread. While on_reset runs, `last_reset`
+    holds the other fields of the snapshot (such as its archive_offset).
+    """
+
+    def __init__(self, mempool_url, on_reset, on_change, interval=0.5, page_size=10000, client=None):
+        self.mempool_url = mempool_url
+        self.interval = interval
+        self.page_size = page_size
+        # Sequence number of the last change applied, and how many resets happened.
+        self.cursor = 0
+        self.resets = 0
+        self.last_sync = None
+        self.last_reset = None
+        self._client = client or HttpClient()
+        self._on_reset = on_reset
+        self._on_change = on_change
+        self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def poll(self):
+        """Fetch and apply one page of changes. Returns True if more are waiting."""
+        response = self._client.get(f"{self.mempool_url}/transaction/changes",
+                                    params={"since": self.cursor, "limit": self.page_size})
+        response.raise_for_status()
+        feed = response.json()
+        if feed["reset"]:
+            self.last_reset = {key: value for key, value in feed.items() if key != "transactions"}
+            self._on_reset(feed["transactions"])
+            self.resets += 1
+        else:
+            for event in feed["changes"]:
+                self._on_change(event)
+        self.cursor = feed["cursor"]
+        self.last_sync = time.time()
+        return feed.get("more", False)
+
+    def _run(self):
+        while True:
+            try:
+                if self.poll():
+                    continue
+            except Exception as e:
+                print("Error following mempool changes:", e)
+            time.sleep(self.interval)
@@ -0,0 +1,94 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Seconds to wait for a connection to be established, and for a response once connected.
+CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 2))
+READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", 10))
+
+# Retries for failed connections and for 502/503/504 responses to idempotent requests,
+# waiting BACKOFF * 2^n seconds between attempts.
+RETRIES = int(os.environ.get("HTTP_RETRIES", 3))
+BACKOFF = float(os.environ.get("HTTP_BACKOFF", 0.2))
+
+# Keep-alive connections kept open per host.
+POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 10))
+
+
+class HttpClient:
+    """
+    Pooled HTTP client for calls between services.
+
+    One requests.Session is shared by every caller, so connections to each service are
+    kept alive and reused instead of opening a new TCP connection per call. Every
+    request gets connect and read timeouts. Connection failures are retried with
+    exponential backoff for every method (the request never reached the server), but
+    error responses only for idempotent methods, so a POST is never sent twice.
+    """
+
+    def __init__(self, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), retries=RETRIES,
+                 backoff=BACKOFF, pool_size=POOL_SIZE):
+        self.timeout = timeout
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                      backoff_factor=backoff, status_forcelist=(502, 503, 504),
+                      raise_on_status=False)
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                    max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        with self._lock:
+            self._requests += 1
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def stats(self):
+        """
+        Connection reuse counters: requests made, TCP connections opened for them, how
+        many requests (retries included) went over an already open connection, and per
+        host the connections opened and requests served by its pool.
+        """
+        hosts = {}
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            hosts[host] = {"connections": pool.num_connections, "requests": pool.num_requests}
+        connections = sum(h["connections"] for h in hosts.values())
+        attempts = sum(h["requests"] for h in hosts.values())
+        with self._lock:
+            requests_made, errors = self._requests, self._errors
+        return {
+            "requests": requests_made,
+            "errors": errors,
+            "connections_opened": connections,
+            "connections_reused": max(0, attempts - connections),
+            "hosts": hosts,
+        }
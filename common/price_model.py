@@ -0,0 +1,131 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; the pure-Python path agrees to rounding error.
+    np = None
+
+# Each executed buy moves the price up by TRADE_IMPACT * amount / circulation, and each
+# sell moves it down by the same fraction.
+TRADE_IMPACT = 0.01
+
+
+def trade_change(tx_type, amount, total_circulation):
+    """Relative price change caused by one executed transaction (0 for non-trades)."""
+    if tx_type == "buy":
+        return TRADE_IMPACT * (amount / total_circulation)
+    if tx_type == "sell":
+        return -TRADE_IMPACT * (amount / total_circulation)
+    return 0.0
+
+
+def liquidity_change(tx_type, amount):
+    """Change in pool liquidity caused by one executed transaction."""
+    if tx_type == "add_liquidity":
+        return amount
+    if tx_type == "remove_liquidity":
+        return -amount
+    return 0.0
+
+
+def log_factor(change):
+    """
+    log|1 + change| and whether the factor is negative. Small changes go through log1p,
+    so they are not rounded away against the 1; a factor of exactly 0 gives -inf.
+    """
+    if change > -1:
+        return math.log1p(change), False
+    if change == -1:
+        return -math.inf, False
+    return math.log(-1 - change), True
+
+
+def price_series(types, amounts, initial_liquidity, total_circulation, base_price=1.0):
+    """
+    Price after each executed transaction, given their types and (numeric) amounts in
+    execution order. With numpy, the trading factor is the running product of (1 + change),
+    computed as a cumulative sum of log factors, and liquidity is a cumulative sum of
+    liquidity changes; the result is a numpy array. Without numpy, the token's original
+    running product is used and the result is a list.
+    """
+    if np is not None:
+        types = np.asarray(types)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        change, liquidity_delta = _changes_array(types, amounts, total_circulation)
+        liquidity = initial_liquidity + np.cumsum(liquidity_delta)
+        log_abs, negative = _log_factors_array(change)
+        sign = np.where(np.cumsum(negative) % 2, -1.0, 1.0)
+        return base_price * (liquidity / initial_liquidity) * sign * np.exp(np.cumsum(log_abs))
+
+    # The token dashboard's original loop.
+    series = []
+    liquidity = initial_liquidity
+    trading_factor = 1.0
+    for tx_type, amount in zip(types, amounts):
+        if tx_type == "add_liquidity":
+            liquidity += amount
+        elif tx_type == "remove_liquidity":
+            liquidity -= amount
+        elif tx_type == "buy":
+            trading_factor *= 1 + TRADE_IMPACT * (amount / total_circulation)
+        elif tx_type == "sell":
+            trading_factor *= 1 - TRADE_IMPACT * (amount / total_circulation)
+        series.append(base_price * (liquidity / initial_liquidity) * trading_factor)
+    return series
+
+
+def current_price(types, amounts, initial_liquidity, total_circulation, base_price=1.0):
+    """
+    Price after all the given executed transactions. With numpy only the totals are
+    needed, so the log factors are summed directly (pairwise) instead of building the
+    whole series. Without numpy, the token's original running product is used: in
+    pure Python it is several times faster than summing log factors.
+    """
+    if np is not None:
+        types = np.asarray(types)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        if types.size == 0:
+            return base_price
+        change, liquidity_delta = _changes_array(types, amounts, total_circulation)
+        liquidity = initial_liquidity + liquidity_delta.sum()
+        log_abs, negative = _log_factors_array(change)
+        sign = -1.0 if np.count_nonzero(negative) % 2 else 1.0
+        return float(base_price * (liquidity / initial_liquidity) * sign * math.exp(log_abs.sum()))
+
+    # The token dashboard's original loop.
+    liquidity = initial_liquidity
+    trading_factor = 1.0
+    for tx_type, amount in zip(types, amounts):
+        if tx_type == "add_liquidity":
+            liquidity += amount
+        elif tx_type == "remove_liquidity":
+            liquidity -= amount
+        elif tx_type == "buy":
+            trading_factor *= 1 + TRADE_IMPACT * (amount / total_circulation)
+        elif tx_type == "sell":
+            trading_factor *= 1 - TRADE_IMPACT * (amount / total_circulation)
+    return base_price * (liquidity / initial_liquidity) * trading_factor
+
+
+def columns(transactions):
+    """Split transaction dicts into the (types, amounts) columns the functions above take."""
+    types, amounts = [], []
+    for tx in transactions:
+        types.append(tx.get("type"))
+        amounts.append(float(tx.get("amount", 0)))
+    return types, amounts
+
+
+def _changes_array(types, amounts, total_circulation):
+    impact = TRADE_IMPACT * (amounts / total_circulation)
+    change = np.where(types == "buy", impact, np.where(types == "sell", -impact, 0.0))
+    liquidity_delta = np.where(types == "add_liquidity", amounts,
+                               np.where(types == "remove_liquidity", -amounts, 0.0))
+    return change, liquidity_delta
+
+
+def _log_factors_array(change):
+    negative = change < -1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_abs = np.where(negative, np.log(np.abs(1 + change)), np.log1p(change))
+    return log_abs, negative
@@ -0,0 +1,93 @@
+import threading
+
+
+class SuspiciousDetector:
+    """
+    Live set of pending mempool transactions that a classifier flags as suspicious.
+
+    It is fed mempool change events (see common.change_feed), so each transaction is
+    classified once, when it is added or changes status, rather than on every poll.
+    Entries are dropped as soon as their transaction executes, is removed or is
+    archived. The current set is kept as a ready-made list, so reading it costs the
+    same however large the mempool is.
+
+    classify(tx) returns a falsy value or a detection record (e.g. the rules the
+    transaction matched). The record is kept for as long as the transaction stays
+    flagged, so later decisions use what was detected rather than re-classifying it,
+    and on_flag(tx, detection) is called once per flagged transaction.
+    """
+
+    def __init__(self, classify, on_flag=None):
+        self._classify = classify
+        self._on_flag = on_flag
+        self._lock = threading.Lock()
+        self._suspicious = {}
+        self._detections = {}
+        self._list = []
+        self.classified = 0
+        self.flagged = 0
+
+    def __len__(self):
+        return len(self._suspicious)
+
+    def reset(self, transactions):
+        """
+        Rebuild the set from a full list of transactions. Transactions that were
+        already flagged keep their detection record.
+        """
+        with self._lock:
+            previous = self._detections
+            self._suspicious = {}
+            self._detections = {}
+            for tx in transactions:
+                tx_id = tx.get("id")
+                if tx.get("status") == "pending" and tx_id in previous:
+                    self._suspicious[tx_id] = tx
+                    self._detections[tx_id] = previous[tx_id]
+                else:
+                    self._consider(tx)
+            self._list = list(self._suspicious.values())
+
+    def apply_change(self, event):
+        """Update the set from a mempool change event."""
+        tx = event["transaction"]
+        with self._lock:
+            if event["op"] in ("added", "updated"):
+                changed = self._consider(tx)
+            else:
+                changed = self._drop(tx.get("id"))
+            if changed:
+                self._list = list(self._suspicious.values())
+
+    def suspicious(self):
+        """The currently suspicious pending transactions, oldest first."""
+        return self._list
+
+    def detection(self, tx_id):
+        """The detection record of a currently flagged transaction, or None."""
+        return self._detections.get(tx_id)
+
+    def stats(self):
+        return {"suspicious": len(self._list), "classified": self.classified, "flagged": self.flagged}
+
+    def _consider(self, tx):
+        """Add or drop one transaction. Returns True if the set changed."""
+        tx_id = tx.get("id")
+        if tx.get("status") == "pending":
+            if tx_id in self._detections:
+                self._suspicious[tx_id] = tx
+                return False
+            self.classified += 1
+            detection = self._classify(tx)
+            if detection:
+                self.flagged += 1
+                self._suspicious[tx_id] = tx
+                self._detections[tx_id] = detection
+                if self._on_flag is not None:
+                    self._on_flag(tx, detection)
+                return True
+        return self._drop(tx_id)
+
+    def _drop(self, tx_id):
+        self._detections.pop(tx_id, None)
+        return self._suspicious.pop(tx_id, None) is not None
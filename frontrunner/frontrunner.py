@@ -1,18 +1,34 @@
 from flask import Flask, request, jsonify, render_template
-import requests
-import time
 from flask_cors import CORS
 import uuid
+import os
+
+from common.http_client import HttpClient
+from common.change_feed import ChangeFeedFollower
+from common.address_stats import AddressStats
+from detector import SuspiciousDetector
+from jobs import JobQueue
+from rules import RuleEngine
 
 app = Flask(__name__)
 CORS(app)
 
+# Pooled keep-alive client (with timeouts and retries) for calls to the other services.
+http_client = HttpClient()
+
 # URLs for mempool and token API
-MEMPOOL_URL = "http://localhost:5000/transaction"
+MEMPOOL_BASE_URL = "http://localhost:5000"
+MEMPOOL_URL = f"{MEMPOOL_BASE_URL}/transaction"
+
+# Rolling per-address activity (EWMA amounts, 1m/5m/1h counts and volumes) from the
+# mempool change feed, for the rules' volume and anomaly conditions.
+address_stats = AddressStats(max_addresses=int(os.environ.get("ADDRESS_STATS_MAX", 10000)))
 
-# Thresholds for suspicious transactions:
-FRONT_RUN_THRESHOLD_LIQUIDITY = 150000.0  # For Type 1 attack (liquidity removal)
-LARGE_SELL_THRESHOLD = 800000.0            # For Type 2 attack (sell orders)
+# Suspicious-transaction rules (see rules.json), recompiled when the file changes.
+RULES_PATH = os.environ.get("FRONTRUNNER_RULES",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json"))
+rule_engine = RuleEngine(RULES_PATH, address_stats,
+                         reload_interval=float(os.environ.get("FRONTRUNNER_RULES_RELOAD", 2))).start()
 
 # URL for trader update endpoint (trader.py)
 TRADER_UPDATE_URL = "http://localhost:5004/api/autotrade/update"
@@ -21,157 +37,208 @@ TRADER_UPDATE_URL = "http://localhost:5004/api/autotrade/update"
 def index():
     return render_template('index.html')
 
+def classify(tx):
+    """
+    Detection record of a transaction that matches suspicious-transaction rules: the
+    names of the rules and the attack action of the first one that has one. None if
+    no rule matches.
+    """
+    rules = rule_engine.evaluate(tx)
+    if not rules:
+        return None
+    return {"rules": [rule.name for rule in rules],
+            "action": next((rule.action for rule in rules if rule.action), None)}
+
+def on_flag(tx, detection):
+    rule_engine.record_hits(detection["rules"])
+
+def on_mempool_change(event):
+    # Classify new transactions against the statistics from before they arrived.
+    detector.apply_change(event)
+    if event["op"] == "added":
+        address_stats.observe(event["transaction"], event["ts"])
+
+# Suspicious pending transactions, kept up to date from the mempool change feed: each
+# transaction is classified once, and leaves the set when it executes or is deleted.
+detector = SuspiciousDetector(classify, on_flag)
+change_feed = ChangeFeedFollower(MEMPOOL_BASE_URL, detector.reset, on_mempool_change,
+                                 client=http_client).start()
+
 @app.route('/api/suspicious', methods=['GET'])
 def get_suspicious():
+    """The suspicious pending transactions currently in the mempool (see rules.json)."""
+    if change_feed.last_sync is None:
+        return jsonify({"error": "Failed to fetch mempool data"}), 500
+    return jsonify(detector.suspicious()), 200
+
+# Address the frontrunner trades from.
+FRONTRUNNER_ADDRESS = "0x6a038a9481dd46186da3cf63e7e2d85398abc047"
+
+# Seconds between the front-run and the back-run leg of an attack.
+BACKRUN_DELAY = float(os.environ.get("FRONTRUNNER_BACKRUN_DELAY", 15))
+
+# Back-run legs wait in a timer heap and run on a few worker threads, so attacks in
+# flight do not each hold a request thread.
+jobs = JobQueue(workers=int(os.environ.get("FRONTRUNNER_JOB_WORKERS", 4))).start()
+
+def submit_leg(tx_type, role, amount):
+    """Post one executed, MEV-boosted leg of an attack to the mempool; return the response."""
+    payload = {
+        "type": tx_type,
+        role: FRONTRUNNER_ADDRESS,
+        "amount": str(amount),
+        "mev_boost": True,
+        "status": "executed"
+    }
+    payload['id'] = str(uuid.uuid4())
+    return http_client.post(MEMPOOL_URL, json=payload)
+
+def backrun(tx_type, role, amount, error, update_payload):
     """
-    Poll the mempool for transactions and filter for suspicious ones.
-    For Type 1: remove_liquidity transactions with an amount >= FRONT_RUN_THRESHOLD_LIQUIDITY.
-    For Type 2: sell transactions with an amount >= LARGE_SELL_THRESHOLD.
+    Job body for the back-run leg: submit it, then report the autotrade to the trader.
+    Returns the back-run transaction id.
     """
+    response = submit_leg(tx_type, role, amount)
+    if not response.ok:
+        raise RuntimeError(f"{error}: {response.text}")
     try:
-        response = requests.get(MEMPOOL_URL)
-        if not response.ok:
-            return jsonify({"error": "Failed to fetch mempool data"}), 500
-        transactions = response.json()
-        suspicious = []
-        for tx in transactions:
-            tx_type = tx.get("type", "").lower()
-            try:
-                amount = float(tx.get("amount", 0))
-            except Exception:
-                continue
-            if tx_type == "remove_liquidity" and amount >= FRONT_RUN_THRESHOLD_LIQUIDITY:
-                suspicious.append(tx)
-            elif tx_type == "sell" and amount >= LARGE_SELL_THRESHOLD:
-                suspicious.append(tx)
-        return jsonify(suspicious), 200
+        http_client.post(TRADER_UPDATE_URL, json=update_payload)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        print("Error updating trader:", e)
+    return response.json()["transaction"]["id"]
 
 @app.route('/api/frontrun', methods=['POST'])
 def execute_frontrun():
     """
     Execute a frontrun attack based on the suspicious transaction.
-    For a liquidity removal (Type 1): 
+    The attack is the action recorded when the transaction was flagged: that of the
+    first matching rule that has one.
+    For "frontrun_removal" (Type 1, a large liquidity removal):
       - Execute a frontrun removal with MEV boost,
-      - Wait 15 seconds,
-      - Execute a back-run addition.
-    For a large sell (Type 2):
+      - Schedule a back-run addition BACKRUN_DELAY seconds later.
+    For "sandwich" (Type 2, a large sell):
       - Execute a frontrun buy with MEV boost,
-      - Wait 15 seconds,
-      - Execute a back-run sell.
+      - Schedule a back-run sell BACKRUN_DELAY seconds later.
+    The response is sent once the front-run is in the mempool (202, with the job id of
+    the back-run; see GET /api/jobs/<id>).
     The request JSON should include:
       - tx_id: ID of the suspicious transaction.
-      - type: "remove_liquidity" or "sell"
-      - amount: the USD amount in the suspicious transaction.
     """
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     tx_id = data.get("tx_id")
     if not tx_id:
         return jsonify({"error": "No transaction ID provided"}), 400
 
     # Fetch transaction details from the mempool.
     try:
-        tx_response = requests.get(f"{MEMPOOL_URL}/{tx_id}")
+        tx_response = http_client.get(f"{MEMPOOL_URL}/{tx_id}")
         if not tx_response.ok:
             return jsonify({"error": "Transaction not found in mempool"}), 404
         tx = tx_response.json()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-    tx_type = tx.get("type", "").lower()
     try:
         amount = float(tx.get("amount", 0))
     except Exception:
         return jsonify({"error": "Invalid amount in transaction"}), 400
 
-    if tx_type == "remove_liquidity" and amount >= FRONT_RUN_THRESHOLD_LIQUIDITY:
-        try:
-            frontrun_amount = round(amount * 1.1, 2)
-            removal_payload = {
-                "type": "remove_liquidity",
-                "provider": "0x6a038a9481dd46186da3cf63e7e2d85398abc047",
-                "amount": str(frontrun_amount),
-                "mev_boost": True,
-                "status": "executed"
-            }
-            removal_payload['id'] = str(uuid.uuid4())
-            removal_response = requests.post(MEMPOOL_URL, json=removal_payload)
-            if not removal_response.ok:
-                return jsonify({"error": "Type 1 front-run removal failed", "details": removal_response.text}), 500
-
-            time.sleep(15)
-
-            addition_payload = {
-                "type": "add_liquidity",
-                "provider": "0x6a038a9481dd46186da3cf63e7e2d85398abc047",
-                "amount": str(frontrun_amount),
-                "mev_boost": True,
-                "status": "executed"
-            }
-            addition_payload['id'] = str(uuid.uuid4())
-            addition_response = requests.post(MEMPOOL_URL, json=addition_payload)
-            if not addition_response.ok:
-                return jsonify({"error": "Type 1 back-run addition failed", "details": addition_response.text}), 500
-
-            # Update trader's dashboard with autotrade details.
-            update_payload = {
-                "trade_type": "remove_liquidity",
-                "amount": frontrun_amount,
-                "details": "Type 1 autotrade: removed liquidity then added liquidity after 15 sec."
-            }
-            requests.post(TRADER_UPDATE_URL, json=update_payload)
-            return jsonify({"message": f"Type 1 autotrade executed: removed liquidity {frontrun_amount} and added liquidity after 15 sec."}), 200
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
-
-    elif tx_type == "sell" and amount >= LARGE_SELL_THRESHOLD:
-        try:
-            frontrun_buy_amount = round(amount * 1.05, 2)
-            buy_payload = {
-                "type": "buy",
-                "buyer": "0x6a038a9481dd46186da3cf63e7e2d85398abc047",
-                "amount": str(frontrun_buy_amount),
-                "mev_boost": True,
-                "status": "executed"
-            }
-            buy_payload['id'] = str(uuid.uuid4())
-            buy_response = requests.post(MEMPOOL_URL, json=buy_payload)
-            if not buy_response.ok:
-                return jsonify({"error": "Type 2 front-run buy failed", "details": buy_response.text}), 500
-
-            time.sleep(15)
-
-            sell_payload = {
-                "type": "sell",
-                "seller": "0x6a038a9481dd46186da3cf63e7e2d85398abc047",
-                "amount": str(frontrun_buy_amount),
-                "mev_boost": True,
-                "status": "executed"
-            }
-            sell_payload['id'] = str(uuid.uuid4())
-            sell_response = requests.post(MEMPOOL_URL, json=sell_payload)
-            if not sell_response.ok:
-                return jsonify({"error": "Type 2 back-run sell failed", "details": sell_response.text}), 500
-
-            # Update trader's dashboard with autotrade details.
-            update_payload = {
-                "trade_type": "sell",
-                "amount": frontrun_buy_amount,
-                "details": "Type 2 autotrade: sandwich attack executed."
-            }
-            requests.post(TRADER_UPDATE_URL, json=update_payload)
-            return jsonify({"message": f"Type 2 autotrade executed: sandwich attack bought and sold {frontrun_buy_amount}"}), 200
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
+    detection = detector.detection(tx_id)
+    if detection is None:
+        return jsonify({"error": "Transaction is not a suspicious pending transaction"}), 400
+    action = detection["action"]
+    if action == "frontrun_removal":
+        frontrun_amount = round(amount * 1.1, 2)
+        attack = "Type 1"
+        frontrun_leg = ("remove_liquidity", "provider", frontrun_amount, "Type 1 front-run removal failed")
+        backrun_leg = ("add_liquidity", "provider", frontrun_amount, "Type 1 back-run addition failed")
+        update_payload = {
+            "trade_type": "remove_liquidity",
+            "amount": frontrun_amount,
+            "details": f"Type 1 autotrade: removed liquidity then added liquidity after {BACKRUN_DELAY:g} sec."
+        }
+        message = f"Type 1 autotrade started: removed liquidity {frontrun_amount}, adding it back in {BACKRUN_DELAY:g} sec."
+    elif action == "sandwich":
+        frontrun_amount = round(amount * 1.05, 2)
+        attack = "Type 2"
+        frontrun_leg = ("buy", "buyer", frontrun_amount, "Type 2 front-run buy failed")
+        backrun_leg = ("sell", "seller", frontrun_amount, "Type 2 back-run sell failed")
+        update_payload = {
+            "trade_type": "sell",
+            "amount": frontrun_amount,
+            "details": "Type 2 autotrade: sandwich attack executed."
+        }
+        message = f"Type 2 autotrade started: sandwich attack bought {frontrun_amount}, selling in {BACKRUN_DELAY:g} sec."
     else:
         return jsonify({"error": "Transaction type does not match any autotrade strategy"}), 400
 
+    try:
+        leg_type, role, leg_amount, error = frontrun_leg
+        frontrun_response = submit_leg(leg_type, role, leg_amount)
+        if not frontrun_response.ok:
+            return jsonify({"error": error, "details": frontrun_response.text}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    job = jobs.schedule(lambda: backrun(*backrun_leg, update_payload), BACKRUN_DELAY,
+                        attack=attack, target_tx=tx_id, amount=frontrun_amount,
+                        frontrun_tx=frontrun_response.json()["transaction"]["id"])
+    return jsonify({"message": message, "job_id": job["id"], "job": job}), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Status of a back-run job: "scheduled", "running", "completed" (result is the
+    back-run transaction id) or "failed" (with the error).
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
+
+@app.route('/api/rules', methods=['GET'])
+def get_rules():
+    """
+    The loaded rules with their hit counters (one hit per flagged transaction), and
+    the last reload error if any.
+    """
+    return jsonify(rule_engine.describe()), 200
+
+@app.route('/api/rules/reload', methods=['POST'])
+def reload_rules():
+    """Recompile the rule file now instead of waiting for the file watcher."""
+    if not rule_engine.reload():
+        return jsonify({"error": rule_engine.error}), 400
+    return jsonify(rule_engine.describe()), 200
+
+@app.route('/api/addresses/<address>', methods=['GET'])
+def get_address_stats(address):
+    """
+    Recent activity of an address over all transaction types, or one with ?type=:
+    EWMA mean and std of amounts, and counts and volumes over 1m, 5m and 1h.
+    """
+    stats = address_stats.lookup(address, request.args.get('type', '*'))
+    if stats is None:
+        return jsonify({"error": "No recent activity for this address"}), 404
+    return jsonify(stats), 200
+
 @app.route('/api/activate_monitoring', methods=['POST'])
 def activate_monitoring():
     data = request.get_json() or {}
     token_address = data.get("token_address", "unknown")
     return jsonify({"message": f"Frontrunner monitoring activated for token {token_address}"}), 200
 
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Monitoring counters: HTTP connection reuse, the detector and back-run jobs."""
+    return jsonify({
+        'http': http_client.stats(),
+        'detector': detector.stats(),
+        'address_stats': address_stats.stats(),
+        'jobs': jobs.stats(),
+        'change_feed_cursor': change_feed.cursor,
+        'change_feed_resets': change_feed.resets,
+    }), 200
+
 if __name__ == '__main__':
     app.run(port=5003, debug=True)
@@ -0,0 +1,99 @@
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobQueue:
+    """
+    Runs delayed jobs (such as the back-run leg of a sandwich) at their due time.
+
+    Due times live in one min-heap watched by a single timer thread, which hands each
+    job to a small worker pool when it is due, so any number of jobs can wait without
+    a thread each. Every job has an id and a status record ("scheduled", "running",
+    "completed" or "failed") that can be looked up while it waits and after it has
+    run. Only the newest `history` finished jobs are kept.
+    """
+
+    def __init__(self, workers=4, history=1000):
+        self.history = history
+        self._heap = []
+        self._jobs = OrderedDict()
+        self._finished = 0
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job-worker")
+        self._thread = threading.Thread(target=self._run, name="job-timer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def schedule(self, func, delay, **details):
+        """
+        Run func() after `delay` seconds. Its return value is stored as the job's
+        result; an exception fails the job. Extra keyword arguments are kept in the job
+        record. Returns the job record.
+        """
+        now = time.time()
+        job = dict(details, id=str(uuid.uuid4()), status="scheduled",
+                   created_at=now, due_at=now + delay, result=None, error=None)
+        with self._cond:
+            self._jobs[job["id"]] = job
+            entry = (time.monotonic() + delay, next(self._counter), job["id"], func)
+            heapq.heappush(self._heap, entry)
+            if self._heap[0] is entry:
+                self._cond.notify()
+        return dict(job)
+
+    def get(self, job_id):
+        """A copy of a job's record, or None if it is unknown (or long finished)."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return None if job is None else dict(job)
+
+    def stats(self):
+        with self._cond:
+            counts = {"scheduled": 0, "running": 0, "completed": 0, "failed": 0}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+            return counts
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    timeout = self._heap[0][0] - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+                _, _, job_id, func = heapq.heappop(self._heap)
+            self._pool.submit(self._execute, job_id, func)
+
+    def _execute(self, job_id, func):
+        with self._cond:
+            self._jobs[job_id]["status"] = "running"
+        try:
+            result, error, status = func(), None, "completed"
+        except Exception as e:
+            result, error, status = None, str(e), "failed"
+        with self._cond:
+            job = self._jobs[job_id]
+            job.update(status=status, result=result, error=error, finished_at=time.time())
+            self._finished += 1
+            if self._finished > self.history:
+                self._evict_finished()
+
+    def _evict_finished(self):
+        for job_id, job in list(self._jobs.items()):
+            if self._finished <= self.history:
+                break
+            if job["status"] in ("completed", "failed"):
+                del self._jobs[job_id]
+                self._finished -= 1
@@ -0,0 +1,253 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+
+from common.address_stats import WINDOWS, addresses_of, parse_amount
+
+RULE_FIELDS = {"name", "description", "type", "min_amount", "max_amount", "addresses",
+               "exclude_addresses", "hours", "volume", "flags", "action", "enabled"}
+
+# Attack strategies a rule may trigger in the frontrunner.
+ACTIONS = ("frontrun_removal", "sandwich")
+
+# Anomaly flags a rule may require (see common.address_stats.AddressStats.flags).
+FLAGS = ("amount_outlier", "population_outlier", "burst")
+
+
+class Rule:
+    """
+    One validated rule. The amount range is half-open: a transaction matches if
+    min_amount <= amount < max_amount (either bound may be left out). It is matched
+    by the RuleSet's cut-points.
+    """
+
+    def __init__(self, spec):
+        if not isinstance(spec, dict):
+            raise ValueError("Each rule must be a JSON object")
+        unknown = set(spec) - RULE_FIELDS
+        name = spec.get("name")
+        if not isinstance(name, str) or not name:
+            raise ValueError("Each rule needs a name")
+        if unknown:
+            raise ValueError(f"Rule {name}: unknown fields {sorted(unknown)}")
+        self.name = name
+        self.enabled = spec.get("enabled", True) is not False
+        tx_types = spec.get("type", "*")
+        self.types = [tx_types] if isinstance(tx_types, str) else tx_types
+        if not isinstance(self.types, list) or not all(isinstance(t, str) for t in self.types):
+            raise ValueError(f"Rule {name}: type must be a string or a list of strings")
+        self.min_amount = self._number(spec, "min_amount")
+        self.max_amount = self._number(spec, "max_amount")
+        self.addresses = self._addresses(spec, "addresses")
+        self.exclude_addresses = self._addresses(spec, "exclude_addresses")
+        self.hours = spec.get("hours")
+        if self.hours is not None and not (
+                isinstance(self.hours, list) and len(self.hours) == 2 and
+                all(isinstance(h, int) and 0 <= h <= 24 for h in self.hours)):
+            raise ValueError(f"Rule {name}: hours must be [start, end] UTC hours")
+        volume = spec.get("volume")
+        self.volume_window = self.volume_min = None
+        if volume is not None:
+            try:
+                self.volume_window = volume["window"]
+                self.volume_min = float(volume["min"])
+            except (TypeError, KeyError, ValueError):
+                raise ValueError(f"Rule {name}: volume must be {{\"window\": window, \"min\": amount}}")
+            if self.volume_window not in WINDOWS:
+                raise ValueError(f"Rule {name}: volume window must be one of {list(WINDOWS)}")
+        self.flags = spec.get("flags", [])
+        if not isinstance(self.flags, list) or not all(flag in FLAGS for flag in self.flags):
+            raise ValueError(f"Rule {name}: flags must be a list of {list(FLAGS)}")
+        self.action = spec.get("action")
+        if self.action is not None and self.action not in ACTIONS:
+            raise ValueError(f"Rule {name}: action must be one of {list(ACTIONS)}")
+        # Conditions beyond type and amount, checked only for rules in the matched interval.
+        self.simple = (not self.addresses and not self.exclude_addresses and
+                       self.hours is None and self.volume_window is None and not self.flags)
+
+    def covers(self, lower):
+        """Whether the amount interval starting at `lower` (None: unbounded) is in range."""
+        if lower is None:
+            return self.min_amount is None
+        return ((self.min_amount is None or self.min_amount <= lower) and
+                (self.max_amount is None or self.max_amount > lower))
+
+    def matches(self, tx, amount, ts, address_stats, flags):
+        """
+        Check the conditions beyond type and amount. Rolling volumes come from
+        address_stats, which has not seen this transaction yet, so its amount is added.
+        """
+        if self.addresses or self.exclude_addresses:
+            addresses = addresses_of(tx)
+            if self.addresses and not addresses & self.addresses:
+                return False
+            if addresses & self.exclude_addresses:
+                return False
+        if self.hours is not None:
+            start, end = self.hours
+            hour = time.gmtime(ts).tm_hour
+            if not (start <= hour < end if start <= end else hour >= start or hour < end):
+                return False
+        if self.volume_window is not None:
+            if not any(address_stats.volume(address, self.volume_window, now=ts) + amount >= self.volume_min
+                       for address in addresses_of(tx)):
+                return False
+        if self.flags and not all(flag in flags(tx, ts) for flag in self.flags):
+            return False
+        return True
+
+    def _number(self, spec, field):
+        value = spec.get(field)
+        if value is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"Rule {self.name}: {field} must be a number")
+        return float(value)
+
+    def _addresses(self, spec, field):
+        values = spec.get(field, [])
+        if not isinstance(values, list) or not all(isinstance(a, str) for a in values):
+            raise ValueError(f"Rule {self.name}: {field} must be a list of addresses")
+        return {a.lower() for a in values}
+
+
+class RuleSet:
+    """
+    Rules compiled into a decision structure.
+
+    Rules are grouped by transaction type ("*" rules join every group). Within a group
+    the thresholds of all its rules are sorted into cut-points, and every interval
+    between two cut-points lists the rules whose amount range contains it, so a
+    transaction is matched with one dict lookup and one bisect however many rules
+    there are. Only the rules of that interval check their remaining conditions.
+    """
+
+    def __init__(self, specs):
+        if not isinstance(specs, list):
+            raise ValueError("The rule set must be a JSON array of rules")
+        self.rules = [Rule(spec) for spec in specs]
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("Rule names must be unique")
+        enabled = [rule for rule in self.rules if rule.enabled]
+        wildcard = [rule for rule in enabled if "*" in rule.types]
+        types = {t for rule in enabled for t in rule.types if t != "*"}
+        self._groups = {t: self._compile([rule for rule in enabled if t in rule.types or "*" in rule.types])
+                        for t in types}
+        self._wildcard = self._compile(wildcard)
+
+    def candidates(self, tx_type, amount):
+        """Rules whose type and amount range match, in rule-file order."""
+        group = self._groups.get(tx_type) if isinstance(tx_type, str) else None
+        cuts, intervals = group or self._wildcard
+        return intervals[bisect_right(cuts, amount)]
+
+    @staticmethod
+    def _compile(rules):
+        cuts = sorted({bound for rule in rules for bound in (rule.min_amount, rule.max_amount)
+                       if bound is not None})
+        intervals = [tuple(rule for rule in rules if rule.covers(lower))
+                     for lower in [None] + cuts]
+        return cuts, intervals
+
+
+class RuleEngine:
+    """
+    Evaluates mempool transactions against a JSON rule file, with rolling volumes and
+    anomaly flags taken from a common.address_stats.AddressStats.
+
+    The file is compiled into a RuleSet at startup and recompiled whenever it changes
+    on disk (checked every `reload_interval` seconds) or reload() is called; a file
+    that fails to compile leaves the previous rules in place. Hits are counted per
+    rule name and survive reloads.
+    """
+
+    def __init__(self, path, address_stats, reload_interval=2.0):
+        self.path = path
+        self.address_stats = address_stats
+        self.reload_interval = reload_interval
+        self.loaded_at = None
+        self.error = None
+        self.hits = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._rules = RuleSet([])
+        self.reload()
+        self._thread = threading.Thread(target=self._watch, name="rule-reload", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def reload(self):
+        """Recompile the rule file. Returns True on success; the error is kept otherwise."""
+        try:
+            # Remember the version even if it fails, so a broken file is reported once.
+            self._mtime = os.path.getmtime(self.path)
+            with open(self.path) as f:
+                rules = RuleSet(json.load(f))
+        except (OSError, ValueError) as e:
+            self.error = str(e)
+            print(f"Error loading rules from {self.path}:", e)
+            return False
+        with self._lock:
+            self._rules = rules
+            self.loaded_at = time.time()
+            self.error = None
+        return True
+
+    def evaluate(self, tx, ts=None):
+        """
+        The enabled rules a transaction matches, in rule-file order. Call it before the
+        transaction is recorded in the address statistics. Hits are not counted here,
+        since a transaction may be evaluated more than once (see record_hits).
+        """
+        amount = parse_amount(tx)
+        if amount is None:
+            return []
+        ts = time.time() if ts is None else ts
+        flags = FlagCache(self.address_stats)
+        with self._lock:
+            return [rule for rule in self._rules.candidates(tx.get("type"), amount)
+                    if rule.simple or rule.matches(tx, amount, ts, self.address_stats, flags)]
+
+    def record_hits(self, rule_names):
+        """Count a hit for each named rule, once per detected transaction."""
+        with self._lock:
+            for name in rule_names:
+                self.hits[name] = self.hits.get(name, 0) + 1
+
+    def describe(self):
+        with self._lock:
+            return {
+                "path": self.path,
+                "loaded_at": self.loaded_at,
+                "error": self.error,
+                "rules": [{"name": rule.name, "enabled": rule.enabled, "action": rule.action,
+                           "hits": self.hits.get(rule.name, 0)} for rule in self._rules.rules],
+            }
+
+    def _watch(self):
+        while True:
+            time.sleep(self.reload_interval)
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                continue
+            if mtime != self._mtime:
+                self.reload()
+
+
+class FlagCache:
+    """A transaction's anomaly flags, computed once however many rules ask for them."""
+
+    def __init__(self, address_stats):
+        self._address_stats = address_stats
+        self._flags = None
+
+    def __call__(self, tx, ts):
+        if self._flags is None:
+            self._flags = self._address_stats.flags(tx, ts)
+        return self._flags
@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+
+
+class TransactionArchive:
+    """
+    Append-only archive of transactions evicted from the in-memory mempool.
+
+    Each transaction is one compact JSON line. Only the byte offset and length of every
+    line are kept in memory, so archived transactions can still be fetched by id
+    without holding them in the hot set. The index is rebuilt from the file on startup.
+    The file only ever grows, so a byte offset into it is a stable cursor for readers
+    that replay the whole archive (see read()).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._offsets = {}
+        # Bytes of complete lines in the file; appends start here.
+        self.size = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "ab+")
+        self._load_index()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __contains__(self, tx_id):
+        return tx_id in self._offsets
+
+    def append_many(self, txs):
+        """Append transactions to the archive with a single write."""
+        if not txs:
+            return
+        lines = [json.dumps(tx, separators=(",", ":")).encode() + b"\n" for tx in txs]
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell()
+            self._file.write(b"".join(lines))
+            self._file.flush()
+            for tx, line in zip(txs, lines):
+                self._offsets[tx["id"]] = (offset, len(line))
+                offset += len(line)
+            self.size = offset
+
+    def get(self, tx_id):
+        """Return an archived transaction by id, or None."""
+        with self._lock:
+            location = self._offsets.get(tx_id)
+            if location is None:
+                return None
+            offset, length = location
+            self._file.seek(offset)
+            return json.loads(self._file.read(length))
+
+    def read(self, offset=0, end=None, limit=1000):
+        """
+        Up to `limit` archived transactions stored from byte `offset` (0 or a cursor
+        returned earlier) up to byte `end` (default: the end of the archive), and the
+        offset to continue from. Raises ValueError for an offset that is not a cursor.
+        """
+        with self._lock:
+            end = self.size if end is None else min(end, self.size)
+            if offset < 0 or offset > end:
+                raise ValueError("offset out of range")
+            if offset:
+                self._file.seek(offset - 1)
+                if self._file.read(1) != b"\n":
+                    raise ValueError("offset is not at the start of a transaction")
+            self._file.seek(offset)
+            txs = []
+            while offset < end and len(txs) < limit:
+                line = self._file.readline()
+                if not line:
+                    break
+                offset += len(line)
+                try:
+                    txs.append(json.loads(line))
+                except ValueError:
+                    # A torn line from a crash is skipped.
+                    pass
+            return txs, offset
+
+    def _load_index(self):
+        self._file.seek(0)
+        offset = 0
+        line = b"\n"
+        for line in self._file:
+            try:
+                self._offsets[json.loads(line)["id"]] = (offset, len(line))
+            except (ValueError, KeyError):
+                # A torn line from a crash is skipped.
+                pass
+            offset += len(line)
+        if not line.endswith(b"\n"):
+            # Terminate a torn final line so the next append starts on a line of its own.
+            self._file.write(b"\n")
+            self._file.flush()
+            offset += 1
+        self.size = offset
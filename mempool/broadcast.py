@@ -0,0 +1,60 @@
+import queue
+import threading
+
+
+class Subscriber:
+    """A single stream consumer with its own bounded event buffer."""
+
+    def __init__(self, buffer_size):
+        self.events = queue.Queue(maxsize=buffer_size)
+        self.dropped = False
+
+    def get(self, timeout):
+        """Next event, or None if nothing arrived within timeout seconds."""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroadcaster:
+    """
+    Fans mempool change events out to any number of subscribers.
+
+    publish() never blocks: each subscriber has a bounded buffer, and a subscriber
+    whose buffer is full is dropped instead of slowing down the mempool. A dropped
+    stream client reconnects and catches up from the change log.
+    """
+
+    def __init__(self, buffer_size=1000):
+        self.buffer_size = buffer_size
+        self.dropped_count = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscriber = Subscriber(self.buffer_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event):
+        with self._lock:
+            slow = []
+            for subscriber in self._subscribers:
+                try:
+                    subscriber.events.put_nowait(event)
+                except queue.Full:
+                    slow.append(subscriber)
+            for subscriber in slow:
+                subscriber.dropped = True
+                self._subscribers.discard(subscriber)
+            self.dropped_count += len(slow)
@@ -0,0 +1,366 @@
+import math
+import re
+from array import array
+
+# Participant fields that get the binary address column; a transaction uses one of them.
+ROLE_FIELDS = ("buyer", "seller", "provider")
+# Every field that holds a participant address.
+ADDRESS_FIELDS = frozenset(ROLE_FIELDS + ("from", "to"))
+
+# Fields that always have a column of their own.
+COLUMN_FIELDS = ("id", "type", "status", "amount", "mev_boost")
+
+# How the value in the amount column maps back to the submitted JSON value. Numeric
+# strings (what the API usually receives) are kept in the column too when they are the
+# canonical form of their number: repr() of the float, or an integer's digits.
+AMOUNT_ABSENT, AMOUNT_FLOAT, AMOUNT_INT, AMOUNT_RAW, AMOUNT_FLOAT_STR, AMOUNT_INT_STR = range(6)
+
+# mev_boost column values; anything other than a JSON boolean is kept in the extras.
+MEV_ABSENT, MEV_FALSE, MEV_TRUE, MEV_RAW = -1, 0, 1, 2
+
+ID_BYTES = 16
+ADDRESS_BYTES = 20
+LOWER_ADDRESS_PATTERN = re.compile(r"0x[0-9a-f]{40}")
+ADDRESS_PATTERN = re.compile(r"0x[0-9a-fA-F]{40}")
+# Canonical (lower-case, hyphenated) UUID strings, the ids the mempool assigns.
+UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+# The table's column arrays, by attribute name (see copy() and image()).
+COLUMNS = ("ids", "types", "statuses", "amounts", "amount_kinds", "mev_boost", "roles",
+           "addresses", "order")
+
+_EMPTY_ID = bytes(ID_BYTES)
+_EMPTY_ADDRESS = bytes(ADDRESS_BYTES)
+
+
+def id_key(tx_id):
+    """Compact dictionary key for a transaction id: 16 UUID bytes when canonical."""
+    if isinstance(tx_id, str) and UUID_PATTERN.fullmatch(tx_id):
+        key = bytes.fromhex(tx_id.replace("-", ""))
+        # All-zero bytes mark rows without a UUID id, so the nil UUID is kept as text.
+        if key != _EMPTY_ID:
+            return key
+    return tx_id
+
+
+def format_id(key):
+    """The canonical UUID string of a 16-byte id key."""
+    h = key.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def address_key(address):
+    """Case-insensitive compact key for an address: 20 bytes when it is hex."""
+    if ADDRESS_PATTERN.fullmatch(address):
+        return bytes.fromhex(address[2:])
+    return address.lower()
+
+
+class Codebook:
+    """Maps a small vocabulary of values (transaction types, statuses) to integer codes."""
+
+    MAX_CODES = 65535
+
+    def __init__(self):
+        self.values = [None]
+        self.codes = {None: 0}
+
+    def encode(self, value):
+        """Code for value, or None if it cannot be coded (unhashable or out of codes)."""
+        try:
+            code = self.codes.get(value)
+        except TypeError:
+            return None
+        if code is None and isinstance(value, str) and len(self.values) < self.MAX_CODES:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def decode(self, code):
+        return self.values[code]
+
+    def copy(self):
+        codebook = Codebook()
+        codebook.values = list(self.values)
+        codebook.codes = dict(self.codes)
+        return codebook
+
+
+class ColumnarTable:
+    """
+    Transactions stored as typed columns indexed by row number.
+
+    Ids are 16-byte UUIDs, the participant address is 20 bytes plus a role code, type
+    and status are small-int codes, and amounts live in an array('d'). Fields without
+    a column, and values that do not round-trip through one, are kept in a sparse
+    per-row dict. Rows of deleted transactions are reused. Dicts are only built by
+    materialize(), at the JSON boundary.
+
+    The columns take about 60 bytes per row, but the id -> row dict and the store's
+    secondary indexes are still Python dicts and sets. Measured over 100k API-shaped
+    transactions, a whole MempoolStore takes about 500 bytes per transaction against
+    about 980 as a dict of dicts: roughly 2x, not the 5-10x of the columns alone.
+    """
+
+    def __init__(self):
+        self.ids = bytearray()
+        self.types = array("H")
+        self.statuses = array("H")
+        self.amounts = array("d")
+        self.amount_kinds = array("B")
+        self.mev_boost = array("b")
+        self.roles = array("B")
+        self.addresses = bytearray()
+        self.order = array("q")
+        self.extras = {}
+        self.type_codes = Codebook()
+        self.status_codes = Codebook()
+        self._rows = {}
+        self._free = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def row_of(self, tx_id):
+        """Row number holding the transaction with this id, or None."""
+        return self._rows.get(id_key(tx_id))
+
+    def rows(self):
+        return self._rows.values()
+
+    def copy(self):
+        """
+        An independent copy of the table. Columns are copied as whole arrays, so this
+        is much cheaper than materializing every row.
+        """
+        table = ColumnarTable.__new__(ColumnarTable)
+        for name in COLUMNS:
+            setattr(table, name, getattr(self, name)[:])
+        # Per-row extras are updated in place (e.g. by set_status), so they are copied too.
+        table.extras = {row: dict(extras) for row, extras in self.extras.items()}
+        table.type_codes = self.type_codes.copy()
+        table.status_codes = self.status_codes.copy()
+        table._rows = dict(self._rows)
+        table._free = list(self._free)
+        return table
+
+    def image(self):
+        """
+        The table as (columns, meta) for a snapshot: the column arrays themselves (not
+        copies) and the rest as JSON-compatible data. from_image() reverses it.
+        """
+        meta = {
+            "extras": [[row, extras] for row, extras in self.extras.items()],
+            "type_codes": self.type_codes.values[1:],
+            "status_codes": self.status_codes.values[1:],
+            "free": self._free,
+        }
+        return {name: getattr(self, name) for name in COLUMNS}, meta
+
+    @classmethod
+    def from_image(cls, columns, meta):
+        """Rebuild a table from image() output, re-deriving only the id -> row index."""
+        table = cls()
+        for name in COLUMNS:
+            setattr(table, name, columns[name])
+        table.extras = {row: extras for row, extras in meta["extras"]}
+        for value in meta["type_codes"]:
+            table.type_codes.encode(value)
+        for value in meta["status_codes"]:
+            table.status_codes.encode(value)
+        table._free = list(meta["free"])
+        # Free rows and rows whose id is kept in the extras have blank id bytes.
+        ids = bytes(table.ids)
+        size = len(table.order)
+        table._rows = dict(zip(map(ids.__getitem__, map(slice, range(0, size * ID_BYTES, ID_BYTES),
+                                                        range(ID_BYTES, (size + 1) * ID_BYTES, ID_BYTES))),
+                               range(size)))
+        table._rows.pop(_EMPTY_ID, None)
+        table._rows.update((extras["id"], row) for row, extras in table.extras.items() if "id" in extras)
+        return table
+
+    def insert(self, tx):
+        """Store a transaction dict (which must carry an 'id') and return its row."""
+        if self._free:
+            row = self._free.pop()
+        else:
+            row = len(self.order)
+            self.ids.extend(_EMPTY_ID)
+            self.addresses.extend(_EMPTY_ADDRESS)
+            for column in (self.types, self.statuses, self.amounts, self.amount_kinds,
+                           self.mev_boost, self.roles, self.order):
+                column.append(0)
+        extras = {field: value for field, value in tx.items() if field not in COLUMN_FIELDS}
+        self.roles[row] = 0
+        for code, field in enumerate(ROLE_FIELDS, start=1):
+            value = extras.get(field)
+            if isinstance(value, str) and LOWER_ADDRESS_PATTERN.fullmatch(value):
+                self.roles[row] = code
+                self.addresses[row * ADDRESS_BYTES:(row + 1) * ADDRESS_BYTES] = bytes.fromhex(value[2:])
+                del extras[field]
+                break
+
+        tx_id = tx["id"]
+        key = id_key(tx_id)
+        if isinstance(key, bytes):
+            self.ids[row * ID_BYTES:(row + 1) * ID_BYTES] = key
+        else:
+            self.ids[row * ID_BYTES:(row + 1) * ID_BYTES] = _EMPTY_ID
+            extras["id"] = tx_id
+        self._set_code(self.types, self.type_codes, row, "type", tx, extras)
+        self._set_code(self.statuses, self.status_codes, row, "status", tx, extras)
+        self._set_amount(row, tx, extras)
+        self._set_mev_boost(row, tx, extras)
+        self.order[row] = 0
+        if extras:
+            self.extras[row] = extras
+        self._rows[key] = row
+        return row
+
+    def delete(self, row):
+        extras = self.extras.get(row)
+        if extras and "id" in extras:
+            del self._rows[extras["id"]]
+        else:
+            del self._rows[bytes(self.ids[row * ID_BYTES:(row + 1) * ID_BYTES])]
+        self.extras.pop(row, None)
+        # Reset the columns so aggregates over the raw arrays skip free rows.
+        self.ids[row * ID_BYTES:(row + 1) * ID_BYTES] = _EMPTY_ID
+        self.types[row] = self.statuses[row] = self.roles[row] = 0
+        self.amount_kinds[row] = AMOUNT_ABSENT
+        self.amounts[row] = math.nan
+        self.order[row] = 0
+        self._free.append(row)
+
+    def tx_id(self, row):
+        extras = self.extras.get(row)
+        if extras and "id" in extras:
+            return extras["id"]
+        return format_id(self.ids[row * ID_BYTES:(row + 1) * ID_BYTES])
+
+    def tx_type(self, row):
+        return self._get_code(self.types, self.type_codes, row, "type")
+
+    def status(self, row):
+        return self._get_code(self.statuses, self.status_codes, row, "status")
+
+    def set_status(self, row, status):
+        extras = self.extras.setdefault(row, {})
+        self._set_code(self.statuses, self.status_codes, row, "status", {"status": status}, extras)
+        if not extras:
+            del self.extras[row]
+
+    def amount(self, row):
+        """Numeric amount of a row, or None if it is missing or not a finite number."""
+        if self.amount_kinds[row] == AMOUNT_ABSENT:
+            return None
+        value = self.amounts[row]
+        return value if math.isfinite(value) else None
+
+    def address_keys(self, row):
+        """Index keys of every participant address of a row."""
+        keys = []
+        if self.roles[row]:
+            keys.append(bytes(self.addresses[row * ADDRESS_BYTES:(row + 1) * ADDRESS_BYTES]))
+        extras = self.extras.get(row)
+        if extras:
+            for field in ADDRESS_FIELDS.intersection(extras):
+                value = extras[field]
+                if isinstance(value, str):
+                    keys.append(address_key(value))
+        return keys
+
+    def materialize(self, row, fields=None):
+        """Build the transaction dict for a row (only the given fields, if any)."""
+        tx = {}
+        type_code = self.types[row]
+        if type_code:
+            tx["type"] = self.type_codes.decode(type_code)
+        role = self.roles[row]
+        if role:
+            address = self.addresses[row * ADDRESS_BYTES:(row + 1) * ADDRESS_BYTES]
+            tx[ROLE_FIELDS[role - 1]] = "0x" + address.hex()
+        kind = self.amount_kinds[row]
+        if kind == AMOUNT_FLOAT:
+            tx["amount"] = self.amounts[row]
+        elif kind == AMOUNT_INT:
+            tx["amount"] = int(self.amounts[row])
+        elif kind == AMOUNT_FLOAT_STR:
+            tx["amount"] = repr(self.amounts[row])
+        elif kind == AMOUNT_INT_STR:
+            tx["amount"] = str(int(self.amounts[row]))
+        mev = self.mev_boost[row]
+        if mev == MEV_TRUE or mev == MEV_FALSE:
+            tx["mev_boost"] = mev == MEV_TRUE
+        extras = self.extras.get(row)
+        if extras:
+            tx.update(extras)
+        if "id" not in tx:
+            tx["id"] = format_id(self.ids[row * ID_BYTES:(row + 1) * ID_BYTES])
+        status_code = self.statuses[row]
+        if status_code:
+            tx["status"] = self.status_codes.decode(status_code)
+        if fields is not None:
+            return {field: tx[field] for field in fields if field in tx}
+        return tx
+
+    def _set_code(self, column, codebook, row, field, tx, extras):
+        if field not in tx:
+            column[row] = 0
+            return
+        value = tx[field]
+        code = codebook.encode(value)
+        if code:
+            column[row] = code
+            extras.pop(field, None)
+        else:
+            column[row] = 0
+            extras[field] = value
+
+    def _get_code(self, column, codebook, row, field):
+        code = column[row]
+        if code:
+            return codebook.decode(code)
+        extras = self.extras.get(row)
+        return extras.get(field) if extras else None
+
+    def _set_amount(self, row, tx, extras):
+        if "amount" not in tx:
+            self.amount_kinds[row] = AMOUNT_ABSENT
+            self.amounts[row] = math.nan
+            return
+        value = tx["amount"]
+        if isinstance(value, float):
+            self.amount_kinds[row] = AMOUNT_FLOAT
+            self.amounts[row] = value
+        elif isinstance(value, int) and not isinstance(value, bool) and abs(value) < 2 ** 53:
+            self.amount_kinds[row] = AMOUNT_INT
+            self.amounts[row] = value
+        else:
+            try:
+                number = float(value)
+            except (TypeError, ValueError, OverflowError):
+                number = math.nan
+            self.amounts[row] = number
+            if isinstance(value, str) and math.isfinite(number):
+                if repr(number) == value:
+                    self.amount_kinds[row] = AMOUNT_FLOAT_STR
+                    return
+                if number.is_integer() and abs(number) < 2 ** 53 and str(int(number)) == value:
+                    self.amount_kinds[row] = AMOUNT_INT_STR
+                    return
+            # Other strings and values keep their exact JSON form in the extras; the
+            # column still holds the parsed number for indexing and aggregates.
+            self.amount_kinds[row] = AMOUNT_RAW
+            extras["amount"] = value
+
+    def _set_mev_boost(self, row, tx, extras):
+        value = tx.get("mev_boost", None)
+        if "mev_boost" not in tx:
+            self.mev_boost[row] = MEV_ABSENT
+        elif value is True or value is False:
+            self.mev_boost[row] = MEV_TRUE if value else MEV_FALSE
+        else:
+            self.mev_boost[row] = MEV_RAW
+            extras["mev_boost"] = value
@@ -1,19 +1,142 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
 from flask_cors import CORS
 import uuid
 import re
+import os
+import json
 import threading
 import time
+from store import MempoolStore, MempoolFull, parse_amount
+from scheduler import ExecutionScheduler
+from broadcast import EventBroadcaster
+from archive import TransactionArchive
+from wal import WriteAheadLog, load_snapshot, read_log, write_snapshot
 
 app = Flask(__name__)
 CORS(app)
 
-# A simple in-memory mempool where keys are transaction IDs.
-mempool = {}
+# Number of change events kept for GET /transaction/changes.
+CHANGE_LOG_SIZE = int(os.environ.get("MEMPOOL_CHANGE_LOG_SIZE", 100000))
+
+# Retention policy: pending transactions beyond MAX_PENDING are rejected, and executed
+# transactions are moved to the on-disk archive once they are older than EXECUTED_TTL
+# seconds or outnumber MAX_EXECUTED (oldest first).
+MAX_PENDING = int(os.environ.get("MEMPOOL_MAX_PENDING", 100000))
+EXECUTED_TTL = float(os.environ.get("MEMPOOL_EXECUTED_TTL", 3600))
+MAX_EXECUTED = int(os.environ.get("MEMPOOL_MAX_EXECUTED", 100000))
+RETENTION_INTERVAL = float(os.environ.get("MEMPOOL_RETENTION_INTERVAL", 5))
+
+# Directory for files the mempool persists (archive, snapshot and write-ahead log).
+DATA_DIR = os.environ.get("MEMPOOL_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+# Persistence: every change is appended to a write-ahead log, and a compacted snapshot
+# is written every SNAPSHOT_INTERVAL seconds so a restart only replays the log tail.
+PERSIST = os.environ.get("MEMPOOL_PERSIST", "1") == "1"
+SNAPSHOT_INTERVAL = float(os.environ.get("MEMPOOL_SNAPSHOT_INTERVAL", 60))
+SNAPSHOT_PATH = os.path.join(DATA_DIR, "snapshot.bin")
+WAL_DIR = os.path.join(DATA_DIR, "wal")
+
+# In-memory mempool stored column-wise, with secondary indexes for filtering.
+mempool = MempoolStore(change_log_size=CHANGE_LOG_SIZE, max_pending=MAX_PENDING)
+
+# Executed transactions evicted from memory stay fetchable by id from here.
+archive = TransactionArchive(os.path.join(DATA_DIR, "archive.jsonl"))
+
+# Per-subscriber event buffer for GET /transaction/stream; slower consumers are dropped.
+STREAM_BUFFER_SIZE = int(os.environ.get("MEMPOOL_STREAM_BUFFER", 1000))
+
+# Most transactions sent in a stream's initial (or reset) snapshot; the newest are kept.
+STREAM_SNAPSHOT_SIZE = int(os.environ.get("MEMPOOL_STREAM_SNAPSHOT", 1000))
+
+# Seconds between keep-alive comments on an idle event stream.
+STREAM_HEARTBEAT = 15
+
+broadcaster = EventBroadcaster(STREAM_BUFFER_SIZE)
+mempool.add_listener(broadcaster.publish)
+
+# Seconds an unboosted transaction stays pending before it is executed.
+EXECUTION_DELAY = float(os.environ.get("MEMPOOL_EXECUTION_DELAY", 10))
+
+# Largest number of transactions accepted by one POST /transaction/batch.
+MAX_BATCH_SIZE = 50000
+
+# Largest page returned by GET /transaction?limit=...
+MAX_PAGE_SIZE = 10000
+
+ADDRESS_PATTERN = re.compile(r"0x[a-fA-F0-9]{40}")
+
+# Identifies this process in ETags, so versions from before a restart never match.
+INSTANCE_ID = uuid.uuid4().hex[:8]
+
+# Statuses a transaction can be moved to with PATCH /transaction/<id>.
+TRANSACTION_STATUSES = ("pending", "executed")
 
 # Simple address validation (Ethereum-style address: starts with "0x" followed by 40 hex digits)
 def is_valid_address(address):
-    return isinstance(address, str) and re.fullmatch(r"0x[a-fA-F0-9]{40}", address)
+    return isinstance(address, str) and ADDRESS_PATTERN.fullmatch(address)
+
+def validate_transaction(data):
+    """Return an error message for an invalid transaction payload, or None if it is valid."""
+    tx_type = data.get("type")
+    if tx_type is not None and not isinstance(tx_type, str):
+        return 'type must be a string'
+    # Validate addresses based on transaction type
+    if tx_type in ["buy", "sell"]:
+        # For buy, require a valid buyer address; for sell, require a valid seller address.
+        address_field = "buyer" if tx_type == "buy" else "seller"
+        if not is_valid_address(data.get(address_field, "")):
+            return f'Invalid {address_field} address'
+    elif tx_type in ["add_liquidity", "remove_liquidity"]:
+        # For liquidity transactions, require a valid provider address.
+        if not is_valid_address(data.get("provider", "")):
+            return 'Invalid provider address'
+    else:
+        # Optionally validate generic "from" and "to" addresses if provided.
+        if "from" in data and not is_valid_address(data.get("from", "")):
+            return 'Invalid from address'
+        if "to" in data and not is_valid_address(data.get("to", "")):
+            return 'Invalid to address'
+    return None
+
+def prepare_transaction(data):
+    """Assign a fresh transaction ID and the initial status to a validated payload."""
+    # Generate a unique transaction ID.
+    data['id'] = str(uuid.uuid4())
+    # Check for MEV boost flag. If True, execute immediately; if False, delay execution.
+    data["status"] = "executed" if data.get("mev_boost", False) else "pending"
+    return data
+
+def mempool_version():
+    """ETag value for the current mempool contents; it changes with every mutation."""
+    return f"{INSTANCE_ID}-{mempool.seq}"
+
+def conditional_response(version, build):
+    """
+    Answer a GET with 304 Not Modified if the client already holds `version` (its
+    If-None-Match header), otherwise with build() tagged with that version.
+    """
+    if request.if_none_match.contains(version):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def validate_status_update(data):
+    """Return an error message for an invalid status update payload, or None if it is valid."""
+    if data.get("status") not in TRANSACTION_STATUSES:
+        return f'status must be one of: {", ".join(TRANSACTION_STATUSES)}'
+    if data.get("expected_status") not in (None,) + TRANSACTION_STATUSES:
+        return f'expected_status must be one of: {", ".join(TRANSACTION_STATUSES)}'
+    return None
+
+def reschedule(tx):
+    """Keep the execution timer in line with a transaction's new status."""
+    if tx["status"] == "pending":
+        scheduler.schedule(tx["id"])
+    else:
+        scheduler.cancel(tx["id"])
 
 @app.route('/')
 def index():
@@ -21,67 +144,414 @@ def index():
 
 def execute_transaction(tx_id):
     """Function to update the status of a pending transaction to 'executed'."""
-    if tx_id in mempool:
-        mempool[tx_id]["status"] = "executed"
+    _, applied = mempool.compare_and_set_status(tx_id, "pending", "executed")
+    if applied:
         print(f"Transaction {tx_id} executed after delay.")
 
+# One worker thread drains every pending execution timer.
+scheduler = ExecutionScheduler(execute_transaction, EXECUTION_DELAY).start()
+
+def enforce_retention():
+    """Periodically archive executed transactions that fall outside the retention policy."""
+    while True:
+        time.sleep(RETENTION_INTERVAL)
+        try:
+            evicted = mempool.evict_executed(archive.append_many,
+                                             executed_before=time.time() - EXECUTED_TTL,
+                                             keep=MAX_EXECUTED)
+            if evicted:
+                print(f"Archived {len(evicted)} executed transactions.")
+        except Exception as e:
+            print("Error enforcing mempool retention:", e)
+
+threading.Thread(target=enforce_retention, name="mempool-retention", daemon=True).start()
+
+def recover():
+    """Rebuild the mempool from the latest snapshot plus the write-ahead log tail."""
+    started = time.time()
+    snapshot_seq, image = load_snapshot(SNAPSHOT_PATH)
+    if image is not None:
+        mempool.restore(snapshot_seq, image)
+    restored = len(mempool)
+    replayed = 0
+    for event in read_log(WAL_DIR, snapshot_seq):
+        mempool.replay(event)
+        replayed += 1
+    # Pending transactions get a fresh execution delay after a restart.
+    scheduler.schedule_many([tx["id"] for tx in mempool.query(status="pending")])
+    print(f"Recovered {len(mempool)} transactions ({restored} from snapshot, "
+          f"{replayed} log events) in {time.time() - started:.3f}s.")
+    return snapshot_seq
+
+def take_snapshots(wal, snapshot_seq):
+    """Periodically snapshot the mempool and drop the log segments it covers."""
+    while True:
+        time.sleep(SNAPSHOT_INTERVAL)
+        if mempool.seq == snapshot_seq:
+            continue
+        try:
+            snapshot_seq, image = mempool.export(on_cut=wal.rotate)
+            write_snapshot(SNAPSHOT_PATH, snapshot_seq, image)
+            wal.discard_before(snapshot_seq)
+        except Exception as e:
+            print("Error writing mempool snapshot:", e)
+
+wal = None
+if PERSIST:
+    last_snapshot_seq = recover()
+    wal = WriteAheadLog(WAL_DIR, mempool.seq + 1).start()
+    mempool.add_listener(wal.append)
+    threading.Thread(target=take_snapshots, args=(wal, last_snapshot_seq),
+                     name="mempool-snapshot", daemon=True).start()
+
+def commit():
+    """
+    Group commit: wait until the caller's changes are durable in the write-ahead log.
+    Returns a 503 response if they could not be made durable, otherwise None.
+    """
+    if wal is not None and not wal.wait_durable(mempool.seq):
+        return jsonify({'error': 'Change applied but not yet durable in the write-ahead log'}), 503
+    return None
+
 @app.route('/transaction', methods=['GET', 'POST'])
 def transactions():
     if request.method == 'GET':
-        # List all transactions
-        return jsonify(list(mempool.values())), 200
+        # List transactions, optionally filtered by type, status, address and amount range.
+        filters = {
+            'tx_type': request.args.get('type'),
+            'status': request.args.get('status'),
+            'address': request.args.get('address'),
+        }
+        for param in ('min_amount', 'max_amount'):
+            value = request.args.get(param)
+            if value is not None:
+                filters[param] = parse_amount(value)
+                if filters[param] is None:
+                    return jsonify({'error': f'Invalid {param}'}), 400
+
+        # Keyset pagination: ?limit=N&after=<seq or transaction id>. The cursor for the
+        # next page is returned in the X-Next-Cursor header.
+        limit = request.args.get('limit')
+        if limit is not None:
+            if not limit.isdigit() or int(limit) < 1:
+                return jsonify({'error': 'limit must be a positive integer'}), 400
+            filters['limit'] = min(int(limit), MAX_PAGE_SIZE)
+        after = request.args.get('after')
+        if after is not None:
+            filters['after'] = int(after) if after.isdigit() else mempool.position(after)
+            if filters['after'] is None:
+                return jsonify({'error': 'Unknown after cursor'}), 400
+
+        # Field projection: ?fields=id,type,amount,status returns only those keys.
+        fields = request.args.get('fields')
+        if fields:
+            filters['fields'] = [f for f in fields.split(',') if f]
+
+        # The version is read before the query: if a change slips in between, the
+        # client just refetches on its next conditional request.
+        def build():
+            rows, cursor = mempool.page(**filters)
+            response = jsonify(rows)
+            if cursor is not None:
+                response.headers['X-Next-Cursor'] = str(cursor)
+            return response
+
+        return conditional_response(mempool_version(), build)
     elif request.method == 'POST':
         data = request.get_json()
         if not data:
             return jsonify({'error': 'No transaction data provided'}), 400
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Transaction must be a JSON object'}), 400
 
-        tx_type = data.get("type")
-        # Validate addresses based on transaction type
-        if tx_type in ["buy", "sell"]:
-            # For buy, require a valid buyer address; for sell, require a valid seller address.
-            address_field = "buyer" if tx_type == "buy" else "seller"
-            if not is_valid_address(data.get(address_field, "")):
-                return jsonify({'error': f'Invalid {address_field} address'}), 400
-        elif tx_type in ["add_liquidity", "remove_liquidity"]:
-            # For liquidity transactions, require a valid provider address.
-            if not is_valid_address(data.get("provider", "")):
-                return jsonify({'error': 'Invalid provider address'}), 400
-        else:
-            # Optionally validate generic "from" and "to" addresses if provided.
-            if "from" in data and not is_valid_address(data.get("from", "")):
-                return jsonify({'error': 'Invalid from address'}), 400
-            if "to" in data and not is_valid_address(data.get("to", "")):
-                return jsonify({'error': 'Invalid to address'}), 400
-
-        # Generate a unique transaction ID and store the transaction.
-        tx_id = str(uuid.uuid4())
-        data['id'] = tx_id
-
-        # Check for MEV boost flag. If True, execute immediately; if False, delay execution.
-        mev_boost = data.get("mev_boost", False)
-        if mev_boost:
-            data["status"] = "executed"
-        else:
-            data["status"] = "pending"
-            # Schedule status update after 10 seconds.
-            threading.Timer(10, execute_transaction, args=(tx_id,)).start()
+        error = validate_transaction(data)
+        if error:
+            return jsonify({'error': error}), 400
 
-        mempool[tx_id] = data
+        prepare_transaction(data)
+        try:
+            mempool.add(data)
+        except MempoolFull as e:
+            return jsonify({'error': str(e)}), 503
+        if data["status"] == "pending":
+            # Schedule status update after EXECUTION_DELAY seconds.
+            scheduler.schedule(data["id"])
+        error = commit()
+        if error:
+            return error
         return jsonify({'message': 'Transaction added', 'transaction': data}), 201
 
+@app.route('/transaction/batch', methods=['POST'])
+def transaction_batch():
+    """
+    Submit many transactions in one request. The body is a JSON array of transactions,
+    or NDJSON (one transaction per line) with Content-Type application/x-ndjson.
+    Valid transactions are inserted together under one lock and scheduled in one
+    scheduler operation. The response has one result per item, in order: either
+    {"id", "status"} or {"error"}.
+    """
+    if request.mimetype == 'application/x-ndjson':
+        try:
+            items = [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        except ValueError:
+            return jsonify({'error': 'Invalid NDJSON body'}), 400
+    else:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            return jsonify({'error': 'Expected a JSON array of transactions'}), 400
+    if not items:
+        return jsonify({'error': 'No transaction data provided'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch exceeds {MAX_BATCH_SIZE} transactions'}), 413
+
+    results = []
+    valid = []
+    for data in items:
+        error = validate_transaction(data) if isinstance(data, dict) else 'Transaction must be a JSON object'
+        if error:
+            results.append({'error': error})
+            continue
+        prepare_transaction(data)
+        valid.append(data)
+        results.append({'id': data['id'], 'status': data['status']})
+
+    accepted = mempool.add_many(valid)
+    if len(accepted) < len(valid):
+        # Pending transactions beyond the pending limit were not inserted.
+        inserted = {tx['id'] for tx in accepted}
+        results = [r if 'error' in r or r['id'] in inserted else {'error': 'Mempool is full'}
+                   for r in results]
+    scheduler.schedule_many([tx['id'] for tx in accepted if tx['status'] == 'pending'])
+    error = commit()
+    if error:
+        return error
+    return jsonify({
+        'added': len(accepted),
+        'failed': len(items) - len(accepted),
+        'results': results
+    }), 201 if accepted else 400
+
+@app.route('/transaction/batch', methods=['PATCH'])
+def transaction_batch_update():
+    """
+    Change the status of many transactions in one request. The body is a JSON array
+    of {"id", "status", "expected_status"} objects, applied in order under one lock
+    as in PATCH /transaction/<id>. The response has one result per item: either
+    {"id", "status"} or {"error"} (with the current status on a conflict).
+    """
+    items = request.get_json(silent=True)
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Expected a non-empty JSON array of status updates'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch exceeds {MAX_BATCH_SIZE} updates'}), 413
+
+    results = [None] * len(items)
+    positions = []
+    updates = []
+    for i, data in enumerate(items):
+        if not isinstance(data, dict) or not isinstance(data.get('id'), str):
+            results[i] = {'error': 'Update must be a JSON object with an id'}
+            continue
+        error = validate_status_update(data)
+        if error:
+            results[i] = {'id': data['id'], 'error': error}
+            continue
+        positions.append(i)
+        updates.append((data['id'], data.get('expected_status'), data['status']))
+
+    updated = 0
+    for i, (tx, applied) in zip(positions, mempool.compare_and_set_many(updates)):
+        tx_id = items[i]['id']
+        if tx is None:
+            results[i] = {'id': tx_id, 'error': 'Transaction not found'}
+        elif not applied:
+            results[i] = {'id': tx_id, 'error': 'Status mismatch', 'status': tx['status']}
+        else:
+            reschedule(tx)
+            results[i] = {'id': tx_id, 'status': tx['status']}
+            updated += 1
+    error = commit()
+    if error:
+        return error
+    return jsonify({
+        'updated': updated,
+        'failed': len(items) - updated,
+        'results': results
+    }), 200
+
+@app.route('/transaction/aggregate', methods=['GET'])
+def transaction_aggregate():
+    """Count and total amount of the transactions matching ?type= and ?status=."""
+    return conditional_response(mempool_version(), lambda: jsonify(
+        mempool.aggregate(request.args.get('type'), request.args.get('status'))))
+
+@app.route('/transaction/changes', methods=['GET'])
+def transaction_changes():
+    """
+    Incremental change feed. Returns the insert, status-change and delete events after
+    the `since` cursor together with the new cursor. When the cursor is too old for the
+    retained log, the response has "reset": true and a full snapshot to resync from.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', 1000))
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    if since < 0 or limit < 1:
+        return jsonify({'error': 'since must be >= 0 and limit >= 1'}), 400
+    return jsonify(mempool.changes(since, min(limit, 10000), on_cut=archive_position)), 200
+
+def archive_position(seq):
+    """
+    Snapshot field: how far the archive reaches at the snapshot's cursor. Evicted
+    transactions are archived under the store lock, so the snapshot's transactions and
+    the archive up to this offset hold every transaction exactly once.
+    """
+    return {"archive_offset": archive.size}
+
+@app.route('/transaction/archive', methods=['GET'])
+def transaction_archive():
+    """
+    Page through the archived transactions in archive order: ?offset= (0, or the
+    next_offset of the previous page), ?end= (stop at this offset, e.g. a snapshot's
+    archive_offset) and ?limit= (default 1000, at most 10000).
+    """
+    try:
+        offset = int(request.args.get('offset', 0))
+        end = request.args.get('end')
+        end = None if end is None else int(end)
+        limit = int(request.args.get('limit', 1000))
+    except ValueError:
+        return jsonify({'error': 'offset, end and limit must be integers'}), 400
+    if limit < 1:
+        return jsonify({'error': 'limit must be >= 1'}), 400
+    try:
+        txs, next_offset = archive.read(offset, end, min(limit, 10000))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'transactions': txs, 'next_offset': next_offset, 'size': archive.size}), 200
+
+def stream_event_name(event):
+    """SSE event name for a change event: added, executed, updated, removed or archived."""
+    if event["op"] == "updated" and event["transaction"].get("status") == "executed":
+        return "executed"
+    return event["op"]
+
+def format_sse(event_name, data, event_id=None):
+    message = f"event: {event_name}\ndata: {json.dumps(data)}\n\n"
+    return f"id: {event_id}\n{message}" if event_id is not None else message
+
+@app.route('/transaction/stream', methods=['GET'])
+def transaction_stream():
+    """
+    Server-Sent Events stream of mempool changes (added, executed, updated, removed,
+    archived).
+    A reconnecting client (Last-Event-ID header or ?since=<seq>) is replayed from the
+    change log. With ?snapshot=1, a fresh client first receives a "snapshot" event
+    holding the newest STREAM_SNAPSHOT_SIZE transactions (and the pool's "total"), so it
+    can render without a separate GET. A client too far behind for a replay gets such a
+    snapshot too.
+    """
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    want_snapshot = request.args.get('snapshot') == '1'
+    try:
+        since = int(since) if since is not None else None
+    except ValueError:
+        return jsonify({'error': 'since must be an integer'}), 400
+
+    # Subscribe before reading the backlog so that no event falls in between.
+    subscriber = broadcaster.subscribe()
+    if since is not None:
+        backlog = mempool.changes(since, on_cut=archive_position, snapshot_limit=STREAM_SNAPSHOT_SIZE)
+    elif want_snapshot:
+        backlog = mempool.snapshot(archive_position, STREAM_SNAPSHOT_SIZE)
+    else:
+        backlog = {"reset": False, "cursor": mempool.seq, "changes": []}
+
+    def generate():
+        try:
+            cursor = backlog["cursor"]
+            if backlog["reset"]:
+                yield format_sse("snapshot", backlog, cursor)
+            else:
+                for event in backlog["changes"]:
+                    yield format_sse(stream_event_name(event), event, event["seq"])
+            while not subscriber.dropped:
+                event = subscriber.get(timeout=STREAM_HEARTBEAT)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                elif event["seq"] > cursor:
+                    yield format_sse(stream_event_name(event), event, event["seq"])
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/transaction/<tx_id>', methods=['GET'])
 def fetch_transaction(tx_id):
-    transaction = mempool.get(tx_id)
+    version = mempool_version()
+    transaction = mempool.get(tx_id) or archive.get(tx_id)
     if not transaction:
         return jsonify({'error': 'Transaction not found'}), 404
-    return jsonify(transaction), 200
+    return conditional_response(version, lambda: jsonify(transaction))
+
+@app.route('/transaction/<tx_id>', methods=['PATCH'])
+def update_transaction(tx_id):
+    """
+    Atomically change a transaction's status. The body is {"status": ...} plus an
+    optional "expected_status": the change only happens if the transaction is still
+    in that status (compare-and-set), otherwise the response is 409 with the
+    transaction as it currently is. The execution timer follows the new status.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'No status update provided'}), 400
+    error = validate_status_update(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    tx, applied = mempool.compare_and_set_status(tx_id, data.get('expected_status'), data['status'])
+    if tx is None:
+        return jsonify({'error': 'Transaction not found'}), 404
+    if not applied:
+        return jsonify({'error': 'Status mismatch', 'transaction': tx}), 409
+    reschedule(tx)
+    error = commit()
+    if error:
+        return error
+    return jsonify({'message': 'Transaction updated', 'transaction': tx}), 200
 
 @app.route('/transaction/<tx_id>', methods=['DELETE'])
 def remove_transaction(tx_id):
-    if tx_id in mempool:
-        del mempool[tx_id]
+    if mempool.remove(tx_id) is not None:
+        scheduler.cancel(tx_id)
+        error = commit()
+        if error:
+            return error
         return jsonify({'message': 'Transaction removed'}), 200
     return jsonify({'error': 'Transaction not found'}), 404
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Monitoring counters for the mempool."""
+    return jsonify({
+        'transactions': len(mempool),
+        'pending': mempool.count('pending'),
+        'executed': mempool.count('executed'),
+        'archived': len(archive),
+        'pending_timers': scheduler.pending_count(),
+        'stream_subscribers': broadcaster.subscriber_count(),
+        'stream_dropped': broadcaster.dropped_count,
+        'execution_delay': scheduler.delay,
+        'seq': mempool.seq,
+        'version': mempool_version(),
+        'wal_durable_seq': wal.durable_seq if wal else None,
+        'wal_commits': wal.commits if wal else None,
+        'wal_error': str(wal.error) if wal and wal.error else None
+    }), 200
+
 if __name__ == '__main__':
-    app.run(port=5000, debug=True)
+    # The reloader would start a second process recovering from and writing to the same
+    # write-ahead log, so it is disabled.
+    app.run(port=5000, debug=True, use_reloader=False)
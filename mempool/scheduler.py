@@ -0,0 +1,91 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class ExecutionScheduler:
+    """
+    Runs a callback for each scheduled key once its due time has passed.
+
+    All timers live in one min-heap keyed by due time and are drained by a single
+    worker thread, so the number of OS threads does not grow with the number of
+    pending transactions. Cancelled timers are dropped lazily when they reach the
+    top of the heap (the heap is compacted once they make up most of it).
+    """
+
+    def __init__(self, callback, delay):
+        self.delay = delay
+        self._callback = callback
+        self._heap = []
+        self._entries = {}
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="execution-scheduler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def schedule(self, key, delay=None):
+        """Run the callback for key after delay seconds (default: the scheduler's delay)."""
+        due = time.monotonic() + (self.delay if delay is None else delay)
+        with self._cond:
+            self._push(key, due)
+            if self._heap[0][2] == key:
+                self._cond.notify()
+
+    def schedule_many(self, keys, delay=None):
+        """Schedule several keys with the same delay under a single lock acquisition."""
+        if not keys:
+            return
+        due = time.monotonic() + (self.delay if delay is None else delay)
+        with self._cond:
+            for key in keys:
+                self._push(key, due)
+            self._cond.notify()
+
+    def cancel(self, key):
+        """Cancel the timer for key. Returns True if one was pending."""
+        with self._cond:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return False
+            entry[2] = None
+            if len(self._heap) > 64 and len(self._entries) < len(self._heap) // 2:
+                self._heap = [e for e in self._heap if e[2] is not None]
+                heapq.heapify(self._heap)
+            return True
+
+    def pending_count(self):
+        """Number of timers that have not fired or been cancelled yet."""
+        with self._cond:
+            return len(self._entries)
+
+    def _push(self, key, due):
+        old = self._entries.get(key)
+        if old is not None:
+            old[2] = None
+        entry = [due, next(self._counter), key]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    while self._heap and self._heap[0][2] is None:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    timeout = self._heap[0][0] - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+                _, _, key = heapq.heappop(self._heap)
+                del self._entries[key]
+            try:
+                self._callback(key)
+            except Exception as e:
+                print(f"Error running scheduled execution for {key}:", e)
@@ -0,0 +1,667 @@
+import bisect
+import itertools
+import math
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict, defaultdict, deque
+
+from columnar import ADDRESS_BYTES, ADDRESS_FIELDS, ColumnarTable, address_key
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; aggregates fall back to the indexes.
+    np = None
+
+
+def parse_amount(value):
+    """Return the amount as a float, or None if it is missing or not a finite number."""
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return None
+    return amount if math.isfinite(amount) else None
+
+
+class MempoolFull(Exception):
+    """Raised when a pending transaction would exceed the store's max_pending limit."""
+
+
+class SortedBuckets:
+    """
+    Rows sorted by amount, stored as a list of bounded sorted buckets so an insert or
+    delete only shifts one bucket instead of the whole index. Each bucket keeps its
+    amounts in an array('d') next to the list of row numbers.
+    """
+
+    BUCKET_SIZE = 1000
+
+    def __init__(self):
+        self._amounts = []
+        self._rows = []
+        self._maxes = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    @classmethod
+    def from_sorted(cls, amounts, rows):
+        """Build the index from amounts in (amount, row) order and their rows."""
+        buckets = cls()
+        for start in range(0, len(rows), cls.BUCKET_SIZE):
+            end = start + cls.BUCKET_SIZE
+            buckets._amounts.append(array("d", amounts[start:end]))
+            buckets._rows.append(rows[start:end])
+            buckets._maxes.append(buckets._amounts[-1][-1])
+        buckets._len = len(rows)
+        return buckets
+
+    def add(self, amount, row):
+        self._len += 1
+        if not self._rows:
+            self._amounts.append(array("d", [amount]))
+            self._rows.append([row])
+            self._maxes.append(amount)
+            return
+        i = min(bisect.bisect_left(self._maxes, amount), len(self._rows) - 1)
+        amounts, rows = self._amounts[i], self._rows[i]
+        j = bisect.bisect_right(amounts, amount)
+        amounts.insert(j, amount)
+        rows.insert(j, row)
+        if len(rows) > 2 * self.BUCKET_SIZE:
+            self._amounts.insert(i + 1, amounts[self.BUCKET_SIZE:])
+            self._rows.insert(i + 1, rows[self.BUCKET_SIZE:])
+            self._maxes.insert(i + 1, amounts[-1])
+            del amounts[self.BUCKET_SIZE:]
+            del rows[self.BUCKET_SIZE:]
+        self._maxes[i] = amounts[-1]
+
+    def remove(self, amount, row):
+        i = bisect.bisect_left(self._maxes, amount)
+        # Rows with an equal amount may span several buckets.
+        while i < len(self._rows):
+            amounts, rows = self._amounts[i], self._rows[i]
+            j = bisect.bisect_left(amounts, amount)
+            while j < len(rows) and amounts[j] == amount:
+                if rows[j] == row:
+                    del amounts[j]
+                    del rows[j]
+                    self._len -= 1
+                    if rows:
+                        self._maxes[i] = amounts[-1]
+                    else:
+                        del self._amounts[i], self._rows[i], self._maxes[i]
+                    return
+                j += 1
+            if j < len(rows):
+                return
+            i += 1
+
+    def irange(self, min_amount=None, max_amount=None):
+        """Yield the rows whose amount lies within [min_amount, max_amount]."""
+        i = 0 if min_amount is None else bisect.bisect_left(self._maxes, min_amount)
+        for amounts, rows in zip(itertools.islice(self._amounts, i, None),
+                                 itertools.islice(self._rows, i, None)):
+            j = 0 if min_amount is None else bisect.bisect_left(amounts, min_amount)
+            k = len(rows) if max_amount is None else bisect.bisect_right(amounts, max_amount)
+            yield from rows[j:k]
+            if k < len(rows):
+                return
+            min_amount = None
+
+
+class MempoolStore:
+    """
+    Thread-safe in-memory transaction store.
+
+    Transactions are kept in a ColumnarTable (typed columns indexed by row number) and
+    are only turned back into dicts when they are read. Besides the id -> row index,
+    the store keeps secondary indexes that are updated on every insert, delete and
+    status change:
+      - by type, by status and by participant address (rows),
+      - a sorted amount index per transaction type for range queries.
+    Queries start from the smallest matching index instead of scanning the pool.
+
+    Every mutation is also recorded in a bounded change log with a monotonically
+    increasing sequence number, so readers can follow the pool incrementally.
+
+    The number of pending transactions is capped by max_pending, and executed
+    transactions are kept in execution order so the oldest can be evicted cheaply.
+    """
+
+    def __init__(self, change_log_size=100000, max_pending=None):
+        self.max_pending = max_pending
+        self._lock = threading.RLock()
+        self._seq = 0
+        self._changes = deque(maxlen=change_log_size)
+        self._listeners = []
+        self._table = ColumnarTable()
+        # Ascending (insert seq, row) pairs for keyset pagination; the insert seq of a
+        # live row is in the table's order column, and stale pairs are compacted lazily.
+        self._order_seqs = array("q")
+        self._order_rows = array("q")
+        self._by_type = defaultdict(set)
+        self._by_status = defaultdict(set)
+        # Most addresses appear in a single transaction, so a lone row is stored as an
+        # int and only shared addresses get a set.
+        self._by_address = {}
+        self._amounts = defaultdict(SortedBuckets)
+        self._executed_at = OrderedDict()
+
+    def __len__(self):
+        return len(self._table)
+
+    def __contains__(self, tx_id):
+        return self._table.row_of(tx_id) is not None
+
+    @property
+    def seq(self):
+        """Sequence number of the latest mutation."""
+        return self._seq
+
+    def add_listener(self, listener):
+        """
+        Call listener(event) for every future change event. Listeners run under the
+        store lock, in sequence order, so they must be quick and must not block.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def get(self, tx_id):
+        with self._lock:
+            row = self._table.row_of(tx_id)
+            return None if row is None else self._table.materialize(row)
+
+    def all(self):
+        with self._lock:
+            return [self._table.materialize(row) for row in self._ordered_rows()]
+
+    def count(self, status):
+        """Number of transactions currently in the given status."""
+        return len(self._by_status.get(status, ()))
+
+    def position(self, tx_id):
+        """Insert sequence number of a transaction (its pagination cursor), or None."""
+        with self._lock:
+            row = self._table.row_of(tx_id)
+            return None if row is None else self._table.order[row]
+
+    def add(self, tx):
+        """
+        Insert a transaction (which must already carry its 'id').
+        Raises MempoolFull if it is pending and the pending limit has been reached.
+        """
+        with self._lock:
+            if (self.max_pending is not None and tx.get("status") == "pending"
+                    and self.count("pending") >= self.max_pending):
+                raise MempoolFull(f"Mempool already holds {self.max_pending} pending transactions")
+            row = self._apply_add(tx, time.time())
+            self._set_order(row, self._record("added", tx))
+            return tx
+
+    def add_many(self, txs):
+        """
+        Insert several transactions atomically (readers see all of them or none).
+        Pending transactions beyond the pending limit are skipped; the transactions
+        actually inserted are returned.
+        """
+        added = []
+        with self._lock:
+            for tx in txs:
+                try:
+                    added.append(self.add(tx))
+                except MempoolFull:
+                    continue
+            return added
+
+    def remove(self, tx_id):
+        """Delete a transaction. Returns the removed transaction or None."""
+        with self._lock:
+            row = self._table.row_of(tx_id)
+            if row is None:
+                return None
+            tx = self._table.materialize(row)
+            self._apply_remove(row)
+            self._record("removed", tx)
+            return tx
+
+    def set_status(self, tx_id, status):
+        """Change the status of a transaction, keeping the status index in sync."""
+        with self._lock:
+            row = self._table.row_of(tx_id)
+            if row is None:
+                return None
+            if self._table.status(row) != status:
+                self._apply_status(row, status, time.time())
+                tx = self._table.materialize(row)
+                self._record("updated", tx)
+                return tx
+            return self._table.materialize(row)
+
+    def compare_and_set_status(self, tx_id, expected, status):
+        """
+        Set the status of a transaction only if it currently is `expected` (any status
+        when expected is None), as one atomic step. Returns (transaction, applied), with
+        the transaction as it is afterwards, or (None, False) if the id is unknown.
+        """
+        with self._lock:
+            row = self._table.row_of(tx_id)
+            if row is None:
+                return None, False
+            if expected is not None and self._table.status(row) != expected:
+                return self._table.materialize(row), False
+            return self.set_status(tx_id, status), True
+
+    def compare_and_set_many(self, updates):
+        """
+        Apply (tx_id, expected, status) updates under a single lock acquisition.
+        Returns one (transaction, applied) result per update, in order.
+        """
+        with self._lock:
+            return [self.compare_and_set_status(tx_id, expected, status)
+                    for tx_id, expected, status in updates]
+
+    def evict_executed(self, archive, executed_before=None, keep=None):
+        """
+        Move executed transactions out of the store, oldest execution first: those
+        executed before the `executed_before` timestamp, then any beyond the newest
+        `keep`. They are handed to archive(txs) before being removed, and each
+        removal is recorded as an "archived" change. Returns the evicted transactions.
+        """
+        with self._lock:
+            rows = []
+            excess = 0 if keep is None else max(0, len(self._executed_at) - keep)
+            for row, executed_at in self._executed_at.items():
+                if len(rows) >= excess and (executed_before is None or executed_at >= executed_before):
+                    break
+                rows.append(row)
+            evicted = [self._table.materialize(row) for row in rows]
+            if not evicted:
+                return evicted
+            archive(evicted)
+            for row, tx in zip(rows, evicted):
+                self._apply_remove(row)
+                self._record("archived", tx)
+            return evicted
+
+    def export(self, on_cut=None):
+        """
+        Copy the store for a snapshot. Returns the sequence number the copy reflects
+        and (columns, meta): the table's column arrays plus the execution order and
+        insert order, and the rest as JSON-compatible data (see restore()).
+        on_cut(seq) is called under the store lock, so nothing can change in between.
+        Only whole arrays are copied under the lock; no rows are materialized.
+        """
+        with self._lock:
+            table = self._table.copy()
+            executed_rows = array("q", self._executed_at.keys())
+            executed_ts = array("d", self._executed_at.values())
+            order_seqs = self._order_seqs[:]
+            order_rows = self._order_rows[:]
+            seq = self._seq
+            if on_cut is not None:
+                on_cut(seq)
+        columns, meta = table.image()
+        columns.update(executed_rows=executed_rows, executed_ts=executed_ts,
+                       order_seqs=order_seqs, order_rows=order_rows)
+        return seq, (columns, meta)
+
+    def restore(self, seq, image):
+        """
+        Load export() output into an empty store, without change events. The columns
+        are taken over as they are and the secondary indexes are rebuilt from whole
+        columns (sorting and grouping rows by code) instead of row by row.
+        """
+        columns, meta = image
+        with self._lock:
+            table = self._table = ColumnarTable.from_image(columns, meta)
+            self._executed_at = OrderedDict(zip(columns["executed_rows"], columns["executed_ts"]))
+            self._order_seqs = columns["order_seqs"]
+            self._order_rows = columns["order_rows"]
+            amounts, kinds = table.amounts, table.amount_kinds
+            for tx_type, rows in self._group(table.types, table.type_codes, "type").items():
+                self._by_type[tx_type] = set(rows)
+                # Absent and non-finite amounts are not indexed (see ColumnarTable.amount).
+                rows = list(itertools.compress(rows, map(kinds.__getitem__, rows)))
+                rows = list(itertools.compress(rows, map(math.isfinite, map(amounts.__getitem__, rows))))
+                if rows:
+                    # A stable sort of rows in ascending order is the (amount, row) order.
+                    rows.sort(key=amounts.__getitem__)
+                    self._amounts[tx_type] = SortedBuckets.from_sorted(
+                        list(map(amounts.__getitem__, rows)), rows)
+            for status, rows in self._group(table.statuses, table.status_codes, "status").items():
+                self._by_status[status] = set(rows)
+            self._index_addresses()
+            self._seq = seq
+
+    def replay(self, event):
+        """
+        Re-apply a change event recovered from the write-ahead log. The event keeps
+        its sequence number and timestamp, and listeners are not notified.
+        """
+        with self._lock:
+            tx = event["transaction"]
+            if event["op"] == "added":
+                self._set_order(self._apply_add(tx, event["ts"]), event["seq"])
+            else:
+                row = self._table.row_of(tx["id"])
+                if row is not None:
+                    if event["op"] == "updated":
+                        self._apply_status(row, tx.get("status"), event["ts"])
+                    else:
+                        self._apply_remove(row)
+            self._seq = event["seq"]
+            self._changes.append(event)
+
+    def changes(self, since, limit=None, on_cut=None, snapshot_limit=None):
+        """
+        Return the change events recorded after sequence number `since`.
+
+        The result holds the events and the cursor to pass as `since` next time.
+        If `since` is older than the retained log (or ahead of it, e.g. after a
+        restart), the result is a reset carrying a snapshot instead (see snapshot()
+        for on_cut and snapshot_limit).
+        """
+        with self._lock:
+            oldest = self._changes[0]["seq"] if self._changes else self._seq + 1
+            if since > self._seq or since < oldest - 1:
+                return self.snapshot(on_cut, snapshot_limit)
+            start = since - oldest + 1
+            stop = len(self._changes) if limit is None else min(len(self._changes), start + limit)
+            events = list(itertools.islice(self._changes, start, stop))
+            cursor = events[-1]["seq"] if events else since
+            return {"reset": False, "cursor": cursor, "changes": events,
+                    "more": cursor < self._seq}
+
+    def query(self, tx_type=None, status=None, address=None, min_amount=None, max_amount=None):
+        """
+        Return the transactions matching every given filter, in insertion order.
+        Filters left as None are ignored; address matching is case-insensitive.
+        """
+        rows, _ = self.page(tx_type, status, address, min_amount, max_amount)
+        return rows
+
+    def page(self, tx_type=None, status=None, address=None, min_amount=None, max_amount=None,
+             after=None, limit=None, fields=None):
+        """
+        Keyset-paginated query. Returns up to `limit` matching transactions whose insert
+        sequence number is greater than `after`, and the cursor for the next page
+        (None when there are no further rows). With `fields`, only those keys of each
+        transaction are built.
+        """
+        with self._lock:
+            order = self._table.order
+            rows = self._matching_rows(tx_type, status, address, min_amount, max_amount)
+            if rows is None:
+                rows = self._rows_after(after, None if limit is None else limit + 1)
+            elif after is not None:
+                # Matching rows are in insert order; bisect their sequence numbers.
+                seqs = list(map(order.__getitem__, rows))
+                rows = rows[bisect.bisect_right(seqs, after):]
+            cursor = None
+            if limit is not None and len(rows) > limit:
+                rows = rows[:limit]
+                cursor = order[rows[-1]]
+            return [self._table.materialize(row, fields) for row in rows], cursor
+
+    def aggregate(self, tx_type=None, status=None):
+        """
+        Count and total amount of the transactions with the given type and status.
+        The sum runs over the amount column directly (vectorized when numpy is available).
+        """
+        with self._lock:
+            table = self._table
+            type_code = None if tx_type is None else table.type_codes.codes.get(tx_type)
+            status_code = None if status is None else table.status_codes.codes.get(status)
+            if np is not None and (tx_type is None or type_code) and (status is None or status_code):
+                amounts = np.frombuffer(table.amounts, dtype=np.float64)
+                mask = np.frombuffer(table.order, dtype=np.int64) > 0
+                if type_code:
+                    mask &= np.frombuffer(table.types, dtype=np.uint16) == type_code
+                if status_code:
+                    mask &= np.frombuffer(table.statuses, dtype=np.uint16) == status_code
+                count = int(np.count_nonzero(mask))
+                selected = amounts[mask]
+                total = float(selected[np.isfinite(selected)].sum())
+                return {"count": count, "total_amount": total}
+            candidates = self._matching_rows(tx_type, status, None, None, None)
+            if candidates is None:
+                candidates = table.rows()
+            count = 0
+            total = 0.0
+            for row in candidates:
+                count += 1
+                amount = table.amount(row)
+                if amount is not None:
+                    total += amount
+            return {"count": count, "total_amount": total}
+
+    def snapshot(self, on_cut=None, limit=None):
+        """
+        All transactions (or only the newest `limit`, still oldest first) together with
+        the cursor they are consistent with and the total number in the store.
+        on_cut(seq) is called under the store lock and the fields it returns are added
+        to the snapshot, so they describe the same moment.
+        """
+        with self._lock:
+            rows = self._ordered_rows() if limit is None else self._newest_rows(limit)
+            snapshot = {"reset": True, "cursor": self._seq, "total": len(self._table),
+                        "transactions": [self._table.materialize(row) for row in rows]}
+            if on_cut is not None:
+                snapshot.update(on_cut(self._seq))
+            return snapshot
+
+    def _group(self, column, codebook, field):
+        """Live rows by the value of a type or status code column, in ascending order."""
+        table = self._table
+        groups = {}
+        # Sorting all rows by code is stable, so every group stays in row order.
+        rows = sorted(range(len(column)), key=column.__getitem__)
+        for code, code_rows in itertools.groupby(rows, key=column.__getitem__):
+            if code:
+                groups[codebook.decode(code)] = list(code_rows)
+                continue
+            # Free rows have no code, and neither do values kept in the extras.
+            free = set(table._free)
+            for row in code_rows:
+                if row not in free:
+                    groups.setdefault(table.extras.get(row, {}).get(field), []).append(row)
+        return groups
+
+    def _index_addresses(self):
+        """Bulk-fill the address index."""
+        table = self._table
+        roles, extras = table.roles, table.extras
+        addresses = bytes(table.addresses)
+        # Free rows have no role.
+        rows = list(itertools.compress(range(len(roles)), roles))
+        starts = list(map(ADDRESS_BYTES.__mul__, rows))
+        keys = list(map(addresses.__getitem__, map(slice, starts, map(ADDRESS_BYTES.__add__, starts))))
+        by_address = self._by_address = dict(zip(keys, rows))
+        if len(by_address) < len(rows):
+            shared = {key for key, count in Counter(keys).items() if count > 1}
+            for key in shared:
+                by_address[key] = set()
+            for key, row in itertools.compress(zip(keys, rows), map(shared.__contains__, keys)):
+                by_address[key].add(row)
+        pairs = []
+        # Only rows with an address field in their extras have keys besides the role's.
+        for row, row_extras in extras.items():
+            if not ADDRESS_FIELDS.isdisjoint(row_extras):
+                row_keys = set(table.address_keys(row))
+                if roles[row]:
+                    row_keys.discard(addresses[row * ADDRESS_BYTES:(row + 1) * ADDRESS_BYTES])
+                pairs.extend((key, row) for key in row_keys)
+        for key, row in pairs:
+            rows_of_key = by_address.get(key)
+            if rows_of_key is None:
+                by_address[key] = row
+            elif isinstance(rows_of_key, int):
+                by_address[key] = {rows_of_key, row}
+            else:
+                rows_of_key.add(row)
+
+    def _record(self, op, tx):
+        self._seq += 1
+        event = {"seq": self._seq, "op": op, "id": tx["id"],
+                 "ts": time.time(), "transaction": dict(tx)}
+        self._changes.append(event)
+        for listener in self._listeners:
+            listener(event)
+        return self._seq
+
+    def _apply_add(self, tx, now):
+        # Type and status are index keys. They are checked before anything changes, so
+        # a transaction that cannot be indexed leaves no row behind.
+        for field in ("type", "status"):
+            try:
+                hash(tx.get(field))
+            except TypeError:
+                raise TypeError(f"Transaction {field} must be hashable") from None
+        row = self._table.row_of(tx["id"])
+        if row is not None:
+            self._apply_remove(row)
+        row = self._table.insert(tx)
+        self._index(row, now)
+        return row
+
+    def _apply_status(self, row, status, now):
+        self._discard(self._by_status, self._table.status(row), row)
+        self._table.set_status(row, status)
+        self._by_status[status].add(row)
+        self._track_executed(row, status, now)
+
+    def _apply_remove(self, row):
+        self._unindex(row)
+        self._table.delete(row)
+        self._compact_order()
+
+    def _set_order(self, row, seq):
+        self._table.order[row] = seq
+        self._order_seqs.append(seq)
+        self._order_rows.append(row)
+
+    def _ordered_rows(self):
+        return self._rows_after(None, None)
+
+    def _newest_rows(self, limit):
+        """The `limit` most recently inserted rows, in insertion order."""
+        order = self._table.order
+        rows = []
+        for seq, row in zip(reversed(self._order_seqs), reversed(self._order_rows)):
+            if len(rows) >= limit:
+                break
+            if order[row] == seq:
+                rows.append(row)
+        rows.reverse()
+        return rows
+
+    def _matching_rows(self, tx_type, status, address, min_amount, max_amount):
+        """Rows matching the filters in insertion order, or None if no filter is set."""
+        candidate_sets = []
+        if tx_type is not None:
+            candidate_sets.append(self._by_type.get(tx_type, set()))
+        if status is not None:
+            candidate_sets.append(self._by_status.get(status, set()))
+        if address is not None:
+            rows = self._by_address.get(address_key(address), set())
+            candidate_sets.append({rows} if isinstance(rows, int) else rows)
+
+        if min_amount is not None or max_amount is not None:
+            # The amount index is the most selective structure for range queries.
+            candidates = self._amount_range(tx_type, min_amount, max_amount)
+        elif candidate_sets:
+            candidate_sets.sort(key=len)
+            candidates = candidate_sets.pop(0)
+        else:
+            return None
+
+        matched = [row for row in candidates
+                   if all(row in s for s in candidate_sets)]
+        matched.sort(key=self._table.order.__getitem__)
+        return matched
+
+    def _rows_after(self, after, limit):
+        """Up to limit rows (all if None) inserted after sequence number `after`."""
+        order = self._table.order
+        rows = []
+        start = 0 if after is None else bisect.bisect_right(self._order_seqs, after)
+        for seq, row in zip(itertools.islice(self._order_seqs, start, None),
+                            itertools.islice(self._order_rows, start, None)):
+            if order[row] == seq:
+                rows.append(row)
+                if limit is not None and len(rows) >= limit:
+                    break
+        return rows
+
+    def _compact_order(self):
+        # Drop stale pairs once they make up half of the pagination arrays.
+        if len(self._order_seqs) > 64 and len(self._table) < len(self._order_seqs) // 2:
+            rows = self._rows_after(None, None)
+            self._order_seqs = array("q", [self._table.order[row] for row in rows])
+            self._order_rows = array("q", rows)
+
+    def _amount_range(self, tx_type, min_amount, max_amount):
+        types = [tx_type] if tx_type is not None else list(self._amounts)
+        rows = []
+        for t in types:
+            entries = self._amounts.get(t)
+            if entries:
+                rows.extend(entries.irange(min_amount, max_amount))
+        return rows
+
+    def _index(self, row, now):
+        table = self._table
+        tx_type = table.tx_type(row)
+        status = table.status(row)
+        self._by_type[tx_type].add(row)
+        self._by_status[status].add(row)
+        for key in set(table.address_keys(row)):
+            rows = self._by_address.get(key)
+            if rows is None:
+                self._by_address[key] = row
+            elif isinstance(rows, int):
+                self._by_address[key] = {rows, row}
+            else:
+                rows.add(row)
+        amount = table.amount(row)
+        if amount is not None:
+            self._amounts[tx_type].add(amount, row)
+        self._track_executed(row, status, now)
+
+    def _unindex(self, row):
+        table = self._table
+        tx_type = table.tx_type(row)
+        self._discard(self._by_type, tx_type, row)
+        self._discard(self._by_status, table.status(row), row)
+        self._executed_at.pop(row, None)
+        for key in set(table.address_keys(row)):
+            rows = self._by_address.get(key)
+            if isinstance(rows, int):
+                if rows == row:
+                    del self._by_address[key]
+            elif rows is not None:
+                rows.discard(row)
+                if len(rows) == 1:
+                    self._by_address[key] = rows.pop()
+        amount = table.amount(row)
+        entries = self._amounts.get(tx_type)
+        if amount is not None and entries:
+            entries.remove(amount, row)
+            if not entries:
+                del self._amounts[tx_type]
+
+    def _track_executed(self, row, status, now):
+        if status == "executed":
+            self._executed_at[row] = now if now is not None else time.time()
+        else:
+            self._executed_at.pop(row, None)
+
+    @staticmethod
+    def _discard(index, key, row):
+        rows = index.get(key)
+        if rows is not None:
+            rows.discard(row)
+            if not rows:
+                del index[key]
@@ -0,0 +1,220 @@
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from array import array
+
+SEGMENT_PATTERN = "wal-*.log"
+
+# Seconds between attempts to write a batch after a write or fsync failed.
+RETRY_DELAY = 1.0
+
+
+def _segment_path(directory, first_seq):
+    return os.path.join(directory, f"wal-{first_seq:020d}.log")
+
+
+def _segment_start(path):
+    return int(os.path.basename(path)[4:-4])
+
+
+def _segments(directory):
+    return sorted(glob.glob(os.path.join(directory, SEGMENT_PATTERN)), key=_segment_start)
+
+
+def _open_segment(path):
+    """
+    Open a segment for appending, cutting off a torn final line left by a crash. It is
+    unbuffered, so a failed write leaves nothing behind to be written later.
+    """
+    f = open(path, "ab+", buffering=0)
+    f.seek(0)
+    data = f.read()
+    if data and not data.endswith(b"\n"):
+        f.truncate(data.rfind(b"\n") + 1)
+    return f
+
+
+class _Rotate:
+    """Queue marker: start a new segment for the events that follow it."""
+
+    def __init__(self, first_seq):
+        self.first_seq = first_seq
+
+
+class WriteAheadLog:
+    """
+    Append-only log of mempool change events, written by one background thread.
+
+    append() only enqueues the event, so it is cheap enough to run under the store
+    lock. The writer drains everything queued since its last write and commits it
+    with one write and one fsync (group commit); wait_durable() blocks a caller until
+    its event is on disk. The log is split into segments at every snapshot so that
+    segments fully covered by a snapshot can be deleted.
+
+    A batch that fails to write is kept and retried until it succeeds; meanwhile
+    `error` holds the failure and wait_durable() returns False instead of blocking.
+    """
+
+    def __init__(self, directory, next_seq):
+        self.directory = directory
+        self.durable_seq = next_seq - 1
+        self.commits = 0
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+        self._queue = queue.Queue()
+        self._cond = threading.Condition()
+        self._file = _open_segment(_segment_path(directory, next_seq))
+        self._thread = threading.Thread(target=self._run, name="mempool-wal", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def append(self, event):
+        self._queue.put(event)
+
+    def rotate(self, snapshot_seq):
+        """Start a new segment after the event with sequence number snapshot_seq."""
+        self._queue.put(_Rotate(snapshot_seq + 1))
+
+    def wait_durable(self, seq, timeout=5):
+        """
+        Block until every event up to seq has been fsynced. Returns False on timeout or
+        while the log cannot be written.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.durable_seq >= seq or self.error is not None, timeout)
+            return self.durable_seq >= seq
+
+    def discard_before(self, snapshot_seq):
+        """Delete segments whose events are all covered by the snapshot at snapshot_seq."""
+        paths = _segments(self.directory)
+        for path, next_path in zip(paths, paths[1:]):
+            if _segment_start(next_path) <= snapshot_seq + 1:
+                os.remove(path)
+
+    def _run(self):
+        batch = []
+        while True:
+            if not batch:
+                batch.append(self._queue.get())
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except OSError as e:
+                print(f"Error writing mempool write-ahead log, retrying in {RETRY_DELAY}s:", e)
+                with self._cond:
+                    self.error = e
+                    self._cond.notify_all()
+                time.sleep(RETRY_DELAY)
+                continue
+            if self.error is not None:
+                print("Mempool write-ahead log recovered.")
+                with self._cond:
+                    self.error = None
+
+    def _write(self, batch):
+        """Write and fsync a batch, removing items from it as they become durable."""
+        while batch:
+            lines = []
+            last_seq = None
+            for item in batch:
+                if isinstance(item, _Rotate):
+                    break
+                lines.append(json.dumps(item, separators=(",", ":")).encode() + b"\n")
+                last_seq = item["seq"]
+            self._commit(lines)
+            del batch[:len(lines)]
+            if last_seq is not None:
+                with self._cond:
+                    self.durable_seq = last_seq
+                    self._cond.notify_all()
+            if batch:
+                # A rotation marker; the old segment is only closed once the new one is open.
+                segment = _open_segment(_segment_path(self.directory, batch[0].first_seq))
+                self._file.close()
+                self._file = segment
+                del batch[0]
+
+    def _commit(self, lines):
+        if not lines:
+            return
+        fd = self._file.fileno()
+        start = os.fstat(fd).st_size
+        try:
+            self._file.write(b"".join(lines))
+            os.fsync(fd)
+        except OSError:
+            # Drop whatever part of the batch reached the file, so a retry does not
+            # leave the same events in the log twice.
+            os.ftruncate(fd, start)
+            raise
+        self.commits += 1
+
+
+def read_log(directory, after_seq):
+    """Yield the logged events with a sequence number greater than after_seq, in order."""
+    for path in _segments(directory):
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A torn final write from a crash; nothing after it was acknowledged.
+                    break
+                if event["seq"] > after_seq:
+                    yield event
+
+
+def write_snapshot(path, seq, image):
+    """
+    Write a store image (columns, meta) from MempoolStore.export() as a snapshot taken
+    at seq: one JSON header line (seq, meta and each column's type code and size)
+    followed by the raw bytes of every column, in machine byte order. The file is
+    written next to its final name, fsynced and renamed into place.
+    """
+    columns, meta = image
+    header = {
+        "seq": seq,
+        "columns": [[name, column.typecode if isinstance(column, array) else "bytes",
+                     len(column) * (column.itemsize if isinstance(column, array) else 1)]
+                    for name, column in columns.items()],
+        "meta": meta,
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(json.dumps(header, separators=(",", ":")).encode() + b"\n")
+        for column in columns.values():
+            f.write(memoryview(column).cast("B"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path):
+    """
+    Return (seq, image) from a snapshot file, or (0, None) if there is none. Columns
+    are read straight into arrays, without decoding any rows.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return 0, None
+    columns = {}
+    with open(path, "rb") as f:
+        header = json.loads(f.readline())
+        for name, typecode, size in header["columns"]:
+            data = f.read(size)
+            if len(data) != size:
+                raise ValueError(f"Snapshot {path} is truncated")
+            if typecode == "bytes":
+                columns[name] = bytearray(data)
+            else:
+                columns[name] = array(typecode)
+                columns[name].frombytes(data)
+    return header["seq"], (columns, header["meta"])
@@ -1,10 +1,13 @@
 import requests
 import random
-import time
+import sys
 
 # The mempool service's endpoint for adding transactions
 MEMPOOL_URL = "http://localhost:5000/transaction"
 
+# Bulk submission endpoint: one request validates, inserts and schedules a whole batch.
+BATCH_URL = f"{MEMPOOL_URL}/batch"
+
 # Define possible transaction types
 transaction_types = ["buy", "sell", "add_liquidity"]
 
@@ -24,23 +27,26 @@ def create_transaction(tx_type):
         payload["provider"] = random_address()
     return payload
 
-def populate_transactions(num_transactions=20):
-    """Post a number of random, unboosted transactions to the mempool service."""
-    for i in range(num_transactions):
-        tx_type = random.choice(transaction_types)
-        payload = create_transaction(tx_type)
+def populate_transactions(num_transactions=20, batch_size=5000):
+    """Post a number of random, unboosted transactions to the mempool service in batches."""
+    added = 0
+    for start in range(0, num_transactions, batch_size):
+        batch = [create_transaction(random.choice(transaction_types))
+                 for _ in range(min(batch_size, num_transactions - start))]
         try:
-            response = requests.post(MEMPOOL_URL, json=payload)
+            response = requests.post(BATCH_URL, json=batch)
             if response.ok:
-                print(f"Transaction {i+1}/{num_transactions} added: {response.json()}")
+                result = response.json()
+                added += result["added"]
+                print(f"Transactions {added}/{num_transactions} added ({result['failed']} failed in batch)")
             else:
-                print(f"Error adding transaction: {response.status_code} - {response.text}")
+                print(f"Error adding transactions: {response.status_code} - {response.text}")
         except Exception as e:
-            print(f"Exception adding transaction: {e}")
-        # Small delay between transactions
-        time.sleep(0.2)
+            print(f"Exception adding transactions: {e}")
+    return added
 
 if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
     print("Populating mempool with random unboosted transactions...")
-    populate_transactions(20)
+    populate_transactions(count)
     print("Done!")
@@ -1,11 +1,14 @@
 import requests
 import random
-import time
+import sys
 import uuid
 
 # The mempool service's endpoint for adding transactions
 MEMPOOL_URL = "http://localhost:5000/transaction"
 
+# Bulk submission endpoint: one request validates, inserts and schedules a whole batch.
+BATCH_URL = f"{MEMPOOL_URL}/batch"
+
 def random_address():
     """Generate a random Ethereum-style address."""
     return "0x" + "".join(random.choices("0123456789abcdef", k=40))
@@ -32,27 +35,32 @@ def create_suspicious_transaction(tx_type):
     else:
         return None
 
-def populate_suspicious_transactions(num_transactions=5):
+def populate_suspicious_transactions(num_transactions=5, batch_size=5000):
     tx_types = ["buy", "add_liquidity"]
-    for i in range(num_transactions):
-        tx_type = random.choice(tx_types)
-        payload = create_suspicious_transaction(tx_type)
-        if payload is None:
-            continue
-        # Generate a unique transaction ID for consistency with mempool expectations.
-        payload["id"] = str(uuid.uuid4())
+    added = 0
+    for start in range(0, num_transactions, batch_size):
+        batch = []
+        for _ in range(min(batch_size, num_transactions - start)):
+            payload = create_suspicious_transaction(random.choice(tx_types))
+            if payload is None:
+                continue
+            # Generate a unique transaction ID for consistency with mempool expectations.
+            payload["id"] = str(uuid.uuid4())
+            batch.append(payload)
         try:
-            response = requests.post(MEMPOOL_URL, json=payload)
+            response = requests.post(BATCH_URL, json=batch)
             if response.ok:
-                print(f"Suspicious Transaction {i+1}/{num_transactions} added: {response.json()}")
+                result = response.json()
+                added += result["added"]
+                print(f"Suspicious Transactions {added}/{num_transactions} added ({result['failed']} failed in batch)")
             else:
-                print(f"Error adding suspicious transaction: {response.status_code} - {response.text}")
+                print(f"Error adding suspicious transactions: {response.status_code} - {response.text}")
         except Exception as e:
-            print(f"Exception adding suspicious transaction: {e}")
-        # Small delay between transactions
-        time.sleep(0.2)
+            print(f"Exception adding suspicious transactions: {e}")
+    return added
 
 if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
     print("Populating mempool with suspicious transactions...")
-    populate_suspicious_transactions(10)
+    populate_suspicious_transactions(count)
     print("Done!")
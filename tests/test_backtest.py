@@ -0,0 +1,50 @@
+import json
+
+import backtest
+from aggregates import TokenAggregates
+from common import price_model
+from store import MempoolStore
+
+ADDRESS = "0x" + "cd" * 20
+
+
+def test_wal_history_matches_token_aggregates(tmp_path):
+    store = MempoolStore()
+    aggregates = TokenAggregates(backtest.INITIAL_LIQUIDITY, backtest.TOTAL_CIRCULATION)
+    events = []
+    store.add_listener(events.append)
+    store.add_listener(aggregates.apply_change)
+
+    types = ["buy", "sell", "add_liquidity", "remove_liquidity"]
+    for i in range(40):
+        tx = {"id": f"tx-{i}", "type": types[i % 4], "amount": str(1000 * (i + 1)),
+              "status": "executed" if i % 3 else "pending"}
+        tx["provider" if tx["type"].endswith("liquidity") else "buyer"] = ADDRESS
+        store.add(tx)
+    for i in range(0, 40, 3):
+        store.set_status(f"tx-{i}", "executed")
+    # Executions undone in every way the aggregates undo them, and one executed again.
+    store.set_status("tx-1", "pending")
+    store.set_status("tx-2", "pending")
+    store.set_status("tx-2", "executed")
+    store.remove("tx-4")
+    store.remove("tx-6")
+    store.evict_executed(lambda txs: None, keep=5)
+
+    path = tmp_path / "wal.log"
+    path.write_text("".join(json.dumps(event) + "\n" for event in events))
+    history = backtest.load_history(str(path))
+    totals = aggregates.snapshot()
+
+    assert len(history) == totals["executed"] == 37
+    price = price_model.current_price(history.types, history.amounts,
+                                      backtest.INITIAL_LIQUIDITY, backtest.TOTAL_CIRCULATION)
+    expected = (totals["liquidity"] / backtest.INITIAL_LIQUIDITY) * totals["trading_factor"]
+    assert abs(price - expected) < 1e-12
+
+
+def test_watchdog_reacts_only_after_a_threat():
+    history = backtest.History([0.0] * 8, ["buy", "buy", "sell", "buy", "buy", "buy", "buy", "buy"],
+                               [10.0, 10.0, backtest.LARGE_SELL_THRESHOLD, 10.0, 10.0, 10.0, 10.0, 10.0])
+    positions = backtest.watchdog(history, [1.0] * 8, quantity=5.0, cooldown=3)
+    assert list(positions) == [5.0, 5.0, 5.0, 0.0, 0.0, 0.0, 5.0, 5.0]
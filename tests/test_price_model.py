@@ -0,0 +1,50 @@
+import math
+import random
+
+import pytest
+
+from common import price_model
+
+INITIAL_LIQUIDITY = 1000000
+TOTAL_CIRCULATION = 1000000
+
+
+def make_columns(count, seed=7):
+    rng = random.Random(seed)
+    types = rng.choices(["buy", "sell", "add_liquidity", "remove_liquidity"], weights=[45, 45, 7, 3], k=count)
+    amounts = [round(rng.uniform(1000, 100000), 2) for _ in range(count)]
+    return types, amounts
+
+
+def log_space_price(types, amounts):
+    """Price with exactly rounded sums of log1p factors."""
+    log_factors = [math.log1p(price_model.trade_change(t, a, TOTAL_CIRCULATION)) for t, a in zip(types, amounts)]
+    liquidity = INITIAL_LIQUIDITY + math.fsum(price_model.liquidity_change(t, a) for t, a in zip(types, amounts))
+    return (liquidity / INITIAL_LIQUIDITY) * math.exp(math.fsum(log_factors))
+
+
+def test_pure_python_matches_log_space(monkeypatch):
+    monkeypatch.setattr(price_model, "np", None)
+    types, amounts = make_columns(10000)
+    series = price_model.price_series(types, amounts, INITIAL_LIQUIDITY, TOTAL_CIRCULATION)
+    current = price_model.current_price(types, amounts, INITIAL_LIQUIDITY, TOTAL_CIRCULATION)
+    assert series[-1] == current
+    assert current == pytest.approx(log_space_price(types, amounts), rel=1e-12)
+    assert price_model.current_price([], [], INITIAL_LIQUIDITY, TOTAL_CIRCULATION, 2.0) == 2.0
+
+
+def test_numpy_matches_pure_python(monkeypatch):
+    np = pytest.importorskip("numpy")
+    types, amounts = make_columns(10 ** 6)
+    # A sell large enough to flip the trading factor's sign (a factor of -1).
+    types.insert(10, "sell")
+    amounts.insert(10, 2 * TOTAL_CIRCULATION / price_model.TRADE_IMPACT)
+    vectorized = (price_model.price_series(types, amounts, INITIAL_LIQUIDITY, TOTAL_CIRCULATION),
+                  price_model.current_price(types, amounts, INITIAL_LIQUIDITY, TOTAL_CIRCULATION))
+    monkeypatch.setattr(price_model, "np", None)
+    series = price_model.price_series(types, amounts, INITIAL_LIQUIDITY, TOTAL_CIRCULATION)
+    current = price_model.current_price(types, amounts, INITIAL_LIQUIDITY, TOTAL_CIRCULATION)
+
+    assert isinstance(vectorized[0], np.ndarray)
+    np.testing.assert_allclose(vectorized[0], series, rtol=1e-9)
+    assert vectorized[1] == pytest.approx(current, rel=1e-9)
@@ -0,0 +1,64 @@
+import pytest
+
+from rules import Rule, RuleSet
+
+SPECS = [
+    {"name": "any-large", "min_amount": 1000},
+    {"name": "buy-band", "type": "buy", "min_amount": 100, "max_amount": 500},
+    {"name": "buy-small", "type": ["buy", "sell"], "max_amount": 100},
+    {"name": "sell-exact", "type": "sell", "min_amount": 250, "max_amount": 250.5},
+    {"name": "disabled", "type": "buy", "min_amount": 0, "enabled": False},
+    {"name": "liquidity", "type": "add_liquidity", "min_amount": 500, "max_amount": 1000},
+    {"name": "everything"},
+]
+
+
+def reference(specs, tx_type, amount):
+    """Names of the enabled rules whose type matches and min_amount <= amount < max_amount."""
+    names = []
+    for spec in specs:
+        types = spec.get("type", "*")
+        types = [types] if isinstance(types, str) else types
+        if (spec.get("enabled", True) and ("*" in types or tx_type in types) and
+                spec.get("min_amount", float("-inf")) <= amount < spec.get("max_amount", float("inf"))):
+            names.append(spec["name"])
+    return names
+
+
+def boundary_amounts(specs):
+    bounds = {spec[field] for spec in specs for field in ("min_amount", "max_amount") if field in spec}
+    amounts = {-1.0, 0.0}
+    for bound in bounds:
+        amounts.update((bound - 0.25, bound, bound + 0.25, float(bound)))
+    return sorted(amounts)
+
+
+@pytest.mark.parametrize("tx_type", ["buy", "sell", "add_liquidity", "remove_liquidity", None])
+def test_candidates_match_half_open_ranges(tx_type):
+    rules = RuleSet(SPECS)
+    for amount in boundary_amounts(SPECS):
+        names = [rule.name for rule in rules.candidates(tx_type, amount)]
+        assert names == reference(SPECS, tx_type, amount), amount
+
+
+def test_max_amount_is_exclusive():
+    rules = RuleSet([{"name": "band", "min_amount": 10, "max_amount": 20}])
+    assert [rule.name for rule in rules.candidates("buy", 10)] == ["band"]
+    assert [rule.name for rule in rules.candidates("buy", 19.999)] == ["band"]
+    assert rules.candidates("buy", 20) == ()
+    assert rules.candidates("buy", 9.999) == ()
+
+
+def test_empty_range_never_matches():
+    rules = RuleSet([{"name": "empty", "min_amount": 5, "max_amount": 5}])
+    assert all(rules.candidates("buy", amount) == () for amount in (4.5, 5, 5.5))
+
+
+@pytest.mark.parametrize("spec, message", [
+    ({"name": "x", "max_amount": "10"}, "max_amount must be a number"),
+    ({"name": "x", "min_amount": True}, "min_amount must be a number"),
+    ({"name": "x", "amount": 10}, "unknown fields"),
+])
+def test_invalid_amounts_are_rejected(spec, message):
+    with pytest.raises(ValueError, match=message):
+        Rule(spec)
@@ -0,0 +1,83 @@
+import importlib
+import sys
+import threading
+import time
+
+import pytest
+
+from scheduler import ExecutionScheduler
+
+ADDRESS = "0x" + "cd" * 20
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_cancelled_timer_never_fires():
+    fired = []
+    done = threading.Event()
+
+    def callback(key):
+        fired.append(key)
+        if key == "last":
+            done.set()
+
+    scheduler = ExecutionScheduler(callback, 0.05).start()
+    scheduler.schedule_many(["a", "b", "c"])
+    scheduler.schedule("last", delay=0.1)
+    assert scheduler.cancel("b")
+    assert not scheduler.cancel("b")
+    assert not scheduler.cancel("unknown")
+    assert scheduler.pending_count() == 3
+
+    assert done.wait(2)
+    assert fired == ["a", "c", "last"]
+    assert scheduler.pending_count() == 0
+
+
+def test_rescheduling_replaces_the_timer():
+    fired = []
+    scheduler = ExecutionScheduler(fired.append, 10).start()
+    scheduler.schedule("tx", delay=0.02)
+    scheduler.schedule("tx")
+    assert scheduler.pending_count() == 1
+    time.sleep(0.1)
+    assert fired == []
+    assert scheduler.cancel("tx")
+
+
+@pytest.fixture
+def mempool_app(tmp_path, monkeypatch):
+    """The mempool service module, with no persistence and a short execution delay."""
+    pytest.importorskip("flask")
+    pytest.importorskip("flask_cors")
+    monkeypatch.setenv("MEMPOOL_PERSIST", "0")
+    monkeypatch.setenv("MEMPOOL_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("MEMPOOL_EXECUTION_DELAY", "0.2")
+    sys.modules.pop("mempool", None)
+    module = importlib.import_module("mempool")
+    yield module
+    sys.modules.pop("mempool", None)
+
+
+def test_delete_cancels_the_execution_timer(mempool_app):
+    client = mempool_app.app.test_client()
+    kept, removed = (client.post("/transaction", json={"type": "buy", "buyer": ADDRESS, "amount": amount})
+                     .get_json()["transaction"] for amount in ("5", "7"))
+    assert client.get("/stats").get_json()["pending_timers"] == 2
+
+    assert client.delete(f"/transaction/{removed['id']}").status_code == 200
+    assert client.get("/stats").get_json()["pending_timers"] == 1
+    assert client.delete(f"/transaction/{removed['id']}").status_code == 404
+
+    # The kept transaction still executes; the removed one is never resurrected.
+    assert wait_for(lambda: mempool_app.mempool.get(kept["id"])["status"] == "executed")
+    assert client.get("/stats").get_json()["pending_timers"] == 0
+    assert mempool_app.mempool.get(removed["id"]) is None
+    assert client.get(f"/transaction/{removed['id']}").status_code == 404
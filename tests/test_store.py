@@ -0,0 +1,140 @@
+import random
+import uuid
+
+import pytest
+
+from store import MempoolStore, SortedBuckets
+
+TYPES = ["buy", "sell", "add_liquidity", "remove_liquidity"]
+ROLES = {"buy": "buyer", "sell": "seller", "add_liquidity": "provider", "remove_liquidity": "provider"}
+ADDRESSES = ["0x" + f"{i:02x}" * 20 for i in range(6)]
+
+
+class ReferenceStore:
+    """The store's query semantics over a plain list of dicts, in insertion order."""
+
+    def __init__(self):
+        self.transactions = []
+
+    def add(self, tx):
+        self.remove(tx["id"])
+        self.transactions.append(dict(tx))
+
+    def remove(self, tx_id):
+        self.transactions = [tx for tx in self.transactions if tx["id"] != tx_id]
+
+    def set_status(self, tx_id, status):
+        for tx in self.transactions:
+            if tx["id"] == tx_id:
+                tx["status"] = status
+
+    def query(self, tx_type=None, status=None, address=None, min_amount=None, max_amount=None):
+        def matches(tx):
+            amount = float(tx["amount"]) if "amount" in tx else None
+            return ((tx_type is None or tx.get("type") == tx_type) and
+                    (status is None or tx.get("status") == status) and
+                    (address is None or address.lower() in
+                     {tx[f].lower() for f in ("buyer", "seller", "provider", "from", "to") if f in tx}) and
+                    (min_amount is None or (amount is not None and amount >= min_amount)) and
+                    (max_amount is None or (amount is not None and amount <= max_amount)))
+        return [tx for tx in self.transactions if matches(tx)]
+
+
+def random_transaction(rng, ids):
+    tx_type = rng.choice(TYPES)
+    tx = {
+        # Mostly mempool-assigned UUIDs, some client-chosen ids (kept in the extras).
+        "id": str(uuid.UUID(int=rng.getrandbits(128))) if rng.random() < 0.8 else f"tx-{len(ids)}",
+        "type": tx_type,
+        "status": rng.choice(["pending", "executed"]),
+        ROLES[tx_type]: rng.choice(ADDRESSES),
+    }
+    if rng.random() < 0.9:
+        tx["amount"] = rng.choice([str(rng.randint(1, 50)), rng.randint(1, 50), rng.randint(1, 50) + 0.5])
+    if rng.random() < 0.1:
+        tx["from"] = rng.choice(ADDRESSES).upper().replace("0X", "0x")
+    ids.append(tx["id"])
+    return tx
+
+
+def random_filters(rng):
+    filters = {}
+    if rng.random() < 0.5:
+        filters["tx_type"] = rng.choice(TYPES)
+    if rng.random() < 0.4:
+        filters["status"] = rng.choice(["pending", "executed"])
+    if rng.random() < 0.3:
+        filters["address"] = rng.choice(ADDRESSES)
+    if rng.random() < 0.4:
+        low = rng.randint(0, 40)
+        filters["min_amount"] = low
+        if rng.random() < 0.7:
+            filters["max_amount"] = low + rng.randint(0, 20)
+    elif rng.random() < 0.2:
+        filters["max_amount"] = rng.randint(0, 50)
+    return filters
+
+
+def pages(store, filters, limit):
+    """Every transaction matching filters, fetched page by page."""
+    result, cursor = [], None
+    while True:
+        rows, next_cursor = store.page(after=cursor, limit=limit, **filters)
+        assert next_cursor is None or cursor is None or next_cursor > cursor
+        result.extend(rows)
+        if next_cursor is None:
+            return result
+        cursor = next_cursor
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_queries_and_pages_match_reference(seed, monkeypatch):
+    # Small buckets, so the amount index splits and merges them.
+    monkeypatch.setattr(SortedBuckets, "BUCKET_SIZE", 4)
+    rng = random.Random(seed)
+    store, reference, ids = MempoolStore(), ReferenceStore(), []
+
+    for step in range(600):
+        action = rng.random()
+        if action < 0.55 or not ids:
+            tx = random_transaction(rng, ids)
+            store.add(tx)
+            reference.add(tx)
+        elif action < 0.7:
+            tx_id = rng.choice(ids)
+            store.remove(tx_id)
+            reference.remove(tx_id)
+        elif action < 0.8:
+            # Re-adding an id replaces the transaction and moves it to the end.
+            tx = dict(rng.choice(reference.transactions or [random_transaction(rng, ids)]))
+            tx["status"] = rng.choice(["pending", "executed"])
+            store.add(tx)
+            reference.add(tx)
+        else:
+            tx_id, status = rng.choice(ids), rng.choice(["pending", "executed"])
+            store.set_status(tx_id, status)
+            reference.set_status(tx_id, status)
+
+        if step % 20 == 0:
+            assert store.all() == reference.transactions
+            filters = random_filters(rng)
+            expected = reference.query(**filters)
+            assert store.query(**filters) == expected, filters
+            assert pages(store, filters, rng.randint(1, 7)) == expected, filters
+
+    assert pages(store, {}, 5) == reference.transactions
+
+
+def test_page_cursor_skips_removed_transactions():
+    store = MempoolStore()
+    for i in range(10):
+        store.add({"id": f"tx-{i}", "type": "buy", "amount": str(i), "status": "pending"})
+    first, cursor = store.page(tx_type="buy", limit=3)
+    assert [tx["id"] for tx in first] == ["tx-0", "tx-1", "tx-2"]
+    # The cursor is an insert sequence number, so it survives removals around it.
+    store.remove("tx-2")
+    store.remove("tx-3")
+    second, cursor = store.page(tx_type="buy", after=cursor, limit=3)
+    assert [tx["id"] for tx in second] == ["tx-4", "tx-5", "tx-6"]
+    rest, cursor = store.page(tx_type="buy", after=cursor, limit=3)
+    assert [tx["id"] for tx in rest] == ["tx-7", "tx-8", "tx-9"] and cursor is None
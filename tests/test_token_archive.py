@@ -0,0 +1,46 @@
+from aggregates import TokenAggregates
+from archive import TransactionArchive
+from store import MempoolStore
+
+ADDRESS = "0x" + "ab" * 20
+
+
+def make_tx(i, tx_type, amount, status="executed"):
+    tx = {"id": f"tx-{i}", "type": tx_type, "amount": str(amount), "status": status}
+    tx["provider" if tx_type.endswith("liquidity") else "buyer"] = ADDRESS
+    return tx
+
+
+def follow(store, archive, aggregates):
+    """Reset the aggregates from a snapshot the way the token does, archive first."""
+    snapshot = store.snapshot(lambda seq: {"archive_offset": archive.size})
+    offset = aggregates.archive_offset
+    while offset < snapshot["archive_offset"]:
+        txs, offset = archive.read(offset, snapshot["archive_offset"], limit=3)
+        aggregates.add_archived(txs, offset)
+    aggregates.reset(snapshot["transactions"])
+
+
+def test_reset_keeps_archived_totals(tmp_path):
+    store = MempoolStore()
+    archive = TransactionArchive(str(tmp_path / "archive.jsonl"))
+    aggregates = TokenAggregates(initial_liquidity=1000000, total_circulation=1000000)
+    follow(store, archive, aggregates)
+    store.add_listener(aggregates.apply_change)
+
+    types = ["buy", "sell", "add_liquidity", "remove_liquidity"]
+    for i in range(20):
+        store.add(make_tx(i, types[i % 4], 10 + i, "executed" if i % 5 else "pending"))
+    store.evict_executed(archive.append_many, keep=4)
+    assert len(archive) == 12
+    before = aggregates.snapshot()
+
+    # A forced reset of the same follower, and a fresh one (a restarted token).
+    follow(store, archive, aggregates)
+    restarted = TokenAggregates(initial_liquidity=1000000, total_circulation=1000000)
+    follow(store, archive, restarted)
+
+    for totals in (aggregates.snapshot(), restarted.snapshot()):
+        assert totals["executed"] == before["executed"] == 16
+        for key in ("volume", "liquidity", "trading_factor"):
+            assert abs(totals[key] - before[key]) < 1e-9
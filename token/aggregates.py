@@ -0,0 +1,127 @@
+import math
+import threading
+
+from common.price_model import log_factor, trade_change
+
+
+class Totals:
+    """Sums over a set of executed transactions (see TokenAggregates)."""
+
+    def __init__(self):
+        self.executed = 0
+        self.volume = 0.0
+        self.added_liquidity = 0.0
+        self.removed_liquidity = 0.0
+        self.log_factor = 0.0
+        self.zero_factors = 0
+        self.negative_factors = 0
+
+    def apply(self, tx, sign, total_circulation):
+        """
+        Add (sign 1) or subtract (sign -1) one executed transaction. Returns None if it
+        has no numeric amount, otherwise the buy/sell volume it added (0 otherwise).
+        """
+        tx_type = tx.get("type")
+        try:
+            amount = float(tx.get("amount", 0))
+        except (TypeError, ValueError):
+            return None
+        self.executed += sign
+        if tx_type == "add_liquidity":
+            self.added_liquidity += sign * amount
+        elif tx_type == "remove_liquidity":
+            self.removed_liquidity += sign * amount
+        elif tx_type in ("buy", "sell"):
+            self.volume += sign * abs(amount)
+            log_abs, negative = log_factor(trade_change(tx_type, amount, total_circulation))
+            if log_abs == -math.inf:
+                self.zero_factors += sign
+            else:
+                self.log_factor += sign * log_abs
+                if negative:
+                    self.negative_factors += sign
+            return abs(amount) if sign > 0 else 0.0
+        return 0.0
+
+
+class TokenAggregates:
+    """
+    Running totals over the executed transactions, updated once per transaction as it
+    becomes executed (or stops being executed), so reading them is O(1).
+
+    The trading factor is a product of per-trade factors (1 +/- 0.01 * amount /
+    circulation). It is kept as a sum of log|factor| plus counts of zero and negative
+    factors, so it neither underflows nor needs the whole history to recompute.
+
+    Executed transactions the mempool has moved to its archive stay part of the
+    history. They are absent from mempool snapshots, so their totals are kept apart
+    (add_archived) and survive reset().
+    """
+
+    def __init__(self, initial_liquidity, total_circulation):
+        self.initial_liquidity = initial_liquidity
+        self.total_circulation = total_circulation
+        # Byte offset up to which the mempool archive has been added.
+        self.archive_offset = 0
+        self._lock = threading.Lock()
+        self._live = Totals()
+        self._archived = Totals()
+
+    def reset(self, transactions):
+        """Recompute the totals of the live transactions from a full list of them."""
+        with self._lock:
+            self._live = Totals()
+            for tx in transactions:
+                if tx.get("status") == "executed":
+                    self._live.apply(tx, 1, self.total_circulation)
+
+    def add_archived(self, transactions, archive_offset):
+        """Add archived transactions, read from the archive up to archive_offset."""
+        with self._lock:
+            for tx in transactions:
+                if tx.get("status") == "executed":
+                    self._archived.apply(tx, 1, self.total_circulation)
+            self.archive_offset = archive_offset
+
+    def clear_archived(self):
+        """Forget the archived totals, e.g. when the mempool's archive was replaced."""
+        with self._lock:
+            self._archived = Totals()
+            self.archive_offset = 0
+
+    def apply_change(self, event):
+        """
+        Update the totals from a mempool change event. Returns None if the event does
+        not affect them, otherwise the buy/sell volume it executed (0 for other changes).
+        """
+        tx = event["transaction"]
+        op = event["op"]
+        with self._lock:
+            if op == "added" and tx.get("status") == "executed":
+                return self._live.apply(tx, 1, self.total_circulation)
+            if op == "updated":
+                # Status changes are only recorded when the status actually changes.
+                return self._live.apply(tx, 1 if tx.get("status") == "executed" else -1,
+                                        self.total_circulation)
+            if op == "removed" and tx.get("status") == "executed":
+                return self._live.apply(tx, -1, self.total_circulation)
+            # Archived transactions stay part of the executed history.
+            return None
+
+    def snapshot(self):
+        """Current volume, liquidity and trading factor."""
+        with self._lock:
+            live, archived = self._live, self._archived
+            if live.zero_factors + archived.zero_factors:
+                trading_factor = 0.0
+            else:
+                trading_factor = math.exp(live.log_factor + archived.log_factor)
+                if (live.negative_factors + archived.negative_factors) % 2:
+                    trading_factor = -trading_factor
+            return {
+                "executed": live.executed + archived.executed,
+                "volume": live.volume + archived.volume,
+                "liquidity": (self.initial_liquidity + live.added_liquidity + archived.added_liquidity
+                              - live.removed_liquidity - archived.removed_liquidity),
+                "trading_factor": trading_factor,
+            }
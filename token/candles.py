@@ -0,0 +1,90 @@
+import threading
+import time
+from array import array
+
+# Candle resolutions in seconds and how many candles each one keeps: an hour of 1s
+# candles, a day of 1m candles, a week of 15m candles and 30 days of 1h candles.
+RESOLUTIONS = {
+    "1s": (1, 3600),
+    "1m": (60, 1440),
+    "15m": (900, 672),
+    "1h": (3600, 720),
+}
+
+
+class CandleRing:
+    """
+    Fixed-size ring of OHLCV candles at one resolution. The candle for a bucket start
+    time lives in slot (start // seconds) % size, so memory is allocated once and a
+    newer bucket simply overwrites the oldest one in its slot.
+    """
+
+    def __init__(self, seconds, size):
+        self.seconds = seconds
+        self.size = size
+        self.starts = array("q", [-1]) * size
+        self.open = array("d", [0.0]) * size
+        self.high = array("d", [0.0]) * size
+        self.low = array("d", [0.0]) * size
+        self.close = array("d", [0.0]) * size
+        self.volume = array("d", [0.0]) * size
+
+    def record(self, ts, price, volume):
+        start = int(ts // self.seconds) * self.seconds
+        slot = (start // self.seconds) % self.size
+        if self.starts[slot] != start:
+            if self.starts[slot] > start:
+                # The slot already holds a newer bucket; this point is too old to keep.
+                return
+            self.starts[slot] = start
+            self.open[slot] = self.high[slot] = self.low[slot] = price
+            self.volume[slot] = 0.0
+        self.high[slot] = max(self.high[slot], price)
+        self.low[slot] = min(self.low[slot], price)
+        self.close[slot] = price
+        self.volume[slot] += volume
+
+    def between(self, start, end):
+        """Candles whose bucket starts within [start, end], oldest first."""
+        first = max(int(start // self.seconds), int(end // self.seconds) - self.size + 1)
+        candles = []
+        for bucket in range(first, int(end // self.seconds) + 1):
+            slot = bucket % self.size
+            if self.starts[slot] == bucket * self.seconds and self.starts[slot] >= start:
+                candles.append({
+                    "time": self.starts[slot],
+                    "open": self.open[slot],
+                    "high": self.high[slot],
+                    "low": self.low[slot],
+                    "close": self.close[slot],
+                    "volume": self.volume[slot],
+                })
+        return candles
+
+
+class CandleStore:
+    """Price candles at every resolution in RESOLUTIONS, updated together on each price change."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rings = {name: CandleRing(seconds, size) for name, (seconds, size) in RESOLUTIONS.items()}
+
+    def record(self, ts, price, volume=0.0):
+        """Roll a price observation (and the traded volume behind it) into every resolution."""
+        with self._lock:
+            for ring in self._rings.values():
+                ring.record(ts, price, volume)
+
+    def candles(self, resolution, start=None, end=None):
+        """
+        Candles of one resolution between the epoch timestamps start and end (default:
+        everything the ring still holds, up to now). Raises KeyError for an unknown
+        resolution.
+        """
+        ring = self._rings[resolution]
+        if end is None:
+            end = time.time()
+        if start is None:
+            start = end - ring.seconds * ring.size
+        with self._lock:
+            return ring.between(start, end)
@@ -1,11 +1,17 @@
-from flask import Flask, request, jsonify, render_template
-import requests
+from flask import Flask, Response, request, jsonify, render_template
 import datetime
 import time
 import threading
 from flask_cors import CORS
 import uuid
 import re
+import math
+import os
+
+from common.change_feed import ChangeFeedFollower
+from common.http_client import HttpClient
+from aggregates import TokenAggregates
+from candles import RESOLUTIONS, CandleStore
 
 app = Flask(__name__)
 CORS(app)
@@ -17,6 +23,9 @@ def index():
 # URL of the mempool service (running on port 5000)
 MEMPOOL_URL = "http://localhost:5000"
 
+# Pooled keep-alive client (with timeouts and retries) for calls to the mempool.
+http_client = HttpClient()
+
 # A simulated starting liquidity value
 INITIAL_LIQUIDITY = 1000000
 
@@ -26,29 +35,109 @@ TOTAL_CIRCULATION = 1000000
 # Global list to store computed prices over time.
 price_history = []
 
-def fetch_mempool_transactions():
-    """Helper function to fetch all transactions from the mempool."""
-    try:
-        response = requests.get(f"{MEMPOOL_URL}/transaction")
-        if response.ok:
-            return response.json()
-        else:
-            return []
-    except Exception as e:
-        print("Error fetching mempool transactions:", e)
-        return []
+# Running volume, liquidity and trading factor over the executed transactions, kept up
+# to date by following the mempool change feed instead of refetching the whole pool.
+aggregates = TokenAggregates(INITIAL_LIQUIDITY, TOTAL_CIRCULATION)
+
+# OHLCV candles of the price at several resolutions, rolled up as transactions execute.
+candles = CandleStore()
+
+def price_from(totals):
+    """Token price for a snapshot of the running aggregates."""
+    base_price = 1.0
+    return base_price * (totals["liquidity"] / INITIAL_LIQUIDITY) * totals["trading_factor"]
+
+# Archived transactions fetched per request while catching up with the mempool archive.
+ARCHIVE_PAGE_SIZE = 10000
+
+def sync_archive(archive_offset):
+    """
+    Add the transactions the mempool has archived up to archive_offset to the
+    aggregates. Only the part not read before is fetched; if the archive is shorter
+    than what was read (it was replaced), it is read again from the start.
+    """
+    if archive_offset < aggregates.archive_offset:
+        aggregates.clear_archived()
+    while aggregates.archive_offset < archive_offset:
+        response = http_client.get(f"{MEMPOOL_URL}/transaction/archive",
+                                   params={"offset": aggregates.archive_offset, "end": archive_offset,
+                                           "limit": ARCHIVE_PAGE_SIZE})
+        response.raise_for_status()
+        page = response.json()
+        if page["next_offset"] <= aggregates.archive_offset:
+            # The archive no longer reaches archive_offset (the mempool was reset);
+            # the next snapshot carries an offset that matches it.
+            raise RuntimeError("Mempool archive is shorter than its snapshot offset")
+        aggregates.add_archived(page["transactions"], page["next_offset"])
+
+def on_mempool_reset(transactions):
+    # Archived transactions are not in the snapshot but stay part of the history.
+    sync_archive((change_feed.last_reset or {}).get("archive_offset", 0))
+    aggregates.reset(transactions)
+    candles.record(time.time(), price_from(aggregates.snapshot()))
+
+def on_mempool_change(event):
+    volume = aggregates.apply_change(event)
+    if volume is not None:
+        candles.record(event["ts"], price_from(aggregates.snapshot()), volume)
+
+# Started once bound, since on_mempool_reset reads the follower's last_reset.
+change_feed = ChangeFeedFollower(MEMPOOL_URL, on_mempool_reset, on_mempool_change,
+                                 client=http_client)
+change_feed.start()
+
+# Seconds between price ticks. The ticker samples the price at this cadence (recomputing
+# price, volume and liquidity only when the mempool has changed) and /dashboard only
+# reads the latest result.
+TICK_INTERVAL = float(os.environ.get("TOKEN_TICK_INTERVAL", 1))
 
-def compute_liquidity(transactions):
+# Number of points kept in the price history.
+HISTORY_SIZE = 50
+
+# Latest dashboard computed by the ticker, the mempool version and the change-feed
+# cursor it reflects, its unrounded price and the number of ticks so far.
+# dashboard_updated is notified after every tick.
+dashboard_cache = {"version": None, "cursor": None, "price": None, "data": None, "ticks": 0}
+dashboard_lock = threading.Lock()
+dashboard_updated = threading.Condition(dashboard_lock)
+
+# Longest a /dashboard?cursor= request waits for the ticker to reach that cursor.
+DASHBOARD_WAIT = float(os.environ.get("TOKEN_DASHBOARD_WAIT", 3))
+
+def mempool_version():
+    """Version of the mempool reflected in the aggregates (resets, change-feed cursor)."""
+    return f"{change_feed.resets}-{change_feed.cursor}"
+
+def tick():
     """
-    Compute current liquidity as:
-      INITIAL_LIQUIDITY + (sum of all 'add_liquidity' amounts) - (sum of all 'remove_liquidity' amounts)
-    Only consider transactions with status "executed".
+    Record a price sample. Price, volume and liquidity are only recomputed if the
+    mempool changed since the last tick; otherwise the last price is sampled again.
     """
-    add_liq = sum(float(tx.get("amount", 0)) for tx in transactions 
-                  if tx.get("type") == "add_liquidity" and tx.get("status") == "executed")
-    remove_liq = sum(float(tx.get("amount", 0)) for tx in transactions 
-                     if tx.get("type") == "remove_liquidity" and tx.get("status") == "executed")
-    return INITIAL_LIQUIDITY + add_liq - remove_liq
+    cursor = change_feed.cursor
+    version = mempool_version()
+    if version == dashboard_cache["version"]:
+        data, price = dashboard_cache["data"], dashboard_cache["price"]
+    else:
+        data, price = compute_dashboard()
+        data["cursor"] = cursor
+    record_price(price)
+    data = dict(data, history=list(price_history))
+    with dashboard_updated:
+        dashboard_cache["version"] = version
+        dashboard_cache["cursor"] = cursor
+        dashboard_cache["price"] = price
+        dashboard_cache["data"] = data
+        dashboard_cache["ticks"] += 1
+        dashboard_updated.notify_all()
+
+def run_price_ticker():
+    """Background loop computing the dashboard every TICK_INTERVAL seconds."""
+    while True:
+        try:
+            tick()
+        except Exception as e:
+            print("Error computing price tick:", e)
+        time.sleep(TICK_INTERVAL)
 
 @app.route('/dashboard', methods=['GET'])
 def dashboard():
@@ -58,82 +147,95 @@ def dashboard():
       - liquidity: computed from executed liquidity transactions
       - current_price: computed price based on liquidity and trading impact from executed transactions
       - history: a list of {timestamp, price} entries (the price history)
+      - cursor: the mempool change sequence number the data reflects
+    The data is the latest snapshot from the price ticker. The ETag is derived from the
+    tick it was taken at (each tick adds a history point), so pollers get 304 until the
+    next tick.
+    With ?cursor=<seq> (e.g. of a mempool stream event) the response waits up to
+    DASHBOARD_WAIT seconds for data reflecting that change; compare the returned cursor.
     """
-    transactions = fetch_mempool_transactions()
-
-    # Only include executed transactions in calculations.
-    executed_tx = [tx for tx in transactions if tx.get("status") == "executed"]
-
-    # Compute volume for display (only for executed buy and sell transactions)
-    volume = sum(abs(float(tx.get("amount", 0))) for tx in executed_tx if tx.get("type") in ["buy", "sell"])
-    
-    # Compute liquidity and factors.
-    liquidity = compute_liquidity(executed_tx)
-    liquidity_factor = liquidity / INITIAL_LIQUIDITY
-
-    # Calculate trading impact from executed buy and sell transactions.
-    trading_factor = 1.0
-    for tx in executed_tx:
-        tx_type = tx.get("type")
-        amt = float(tx.get("amount", 0))
-        if tx_type == "buy":
-            trading_factor *= (1 + 0.01 * (amt / TOTAL_CIRCULATION))
-        elif tx_type == "sell":
-            trading_factor *= (1 - 0.01 * (amt / TOTAL_CIRCULATION))
-    
-    base_price = 1.0
-    new_price = base_price * liquidity_factor * trading_factor
+    cursor = request.args.get('cursor', type=int)
+    with dashboard_updated:
+        if cursor is not None:
+            dashboard_updated.wait_for(lambda: dashboard_cache["cursor"] >= cursor, DASHBOARD_WAIT)
+        version = dashboard_cache["version"]
+        ticks = dashboard_cache["ticks"]
+        data = dashboard_cache["data"]
+
+    etag = f"dashboard-{version}-{ticks}"
+    response = Response(status=304) if request.if_none_match.contains(etag) else jsonify(data)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def compute_dashboard():
+    """Build the dashboard payload (all but the history) and the price from the running aggregates."""
+    totals = aggregates.snapshot()
+    liquidity = totals["liquidity"]
+    new_price = price_from(totals)
+    return {
+        "volume": round(totals["volume"], 2),
+        "liquidity": liquidity,
+        "current_price": round(new_price, 4),
+    }, new_price
 
-    # Append the new computed price to the global price history.
-    current_time = datetime.datetime.now()
+def record_price(price):
+    """
+    Append a price sample to the history and the candles. Every tick records one, so
+    idle periods keep their length in the history and leave no gaps in the candles.
+    """
+    now = time.time()
     price_history.append({
-        "timestamp": current_time.strftime("%H:%M:%S"),
-        "price": round(new_price, 4)
+        "timestamp": datetime.datetime.fromtimestamp(now).strftime("%H:%M:%S"),
+        "price": round(price, 4)
     })
-    # Limit history to the last 50 data points.
-    if len(price_history) > 50:
+    # Limit history to the last HISTORY_SIZE data points.
+    if len(price_history) > HISTORY_SIZE:
         del price_history[0]
+    candles.record(now, price)
+
+# The first tick runs before the server starts, so /dashboard always has a snapshot.
+tick()
+threading.Thread(target=run_price_ticker, name="price-ticker", daemon=True).start()
 
+@app.route('/candles', methods=['GET'])
+def get_candles():
+    """
+    OHLCV price candles: ?res= one of 1s, 1m, 15m or 1h (default 1m), with optional
+    ?from= and ?to= epoch timestamps. The price ticker samples the price every
+    TICK_INTERVAL seconds, so while the token runs every bucket of at least that length
+    has a candle; each has the bucket start time in epoch seconds.
+    """
+    resolution = request.args.get('res', '1m')
+    if resolution not in RESOLUTIONS:
+        return jsonify({'error': f'res must be one of: {", ".join(RESOLUTIONS)}'}), 400
+    bounds = []
+    for param in ('from', 'to'):
+        value = request.args.get(param)
+        try:
+            bounds.append(None if value is None else float(value))
+        except ValueError:
+            bounds.append(math.nan)
+        if bounds[-1] is not None and not math.isfinite(bounds[-1]):
+            return jsonify({'error': f'{param} must be an epoch timestamp'}), 400
     return jsonify({
-        "volume": round(volume, 2),
-        "liquidity": liquidity,
-        "current_price": round(new_price, 4),
-        "history": price_history
-    })
+        'res': resolution,
+        'candles': candles.candles(resolution, *bounds)
+    }), 200
 
 def forward_transaction(payload):
     """
     Helper to forward a transaction payload to the mempool.
     The mempool endpoint is assumed to be POST /transaction.
-    If the payload does NOT include "mev_boost": true, a 10-second delay is scheduled before
-    marking the transaction as executed.
+    If the payload does NOT include "mev_boost": true, the mempool's own scheduler marks
+    the transaction as executed after its execution delay.
     """
     try:
-        response = requests.post(f"{MEMPOOL_URL}/transaction", json=payload)
-        if not payload.get("mev_boost", False):
-            tx_id = payload.get("id")
-            if tx_id:
-                threading.Timer(10, execute_transaction, args=(tx_id,)).start()
+        response = http_client.post(f"{MEMPOOL_URL}/transaction", json=payload)
         return response.json(), response.status_code
     except Exception as e:
         return {"error": str(e)}, 500
 
-def execute_transaction(tx_id):
-    """
-    Update the transaction's status from "pending" to "executed" in the mempool.
-    """
-    try:
-        response = requests.get(f"{MEMPOOL_URL}/transaction/{tx_id}")
-        if response.ok:
-            tx = response.json()
-            if tx.get("status") == "pending":
-                tx["status"] = "executed"
-                requests.delete(f"{MEMPOOL_URL}/transaction/{tx_id}")
-                requests.post(f"{MEMPOOL_URL}/transaction", json=tx)
-                print(f"Transaction {tx_id} status updated to executed after delay.")
-    except Exception as e:
-        print("Error executing transaction:", e)
-
 @app.route('/buy', methods=['POST'])
 def buy_tokens():
     data = request.get_json()
@@ -205,8 +307,7 @@ def remove_liquidity():
         return jsonify({'error': 'Invalid amount'}), 400
 
     # Check current liquidity to avoid over-removal.
-    transactions = fetch_mempool_transactions()
-    current_liquidity = compute_liquidity(transactions)
+    current_liquidity = aggregates.snapshot()["liquidity"]
 
     payload = {
         'type': 'remove_liquidity',
@@ -219,5 +320,14 @@ def remove_liquidity():
     resp, status = forward_transaction(payload)
     return jsonify(resp), status
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Monitoring counters: change-feed position and HTTP connection reuse."""
+    return jsonify({
+        'change_feed_cursor': change_feed.cursor,
+        'change_feed_resets': change_feed.resets,
+        'http': http_client.stats()
+    }), 200
+
 if __name__ == '__main__':
     app.run(port=5001, debug=True)
@@ -0,0 +1,194 @@
+import math
+import threading
+import time
+from array import array
+
+from portfolio import TradeRejected
+from trade_log import TradeLog
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; mark-to-market falls back to one pass in Python.
+    np = None
+
+# Lock stripes: accounts share one of these by row, so trades on different accounts
+# rarely contend while each account's check-and-update stays atomic.
+LOCK_STRIPES = 64
+
+
+def column_sum(column):
+    """Sum of a column returned by AccountStore.mark_to_market()."""
+    if np is not None and isinstance(column, np.ndarray):
+        return float(column.sum())
+    return math.fsum(column)
+
+
+class AccountStore:
+    """
+    Balances of many simulated trader accounts in typed columns.
+
+    Account ids are row numbers. Cash, the initial value and the quantity held of every
+    asset are array('d') columns indexed by account id (one column per asset), so
+    adding an account appends one slot per column and revaluing every account is a
+    single pass over the columns (vectorized when numpy is installed). Each account
+    has its own bounded trade log, created on its first trade.
+    """
+
+    def __init__(self, trade_log_size=100):
+        # Per-account logs are created on first trade, so their size is checked up front.
+        if trade_log_size < 1:
+            raise ValueError("Trade log size must be at least 1")
+        self.trade_log_size = trade_log_size
+        self._lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._cash = array("d")
+        self._initial_value = array("d")
+        self._holdings = []
+        self._asset_ids = {}
+        self._asset_names = []
+        self._prices = []
+        self._logs = {}
+
+    def __len__(self):
+        return len(self._cash)
+
+    def __contains__(self, account_id):
+        return isinstance(account_id, int) and 0 <= account_id < len(self._cash)
+
+    def asset_id(self, asset, create=False):
+        """Column index of an asset, or None if unknown (created when create=True)."""
+        asset_id = self._asset_ids.get(asset)
+        if asset_id is None and create:
+            with self._lock:
+                asset_id = self._asset_ids.get(asset)
+                if asset_id is None:
+                    asset_id = len(self._asset_names)
+                    self._holdings.append(array("d", bytes(8 * len(self._cash))))
+                    self._asset_names.append(asset)
+                    self._prices.append(0.0)
+                    self._asset_ids[asset] = asset_id
+        return asset_id
+
+    def set_price(self, asset, price):
+        self._prices[self.asset_id(asset, create=True)] = float(price)
+
+    def prices(self):
+        return dict(zip(self._asset_names, self._prices))
+
+    def create_accounts(self, count, liquidity, assets=None):
+        """
+        Open `count` accounts with the same starting cash and asset quantities. Their
+        initial value is taken at the current prices. Returns the new account ids.
+        """
+        holdings = {self.asset_id(asset, create=True): float(quantity)
+                    for asset, quantity in (assets or {}).items()}
+        initial_value = liquidity + sum(quantity * self._prices[asset_id]
+                                        for asset_id, quantity in holdings.items())
+        with self._lock:
+            first = len(self._cash)
+            self._cash.extend([float(liquidity)] * count)
+            self._initial_value.extend([initial_value] * count)
+            for asset_id, column in enumerate(self._holdings):
+                column.extend([holdings.get(asset_id, 0.0)] * count)
+            return list(range(first, first + count))
+
+    def trade(self, account_id, trade_type, asset, amount, price, source="User"):
+        """
+        Buy or sell `amount` USD worth of an asset at `price` for one account, atomically.
+        Returns the logged trade; raises TradeRejected if it is invalid or not covered.
+        """
+        asset_id = self.asset_id(asset)
+        if asset_id is None:
+            raise TradeRejected(f"Unknown asset {asset}")
+        with self._stripes[account_id % LOCK_STRIPES]:
+            quantity = self._apply(account_id, trade_type, asset_id, amount, price)
+        return self.log(account_id).append({
+            "trade_type": trade_type,
+            "asset": asset,
+            "amount": amount,
+            "quantity": quantity,
+            "price": price,
+            "source": source,
+            "timestamp": time.strftime("%H:%M:%S"),
+        })
+
+    def trade_many(self, trades, prices=None, source="User"):
+        """
+        Apply (account_id, trade_type, asset, amount) trades in order at the current (or
+        given) asset prices. Returns one result per trade: the logged trade or {"error"}.
+        """
+        prices = self.prices() if prices is None else prices
+        results = []
+        for account_id, trade_type, asset, amount in trades:
+            try:
+                if account_id not in self:
+                    raise TradeRejected("Unknown account")
+                results.append(self.trade(account_id, trade_type, asset, amount,
+                                          prices.get(asset, 0.0), source))
+            except TradeRejected as e:
+                results.append({"error": str(e)})
+        return results
+
+    def log(self, account_id):
+        trade_log = self._logs.get(account_id)
+        if trade_log is None:
+            with self._lock:
+                trade_log = self._logs.setdefault(account_id, TradeLog(self.trade_log_size))
+        return trade_log
+
+    def account(self, account_id):
+        """Balances and value of one account at the current prices."""
+        with self._stripes[account_id % LOCK_STRIPES]:
+            cash = self._cash[account_id]
+            holdings = {name: column[account_id]
+                        for name, column in zip(self._asset_names, self._holdings)}
+        total_value = cash + sum(quantity * self._prices[self._asset_ids[name]]
+                                 for name, quantity in holdings.items())
+        return {
+            "id": account_id,
+            "liquidity": cash,
+            "assets": holdings,
+            "total_value": total_value,
+            "pnl": total_value - self._initial_value[account_id],
+        }
+
+    def mark_to_market(self):
+        """
+        Revalue every account at the current prices in one pass over the columns.
+        Returns (total values, pnls) indexed by account id: numpy arrays when numpy is
+        installed, otherwise array('d').
+        """
+        with self._lock:
+            count = len(self._cash)
+            if np is not None:
+                values = np.frombuffer(self._cash, dtype=np.float64, count=count).copy()
+                for column, price in zip(self._holdings, self._prices):
+                    if price:
+                        values += np.frombuffer(column, dtype=np.float64, count=count) * price
+                return values, values - np.frombuffer(self._initial_value, dtype=np.float64, count=count)
+            values = array("d", self._cash)
+            for column, price in zip(self._holdings, self._prices):
+                if price:
+                    values = array("d", [value + quantity * price for value, quantity in zip(values, column)])
+            return values, array("d", [value - initial for value, initial in zip(values, self._initial_value)])
+
+    def _apply(self, account_id, trade_type, asset_id, amount, price):
+        if trade_type not in ("buy", "sell"):
+            raise TradeRejected("Invalid trade type")
+        if not amount > 0:
+            raise TradeRejected("Amount must be positive")
+        if not price > 0:
+            raise TradeRejected("No valid asset price")
+        holdings = self._holdings[asset_id]
+        quantity = amount / price
+        if trade_type == "buy":
+            if amount > self._cash[account_id]:
+                raise TradeRejected("Not enough liquidity", "liquidity")
+            self._cash[account_id] -= amount
+            holdings[account_id] += quantity
+        else:
+            if quantity > holdings[account_id]:
+                raise TradeRejected(f"Not enough {self._asset_names[asset_id]}", self._asset_names[asset_id])
+            holdings[account_id] -= quantity
+            self._cash[account_id] += amount
+        return quantity
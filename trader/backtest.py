@@ -0,0 +1,316 @@
+"""
+Offline backtests of trading strategies over recorded mempool histories.
+
+A history is the sequence of executed transactions as (timestamps, types, amounts)
+columns. It is replayed through the token service's price model to get the price
+after every transaction, and each strategy turns that into the TOKEN quantity it
+holds after every transaction. PnL then follows from cumulative sums over those
+columns, so a whole history is simulated without a per-transaction Python loop when
+numpy is installed (pure-Python loops are used otherwise).
+
+    python trader/backtest.py                      # a synthetic day of history
+    python trader/backtest.py history.jsonl        # WAL segment or archive
+    python trader/backtest.py history.npz          # columnar file (numpy only)
+    python trader/backtest.py synthetic --save day.npz
+"""
+import argparse
+import json
+import math
+import random
+import time
+
+from common import price_model
+
+np = price_model.np
+
+# Same constants as the token service.
+INITIAL_LIQUIDITY = 1000000
+TOTAL_CIRCULATION = 1000000
+BASE_PRICE = 1.0
+
+# Same thresholds as the frontrunner's default rules (frontrunner/rules.json).
+FRONT_RUN_THRESHOLD_LIQUIDITY = 150000.0
+LARGE_SELL_THRESHOLD = 800000.0
+
+# Starting portfolio of every simulated strategy, like the live trader's.
+START_LIQUIDITY = 100000.0
+START_QUANTITY = 5000.0
+
+TRANSACTION_TYPES = ["buy", "sell", "add_liquidity", "remove_liquidity"]
+TRANSACTION_WEIGHTS = [45, 45, 7, 3]
+
+
+class History:
+    """Executed transactions in execution order, as equal-length columns."""
+
+    def __init__(self, timestamps, types, amounts):
+        self.timestamps = timestamps
+        self.types = types
+        self.amounts = amounts
+
+    def __len__(self):
+        return len(self.types)
+
+
+def synthetic_history(seconds=86400, rate=20.0, start=None, seed=None):
+    """
+    Random executed transactions arriving at `rate` per second for `seconds` seconds
+    (a day at 20 per second is about 1.7 million). A few are large enough to look
+    like the attacks the frontrunner detects.
+    """
+    count = int(seconds * rate)
+    start = time.time() - seconds if start is None else start
+    if np is not None:
+        rng = np.random.default_rng(seed)
+        weights = np.array(TRANSACTION_WEIGHTS, dtype=np.float64)
+        types = np.array(TRANSACTION_TYPES)[rng.choice(len(TRANSACTION_TYPES), count, p=weights / weights.sum())]
+        amounts = np.round(rng.uniform(1000, 100000, count), 2)
+        whales = rng.random(count) < 0.0005
+        amounts[whales] = np.round(amounts[whales] * 10, 2)
+        timestamps = start + np.sort(rng.uniform(0, seconds, count))
+        return History(timestamps, types, amounts)
+
+    rng = random.Random(seed)
+    types = rng.choices(TRANSACTION_TYPES, weights=TRANSACTION_WEIGHTS, k=count)
+    amounts = [round(rng.uniform(1000, 100000) * (10 if rng.random() < 0.0005 else 1), 2)
+               for _ in range(count)]
+    timestamps = sorted(start + rng.uniform(0, seconds) for _ in range(count))
+    return History(timestamps, types, amounts)
+
+
+def load_history(path):
+    """
+    Load executed transactions from a columnar .npz file (see save_history) or from a
+    JSONL file: mempool write-ahead log segments or the transaction archive. (Binary
+    mempool snapshots are not read.) Transactions that are not executed are skipped.
+    """
+    if path.endswith(".npz"):
+        if np is None:
+            raise RuntimeError("Loading .npz histories requires numpy")
+        with np.load(path) as data:
+            return History(data["timestamps"], data["types"], data["amounts"])
+
+    # Executed transactions by id, in execution order. Write-ahead log events are applied
+    # the way the token's TokenAggregates applies them: a transaction counts once it is
+    # added as executed or updated to executed, and stops counting when it is updated
+    # away from executed or removed (being archived keeps it executed).
+    executed = {}
+    with open(path, "rb") as f:
+        for number, line in enumerate(f):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn final line from a crash.
+                continue
+            if not isinstance(record, dict):
+                continue
+            if "op" in record:
+                tx, executed_at = record.get("transaction") or {}, record.get("ts")
+                key = record.get("id", tx.get("id"))
+                if record["op"] == "removed" or (record["op"] == "updated" and tx.get("status") != "executed"):
+                    executed.pop(key, None)
+                    continue
+                if record["op"] not in ("added", "updated"):
+                    continue
+            elif "type" in record:
+                # Archived (or hand-written) transaction.
+                tx, executed_at = record, record.get("executed_at")
+                key = tx.get("id", ("line", number))
+            else:
+                continue
+            if tx.get("status", "executed") != "executed":
+                continue
+            try:
+                amount = float(tx.get("amount", 0))
+            except (TypeError, ValueError):
+                continue
+            # A transaction that executes again counts from its latest execution.
+            executed.pop(key, None)
+            executed[key] = (math.nan if executed_at is None else float(executed_at), tx.get("type"), amount)
+
+    rows = list(executed.values())
+    if rows and not any(math.isnan(row[0]) for row in rows):
+        # Concatenated files need not be in execution order.
+        rows.sort(key=lambda row: row[0])
+    timestamps = [row[0] for row in rows]
+    types = [row[1] if isinstance(row[1], str) else "" for row in rows]
+    amounts = [row[2] for row in rows]
+    if np is not None:
+        return History(np.array(timestamps, dtype=np.float64), np.array(types), np.array(amounts, dtype=np.float64))
+    return History(timestamps, types, amounts)
+
+
+def save_history(history, path):
+    """Write a history as a columnar .npz file."""
+    if np is None:
+        raise RuntimeError("Saving .npz histories requires numpy")
+    np.savez(path, timestamps=np.asarray(history.timestamps, dtype=np.float64),
+             types=np.asarray(history.types), amounts=np.asarray(history.amounts, dtype=np.float64))
+
+
+def replay_prices(history):
+    """Token price after each transaction of the history, as the token dashboard computes it."""
+    return price_model.price_series(history.types, history.amounts, INITIAL_LIQUIDITY,
+                                    TOTAL_CIRCULATION, BASE_PRICE)
+
+
+def hold(history, prices, quantity=START_QUANTITY):
+    """Keep the starting TOKEN position throughout."""
+    if np is not None:
+        return np.full(len(prices), quantity)
+    return [quantity] * len(prices)
+
+
+def momentum(history, prices, quantity=START_QUANTITY, window=1000):
+    """
+    Hold `quantity` TOKEN while the price is above its moving average over the last
+    `window` transactions, and nothing otherwise.
+    """
+    if np is not None:
+        sums = np.cumsum(np.concatenate(([0.0], prices)))
+        counts = np.minimum(np.arange(1, len(prices) + 1), window)
+        average = (sums[1:] - sums[np.arange(1, len(prices) + 1) - counts]) / counts
+        return np.where(prices > average, quantity, 0.0)
+
+    positions = []
+    total = 0.0
+    for i, price in enumerate(prices):
+        total += price
+        if i >= window:
+            total -= prices[i - window]
+        positions.append(quantity if price > total / min(i + 1, window) else 0.0)
+    return positions
+
+
+def watchdog(history, prices, quantity=START_QUANTITY, cooldown=100):
+    """
+    The watchdog's defence: sell out of TOKEN once a large sell or liquidity removal
+    (the frontrunner's attack triggers) has executed, and buy back after `cooldown`
+    further transactions without one. The position held after transaction i is decided
+    from transactions before i only, so it never anticipates the move it trades at.
+    """
+    if np is not None:
+        types = np.asarray(history.types)
+        amounts = np.asarray(history.amounts, dtype=np.float64)
+        threat = (((types == "sell") & (amounts >= LARGE_SELL_THRESHOLD)) |
+                  ((types == "remove_liquidity") & (amounts >= FRONT_RUN_THRESHOLD_LIQUIDITY)))
+        threats = np.concatenate(([0], np.cumsum(threat)))
+        before = np.arange(len(prices))
+        # Position after transaction i: flat if any of transactions i-cooldown .. i-1 is a threat.
+        return np.where(threats[before] > threats[np.maximum(before - cooldown, 0)], 0.0, quantity)
+
+    threats = [0]
+    for tx_type, amount in zip(history.types, history.amounts):
+        threatening = ((tx_type == "sell" and amount >= LARGE_SELL_THRESHOLD) or
+                       (tx_type == "remove_liquidity" and amount >= FRONT_RUN_THRESHOLD_LIQUIDITY))
+        threats.append(threats[-1] + threatening)
+    return [0.0 if threats[i] > threats[max(i - cooldown, 0)] else quantity for i in range(len(prices))]
+
+
+STRATEGIES = {"hold": hold, "momentum": momentum, "watchdog": watchdog}
+
+
+def simulate(positions, prices, liquidity=START_LIQUIDITY, quantity=START_QUANTITY, base_price=BASE_PRICE):
+    """
+    PnL of holding positions[i] TOKEN after transaction i, trading at prices[i] (the
+    price after it) from a start of `liquidity` cash and `quantity` TOKEN. Returns the
+    final value, PnL, number of trades and maximum drawdown.
+    """
+    initial_value = liquidity + quantity * base_price
+    if not len(prices):
+        return {"final_value": initial_value, "pnl": 0.0, "trades": 0, "max_drawdown": 0.0}
+
+    if np is not None:
+        positions = np.asarray(positions, dtype=np.float64)
+        prices = np.asarray(prices, dtype=np.float64)
+        traded = np.diff(positions, prepend=quantity)
+        cash = liquidity - np.cumsum(traded * prices)
+        value = cash + positions * prices
+        drawdown = np.maximum.accumulate(np.maximum(value, initial_value)) - value
+        trades = int(np.count_nonzero(traded))
+        final_value, max_drawdown = float(value[-1]), float(drawdown.max())
+    else:
+        cash = liquidity
+        previous = quantity
+        peak = initial_value
+        trades = 0
+        max_drawdown = 0.0
+        for position, price in zip(positions, prices):
+            if position != previous:
+                cash -= (position - previous) * price
+                trades += 1
+                previous = position
+            value = cash + position * price
+            peak = max(peak, value)
+            max_drawdown = max(max_drawdown, peak - value)
+        final_value = value
+
+    return {"final_value": final_value, "pnl": final_value - initial_value,
+            "trades": trades, "max_drawdown": max_drawdown}
+
+
+def run(history, strategies=None):
+    """
+    Replay a history and simulate the given strategies (default: all) over it. Returns
+    {"transactions", "final_price", "timings", "results"}; timings are in seconds.
+    """
+    strategies = strategies or list(STRATEGIES)
+    timings = {}
+    started = time.perf_counter()
+    prices = replay_prices(history)
+    timings["prices"] = time.perf_counter() - started
+
+    results = {}
+    for name in strategies:
+        started = time.perf_counter()
+        results[name] = simulate(STRATEGIES[name](history, prices), prices)
+        timings[name] = time.perf_counter() - started
+    return {"transactions": len(history),
+            "final_price": float(prices[-1]) if len(prices) else BASE_PRICE,
+            "timings": timings,
+            "results": results}
+
+
+def rate(count, seconds):
+    return f"{count / seconds:,.0f} tx/s" if seconds > 0 else "-"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest trading strategies over a mempool history.")
+    parser.add_argument("history", nargs="?", default="synthetic",
+                        help="a .jsonl or .npz history file, or 'synthetic' (default)")
+    parser.add_argument("--strategy", action="append", choices=sorted(STRATEGIES),
+                        help="strategy to simulate (repeatable; default: all)")
+    parser.add_argument("--seconds", type=float, default=86400,
+                        help="length of the synthetic history in seconds (default: one day)")
+    parser.add_argument("--rate", type=float, default=20.0,
+                        help="synthetic transactions per second (default: 20)")
+    parser.add_argument("--seed", type=int, help="random seed of the synthetic history")
+    parser.add_argument("--save", help="also write the loaded history to this .npz file")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.history == "synthetic":
+        history = synthetic_history(args.seconds, args.rate, seed=args.seed)
+    else:
+        history = load_history(args.history)
+    load_time = time.perf_counter() - started
+    if args.save:
+        save_history(history, args.save)
+
+    print(f"Backtesting {len(history):,} transactions from {args.history} "
+          f"({'numpy' if np is not None else 'pure Python'} engine)")
+    print(f"{'load':<12} {load_time:8.3f}s  {rate(len(history), load_time)}")
+    report = run(history, args.strategy)
+    for step, seconds in report["timings"].items():
+        print(f"{step:<12} {seconds:8.3f}s  {rate(len(history), seconds)}")
+    replay_time = sum(report["timings"].values())
+    print(f"{'replay':<12} {replay_time:8.3f}s  {rate(len(history), replay_time)}")
+    print(f"Final price: {report['final_price']:.6f}")
+    for name, result in report["results"].items():
+        print(f"{name:<12} value {result['final_value']:14,.2f}  pnl {result['pnl']:+14,.2f}  "
+              f"trades {result['trades']:8,}  max drawdown {result['max_drawdown']:12,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import threading
+
+
+class TradeRejected(Exception):
+    """
+    Raised when a trade cannot be applied. `resource` names what was short
+    ("liquidity" or the asset symbol), or is None for an invalid trade.
+    """
+
+    def __init__(self, message, resource=None):
+        super().__init__(message)
+        self.resource = resource
+
+
+class PortfolioEngine:
+    """
+    Thread-safe simulated portfolio of cash liquidity and one asset.
+
+    Every trade is applied under one lock, so the balance check and the debit/credit
+    happen atomically and concurrent trades can never overdraw the portfolio. Batches
+    are applied in order under a single lock acquisition.
+    """
+
+    def __init__(self, liquidity, asset_quantity, initial_value, asset="TOKEN"):
+        self.asset = asset
+        self.initial_value = initial_value
+        self._liquidity = liquidity
+        self._quantity = asset_quantity
+        self._lock = threading.Lock()
+
+    def apply(self, trade_type, amount, price):
+        """
+        Buy or sell `amount` USD worth of the asset at `price`. Returns the asset quantity
+        traded; raises TradeRejected if the trade is invalid or not covered.
+        """
+        with self._lock:
+            return self._apply(trade_type, amount, price)
+
+    def apply_batch(self, trades, price):
+        """
+        Apply (trade_type, amount) trades in order at one price. Returns one result per
+        trade: {"quantity": ...} or {"error": ...}; rejected trades do not stop the batch.
+        """
+        results = []
+        with self._lock:
+            for trade_type, amount in trades:
+                try:
+                    results.append({"quantity": self._apply(trade_type, amount, price)})
+                except TradeRejected as e:
+                    results.append({"error": str(e)})
+        return results
+
+    def snapshot(self, price=None):
+        """Consistent copy of the balances, valued at `price` when given."""
+        with self._lock:
+            liquidity, quantity = self._liquidity, self._quantity
+        data = {
+            "liquidity": liquidity,
+            "assets": {self.asset: quantity},
+            "initial_value": self.initial_value,
+        }
+        if price is not None:
+            data["total_value"] = liquidity + quantity * price
+            data["pnl"] = data["total_value"] - self.initial_value
+        return data
+
+    def _apply(self, trade_type, amount, price):
+        if trade_type not in ("buy", "sell"):
+            raise TradeRejected("Invalid trade type")
+        if not amount > 0:
+            raise TradeRejected("Amount must be positive")
+        if not price > 0:
+            raise TradeRejected("No valid asset price")
+        quantity = amount / price
+        if trade_type == "buy":
+            if amount > self._liquidity:
+                raise TradeRejected("Not enough liquidity", "liquidity")
+            self._liquidity -= amount
+            self._quantity += quantity
+        else:
+            if quantity > self._quantity:
+                raise TradeRejected(f"Not enough {self.asset}", self.asset)
+            self._quantity -= quantity
+            self._liquidity += amount
+        return quantity
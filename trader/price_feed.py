@@ -0,0 +1,99 @@
+import threading
+import time
+
+
+class PriceFeed:
+    """
+    Cached asset price with a bounded age.
+
+    A background thread refreshes the price every refresh_interval seconds, so get()
+    normally answers from memory. If the cached price is older than max_staleness
+    (e.g. the refresher fell behind) get() refreshes it first. Concurrent refreshes are
+    coalesced (single-flight): one caller runs fetch() and the others wait for and
+    share its result. When a refresh fails the last known price is kept, and its age
+    shows how stale it is.
+    """
+
+    def __init__(self, fetch, max_staleness=2.0, refresh_interval=1.0, default=1.0):
+        self.max_staleness = max_staleness
+        self.refresh_interval = refresh_interval
+        self.refreshes = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._fetch = fetch
+        self._price = default
+        self._updated_at = None
+        self._attempted_at = None
+        self._in_flight = False
+        self._generation = 0
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="price-feed", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def get(self):
+        """Return (price, age in seconds), refreshing first if the price is too stale."""
+        age = self.age()
+        # After a failed refresh the stale price is served (with its age) until the next
+        # attempt is due, rather than every request waiting on a service that is down.
+        if (age is None or age > self.max_staleness) and not self._recently_failed():
+            self.refresh()
+        with self._cond:
+            return self._price, self.age()
+
+    def age(self):
+        """Seconds since the price was last confirmed upstream, or None if it never was."""
+        updated_at = self._updated_at
+        return None if updated_at is None else time.monotonic() - updated_at
+
+    def refresh(self, fetch=None):
+        """
+        Fetch the price upstream, or wait for the refresh already in flight. fetch
+        replaces the feed's own fetch function for this refresh.
+        """
+        with self._cond:
+            if self._in_flight:
+                self.coalesced += 1
+                generation = self._generation
+                self._cond.wait_for(lambda: self._generation != generation)
+                return
+            self._in_flight = True
+        try:
+            price = (fetch or self._fetch)()
+        except Exception as e:
+            print("Error refreshing asset price:", e)
+            price = None
+        with self._cond:
+            self._attempted_at = time.monotonic()
+            if price is None:
+                self.errors += 1
+            else:
+                self._price = price
+                self._updated_at = self._attempted_at
+            self.refreshes += 1
+            self._in_flight = False
+            self._generation += 1
+            self._cond.notify_all()
+
+    def _recently_failed(self):
+        attempted_at = self._attempted_at
+        return (attempted_at is not None and attempted_at != self._updated_at
+                and time.monotonic() - attempted_at < self.refresh_interval)
+
+    def stats(self):
+        price, age = self._price, self.age()
+        return {
+            "price": price,
+            "age": None if age is None else round(age, 3),
+            "max_staleness": self.max_staleness,
+            "refreshes": self.refreshes,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+        }
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_interval)
@@ -0,0 +1,94 @@
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from portfolio import PortfolioEngine, TradeRejected
+
+# Trader API to stress in HTTP mode (see usage below).
+TRADER_URL = "http://localhost:5004"
+
+START_LIQUIDITY = 100000.0
+START_QUANTITY = 5000.0
+PRICE = 1.0
+
+def random_trade():
+    """A random buy or sell of up to 2000 USD, big enough that some will be rejected."""
+    return random.choice(["buy", "sell"]), round(random.uniform(10, 2000), 2)
+
+def stress_engine(num_trades, concurrency):
+    """Apply trades to an in-process PortfolioEngine from `concurrency` threads at once."""
+    engine = PortfolioEngine(START_LIQUIDITY, START_QUANTITY, START_LIQUIDITY + START_QUANTITY * PRICE)
+    accepted = []
+    accepted_lock = threading.Lock()
+    start = threading.Barrier(concurrency)
+
+    def worker(count):
+        start.wait()
+        for _ in range(count):
+            trade_type, amount = random_trade()
+            try:
+                engine.apply(trade_type, amount, PRICE)
+            except TradeRejected:
+                continue
+            with accepted_lock:
+                accepted.append((trade_type, amount))
+
+    per_thread = num_trades // concurrency
+    threads = [threading.Thread(target=worker, args=(per_thread,)) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return engine.snapshot(), accepted, per_thread * concurrency, elapsed
+
+def stress_http(num_trades, concurrency, url):
+    """POST trades to a running trader service from `concurrency` concurrent clients."""
+    import requests
+
+    before = requests.get(f"{url}/api/portfolio").json()
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+    def send(trade):
+        response = session.post(f"{url}/api/trade", json={"type": trade[0], "amount": trade[1]})
+        return trade if response.ok else None
+
+    trades = [random_trade() for _ in range(num_trades)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        accepted = [trade for trade in pool.map(send, trades) if trade is not None]
+    elapsed = time.perf_counter() - started
+    after = requests.get(f"{url}/api/portfolio").json()
+    return before, after, accepted, num_trades, elapsed
+
+def expected_liquidity(start, accepted):
+    """Cash after the accepted trades; independent of the price each one ran at."""
+    return start + sum(-amount if trade_type == "buy" else amount for trade_type, amount in accepted)
+
+if __name__ == '__main__':
+    # Usage: python trader/stress_trader.py [trades] [concurrency] [http]
+    # With "http" the trades go to the trader service at TRADER_URL (which must be running),
+    # otherwise to an in-process PortfolioEngine.
+    num_trades = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    if len(sys.argv) > 3 and sys.argv[3] == "http":
+        before, after, accepted, sent, elapsed = stress_http(num_trades, concurrency, TRADER_URL)
+        start_liquidity, liquidity = before["liquidity"], after["liquidity"]
+        quantity = after["assets"]["TOKEN"]
+    else:
+        snapshot, accepted, sent, elapsed = stress_engine(num_trades, concurrency)
+        start_liquidity, liquidity = START_LIQUIDITY, snapshot["liquidity"]
+        quantity = snapshot["assets"]["TOKEN"]
+
+    print(f"{sent} trades from {concurrency} concurrent clients in {elapsed:.2f}s "
+          f"({sent / elapsed:.0f} trades/s), {len(accepted)} accepted")
+    expected = expected_liquidity(start_liquidity, accepted)
+    print(f"Liquidity {liquidity:.2f} (expected {expected:.2f}), TOKEN {quantity:.4f}")
+    # The HTTP payload rounds liquidity to cents.
+    consistent = abs(liquidity - expected) < 0.01 and liquidity >= 0 and quantity >= -1e-9
+    print("Balances consistent." if consistent else "BALANCES INCONSISTENT!")
+    sys.exit(0 if consistent else 1)
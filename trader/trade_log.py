@@ -0,0 +1,76 @@
+import itertools
+import json
+import os
+import threading
+from array import array
+from collections import deque
+
+
+class TradeLog:
+    """
+    Bounded log of executed trades, newest last.
+
+    Each trade gets an increasing sequence number, which is also its pagination cursor.
+    Only the newest `size` trades are kept in memory; older ones are dropped, or, when
+    a spill_path is given, appended to a JSON-lines file from which they can still be
+    paged (only their byte offsets stay in memory).
+    """
+
+    def __init__(self, size=1000, spill_path=None):
+        if size < 1:
+            raise ValueError("Trade log size must be at least 1")
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=size)
+        self._seq = itertools.count(1)
+        self._spill = None
+        self._spill_offsets = array("q")
+        if spill_path:
+            directory = os.path.dirname(spill_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # The trader's state is not persisted, so the spill file starts empty too.
+            self._spill = open(spill_path, "wb+")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries) + len(self._spill_offsets)
+
+    def append(self, entry):
+        """Add a trade and return it with its sequence number."""
+        with self._lock:
+            entry = dict(entry, seq=next(self._seq))
+            if len(self._entries) == self._entries.maxlen:
+                self._evict(self._entries[0])
+            self._entries.append(entry)
+            return entry
+
+    def page(self, limit=50, before=None):
+        """
+        Up to `limit` trades with a sequence number below `before` (default: the newest),
+        newest first, and the cursor for the next page (None when there is none).
+        """
+        with self._lock:
+            if not self._entries:
+                return [], None
+            first_seq = self._entries[0]["seq"]
+            last_seq = self._entries[-1]["seq"]
+            top = last_seq if before is None else min(before - 1, last_seq)
+            # Spilled trades run from sequence number 1 up to the oldest one in memory.
+            bottom = 1 if self._spill is not None else first_seq
+            seqs = range(top, max(bottom, top - limit + 1) - 1, -1)
+            trades = [self._entries[seq - first_seq] if seq >= first_seq else self._read_spilled(seq)
+                      for seq in seqs]
+            next_before = trades[-1]["seq"] if trades and trades[-1]["seq"] > bottom else None
+            return trades, next_before
+
+    def _evict(self, entry):
+        if self._spill is None:
+            return
+        self._spill.seek(0, os.SEEK_END)
+        self._spill_offsets.append(self._spill.tell())
+        self._spill.write(json.dumps(entry, separators=(",", ":")).encode() + b"\n")
+        self._spill.flush()
+
+    def _read_spilled(self, seq):
+        self._spill.seek(self._spill_offsets[seq - 1])
+        return json.loads(self._spill.readline())
@@ -1,70 +1,158 @@
 from flask import Flask, jsonify, render_template, request
-import requests
 import random
 import time
+from collections import deque
 from flask_cors import CORS
 import uuid
+import os
+
+from common.http_client import HttpClient
+from price_feed import PriceFeed
+from trade_log import TradeLog
+from portfolio import PortfolioEngine, TradeRejected
+from accounts import AccountStore, column_sum
 
 app = Flask(__name__)
 CORS(app)
 
-# Simulated trader portfolio.
-portfolio = {
-    "liquidity": 100000.0,      # Cash in USD
-    "assets": { "TOKEN": 5000 }, # Quantity of TOKEN owned
-    "initial_value": 100000.0    # Initial portfolio value (USD)
-}
+# Pooled keep-alive client (with timeouts and retries) for calls to the other services.
+http_client = HttpClient()
+
+# Simulated trader portfolio: 100000 USD cash, 5000 TOKEN, initial value 100000 USD.
+# Trades are applied atomically by the engine, so concurrent requests cannot overdraw it.
+portfolio = PortfolioEngine(liquidity=100000.0, asset_quantity=5000, initial_value=100000.0)
 
 # Global variable to track WatchdogAI status.
 watchdog_activated = True
 
-# For simulation, record portfolio total value history.
-portfolio_history = []
+# For simulation, record portfolio total value history (the last 50 points).
+portfolio_history = deque(maxlen=50)
+
+# Executed trades, newest last. Only the newest TRADE_LOG_SIZE are kept in memory; set
+# TRADER_TRADE_LOG_SPILL to a file path to keep older ones pageable from disk.
+TRADE_LOG_SIZE = int(os.environ.get("TRADER_TRADE_LOG_SIZE", 1000))
+trade_log = TradeLog(TRADE_LOG_SIZE, os.environ.get("TRADER_TRADE_LOG_SPILL"))
 
-trade_log = []
+# Largest page returned by GET /api/trades.
+MAX_TRADES_PAGE = 1000
+
+# Simulated trader accounts (see /api/accounts), held in array columns by account id.
+# Each account keeps its newest ACCOUNT_TRADE_LOG_SIZE trades.
+ACCOUNT_TRADE_LOG_SIZE = int(os.environ.get("TRADER_ACCOUNT_TRADE_LOG_SIZE", 100))
+accounts = AccountStore(ACCOUNT_TRADE_LOG_SIZE)
+accounts.asset_id(portfolio.asset, create=True)
+
+# Most accounts a single POST /api/accounts may open, and most listed per page.
+MAX_ACCOUNTS_PER_REQUEST = 100000
+MAX_ACCOUNTS_PAGE = 1000
 
 # URL of the memecoin dashboard (running on port 5001)
 MEMECOIN_DASHBOARD_URL = "http://localhost:5001/dashboard"
 
-def fetch_asset_price():
+# Latest dashboard ETag, so unchanged prices are confirmed with a 304 instead of a body,
+# and the mempool change cursor that price reflects.
+dashboard_etag = {"value": None, "price": None, "cursor": None}
+
+def fetch_asset_price(cursor=None):
     """
-    Pull the current asset price from the memecoin dashboard.
-    If any error occurs, default to 1.0.
+    Pull the current asset price from the memecoin dashboard with a conditional GET.
+    With a cursor the dashboard first waits to reflect that mempool change.
+    Returns None if it cannot be fetched.
     """
+    headers = {"If-None-Match": dashboard_etag["value"]} if dashboard_etag["value"] else {}
+    params = {"cursor": cursor} if cursor is not None else None
     try:
-        response = requests.get(MEMECOIN_DASHBOARD_URL)
+        response = http_client.get(MEMECOIN_DASHBOARD_URL, headers=headers, params=params)
+        if response.status_code == 304:
+            return dashboard_etag["price"]
         if response.ok:
             data = response.json()
-            return float(data.get("current_price", 1.0))
-        else:
-            return 1.0
+            price = float(data.get("current_price", 1.0))
+            dashboard_etag["value"] = response.headers.get("ETag")
+            dashboard_etag["price"] = price
+            dashboard_etag["cursor"] = data.get("cursor")
+            return price
+        return None
     except Exception as e:
         print("Error fetching asset price:", e)
-        return 1.0
+        return None
+
+# Trades and portfolio reads use this cached price instead of calling the token service.
+# It is refreshed in the background and never served older than PRICE_MAX_STALENESS
+# seconds while the token service is reachable (1.0 until the first successful fetch).
+PRICE_MAX_STALENESS = float(os.environ.get("TRADER_PRICE_MAX_STALENESS", 2))
+PRICE_REFRESH_INTERVAL = float(os.environ.get("TRADER_PRICE_REFRESH_INTERVAL", 1))
+price_feed = PriceFeed(fetch_asset_price, max_staleness=PRICE_MAX_STALENESS,
+                       refresh_interval=PRICE_REFRESH_INTERVAL).start()
+
+# Trades are refused (503) while the price has never been fetched or was last confirmed
+# more than TRADER_TRADE_PRICE_MAX_AGE seconds ago (the token service is unreachable).
+TRADE_PRICE_MAX_AGE = float(os.environ.get("TRADER_TRADE_PRICE_MAX_AGE", 10))
+
+def trade_price():
+    """
+    Return (asset price, None) for pricing a trade, or (None, 503 response) if there is
+    no price recent enough to trade at.
+    """
+    asset_price, price_age = price_feed.get()
+    if price_age is None:
+        return None, (jsonify({"error": "Asset price is not available yet"}), 503)
+    if price_age > TRADE_PRICE_MAX_AGE:
+        return None, (jsonify({"error": f"Asset price is stale ({price_age:.1f}s old)",
+                               "asset_price_age": round(price_age, 3)}), 503)
+    return asset_price, None
+
+@app.route('/api/price', methods=['GET'])
+def get_price():
+    """The cached asset price, its age in seconds and the feed's refresh counters."""
+    return jsonify(price_feed.stats())
 
 @app.route('/api/portfolio', methods=['GET'])
 def get_portfolio():
-    asset_price = fetch_asset_price()
-    asset_value = portfolio['assets'].get("TOKEN", 0) * asset_price
-    total_value = portfolio["liquidity"] + asset_value
-    pnl = total_value - portfolio["initial_value"]
+    """
+    Portfolio valued at the cached asset price. With ?cursor=<seq> (of a mempool stream
+    event) the price is first refreshed if it does not reflect that change yet;
+    price_cursor in the response is the mempool change the price reflects.
+    """
+    cursor = request.args.get('cursor', type=int)
+    price_cursor = dashboard_etag["cursor"]
+    if cursor is not None and (price_cursor is None or price_cursor < cursor):
+        price_feed.refresh(lambda: fetch_asset_price(cursor))
+    asset_price, price_age = price_feed.get()
+    snapshot = portfolio.snapshot(asset_price)
 
     data = {
-        "liquidity": round(portfolio["liquidity"], 2),
-        "assets": portfolio["assets"],
+        "liquidity": round(snapshot["liquidity"], 2),
+        "assets": snapshot["assets"],
         "asset_price": asset_price,
-        "total_value": round(total_value, 2),
-        "pnl": round(pnl, 2),
-        "trade_log": trade_log
+        "asset_price_age": None if price_age is None else round(price_age, 3),
+        "price_cursor": dashboard_etag["cursor"],
+        "total_value": round(snapshot["total_value"], 2),
+        "pnl": round(snapshot["pnl"], 2)
     }
     # Record the total value with a timestamp.
     portfolio_history.append({"timestamp": time.strftime("%H:%M:%S"), "total_value": data["total_value"]})
-    # Limit history to the last 50 points.
-    if len(portfolio_history) > 50:
-        del portfolio_history[0]
-    data["history"] = portfolio_history
+    data["history"] = list(portfolio_history)
     return jsonify(data)
 
+def parse_trade(data):
+    """Return (trade_type, amount) from a trade request body, or raise ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("Invalid trade")
+    try:
+        return data.get("type"), float(data.get("amount", 0))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid amount")
+
+def log_trade(trade_type, amount, source):
+    return trade_log.append({
+        "id": str(uuid.uuid4()),
+        "trade_type": trade_type,
+        "amount": amount,
+        "source": source,
+        "timestamp": time.strftime("%H:%M:%S")
+    })
+
 @app.route('/api/trade', methods=['POST'])
 def trade():
     """
@@ -74,42 +162,63 @@ def trade():
     For a buy: subtract liquidity, add TOKEN at the current price.
     For a sell: subtract TOKEN, add liquidity.
     """
-    data = request.get_json()
-    trade_type = data.get("type")
     try:
-        amount = float(data.get("amount", 0))
-    except Exception:
-        return jsonify({"error": "Invalid amount"}), 400
-
-    asset_price = fetch_asset_price()
-
-    if trade_type == "buy":
-        tokens_bought = amount / asset_price
-        if amount > portfolio["liquidity"]:
-            return jsonify({"error": "Not enough liquidity to buy"}), 400
-        portfolio["liquidity"] -= amount
-        portfolio["assets"]["TOKEN"] = portfolio["assets"].get("TOKEN", 0) + tokens_bought
-        message = f"Bought {round(tokens_bought,2)} TOKEN at ${asset_price}"
-    elif trade_type == "sell":
-        tokens_to_sell = amount / asset_price
-        if tokens_to_sell > portfolio["assets"].get("TOKEN", 0):
-            return jsonify({"error": "Not enough TOKEN to sell"}), 400
-        portfolio["assets"]["TOKEN"] -= tokens_to_sell
-        portfolio["liquidity"] += amount
-        message = f"Sold {round(tokens_to_sell,2)} TOKEN at ${asset_price}"
-    else:
-        return jsonify({"error": "Invalid trade type"}), 400
-
-    # Log the trade.
-    trade_log.insert(0, {
-        "id": str(uuid.uuid4()),
-        "trade_type": trade_type,
-        "amount": amount,
-        "source": "User",
-        "timestamp": time.strftime("%H:%M:%S")
-    })
+        trade_type, amount = parse_trade(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    asset_price, error = trade_price()
+    if error:
+        return error
+    try:
+        quantity = portfolio.apply(trade_type, amount, asset_price)
+    except TradeRejected as e:
+        error = {"liquidity": "Not enough liquidity to buy",
+                 portfolio.asset: f"Not enough {portfolio.asset} to sell"}.get(e.resource, str(e))
+        return jsonify({"error": error}), 400
+
+    verb = "Bought" if trade_type == "buy" else "Sold"
+    message = f"{verb} {round(quantity,2)} {portfolio.asset} at ${asset_price}"
+    log_trade(trade_type, amount, "User")
+    return jsonify({"message": message, "portfolio": portfolio.snapshot(), "mev_boost": False})
+
+@app.route('/api/trade/batch', methods=['POST'])
+def trade_batch():
+    """
+    Apply a JSON array of {"type", "amount"} trades in order, atomically with respect to
+    other trades and at a single asset price. The response has one result per trade:
+    {"quantity"} or {"error"}.
+    """
+    items = request.get_json(silent=True)
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty JSON array of trades"}), 400
+
+    results = [None] * len(items)
+    positions = []
+    trades = []
+    for i, data in enumerate(items):
+        try:
+            trades.append(parse_trade(data))
+            positions.append(i)
+        except ValueError as e:
+            results[i] = {"error": str(e)}
 
-    return jsonify({"message": message, "portfolio": portfolio, "mev_boost": False})
+    asset_price, error = trade_price()
+    if error:
+        return error
+    applied = 0
+    for i, (trade_type, amount), result in zip(positions, trades, portfolio.apply_batch(trades, asset_price)):
+        results[i] = result
+        if "quantity" in result:
+            log_trade(trade_type, amount, "User")
+            applied += 1
+    return jsonify({
+        "applied": applied,
+        "failed": len(items) - applied,
+        "asset_price": asset_price,
+        "results": results,
+        "portfolio": portfolio.snapshot()
+    })
 
 @app.route('/api/autotrade', methods=['POST'])
 def autotrade():
@@ -120,43 +229,226 @@ def autotrade():
       - amount: USD amount to execute.
     This endpoint updates the portfolio and records the trade in the log.
     """
-    data = request.get_json()
-    trade_type = data.get("type")
     try:
-        amount = float(data.get("amount", 0))
-    except Exception:
-        return jsonify({"error": "Invalid amount"}), 400
-
-    asset_price = fetch_asset_price()
-
-    if trade_type == "buy":
-        tokens_bought = amount / asset_price
-        if amount > portfolio["liquidity"]:
-            return jsonify({"error": "Not enough liquidity for autotrade"}), 400
-        portfolio["liquidity"] -= amount
-        portfolio["assets"]["TOKEN"] = portfolio["assets"].get("TOKEN", 0) + tokens_bought
-        message = f"Auto-bought {round(tokens_bought,2)} TOKEN at ${asset_price}"
-    elif trade_type == "sell":
-        tokens_to_sell = amount / asset_price
-        if tokens_to_sell > portfolio["assets"].get("TOKEN", 0):
-            return jsonify({"error": "Not enough TOKEN for autotrade"}), 400
-        portfolio["assets"]["TOKEN"] -= tokens_to_sell
-        portfolio["liquidity"] += amount
-        message = f"Auto-sold {round(tokens_to_sell,2)} TOKEN at ${asset_price}"
-    else:
-        return jsonify({"error": "Invalid trade type for autotrade"}), 400
+        trade_type, amount = parse_trade(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
+    asset_price, error = trade_price()
+    if error:
+        return error
+    try:
+        quantity = portfolio.apply(trade_type, amount, asset_price)
+    except TradeRejected as e:
+        error = {"liquidity": "Not enough liquidity for autotrade",
+                 portfolio.asset: f"Not enough {portfolio.asset} for autotrade"}.get(e.resource, f"{e} for autotrade")
+        return jsonify({"error": error}), 400
+
+    verb = "Auto-bought" if trade_type == "buy" else "Auto-sold"
+    message = f"{verb} {round(quantity,2)} {portfolio.asset} at ${asset_price}"
     # Record the autotrade in the trade log.
-    log_entry = {
-        "id": str(uuid.uuid4()),
-        "trade_type": trade_type,
-        "amount": amount,
-        "source": "Auto",
-        "timestamp": time.strftime("%H:%M:%S")
-    }
-    trade_log.insert(0, log_entry)
+    log_entry = log_trade(trade_type, amount, "Auto")
+    return jsonify({"message": message, "portfolio": portfolio.snapshot(), "log": log_entry})
+
+@app.route('/api/trades', methods=['GET'])
+def get_trades():
+    """
+    Page through the trade log, newest first: ?limit=N (default 50) and ?before=<seq>,
+    the next_before cursor returned by the previous page.
+    """
+    try:
+        limit, before = parse_trades_page()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    trades, next_before = trade_log.page(limit, before)
+    return jsonify({"trades": trades, "next_before": next_before})
+
+def parse_trades_page():
+    """Return (limit, before) from the query string of a trade log page, or raise ValueError."""
+    try:
+        limit = min(int(request.args.get('limit', 50)), MAX_TRADES_PAGE)
+        before = request.args.get('before')
+        before = None if before is None else int(before)
+    except ValueError:
+        raise ValueError("limit and before must be integers")
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return limit, before
+
+def mark_asset_price():
+    """
+    Give the account store the current price of the traded asset. Returns a 503
+    response if there is no price recent enough (see trade_price), otherwise None.
+    """
+    asset_price, error = trade_price()
+    if error:
+        return error
+    accounts.set_price(portfolio.asset, asset_price)
+    return None
 
-    return jsonify({"message": message, "portfolio": portfolio, "log": log_entry})
+def rounded_account(account):
+    account["liquidity"] = round(account["liquidity"], 2)
+    account["total_value"] = round(account["total_value"], 2)
+    account["pnl"] = round(account["pnl"], 2)
+    return account
+
+@app.route('/api/accounts', methods=['POST'])
+def create_accounts():
+    """
+    Open simulated trader accounts. Request JSON (all optional):
+    - count: how many accounts to open (default 1)
+    - liquidity: starting USD cash of each (default 100000)
+    - assets: starting quantity per asset symbol (default {"TOKEN": 5000}).
+    Returns the new account ids as the range [first_id, first_id + count).
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        count = int(data.get("count", 1))
+        liquidity = float(data.get("liquidity", 100000.0))
+        assets = data.get("assets", {portfolio.asset: 5000})
+        assets = {str(asset): float(quantity) for asset, quantity in assets.items()}
+    except (AttributeError, TypeError, ValueError):
+        return jsonify({"error": "Invalid account"}), 400
+    if not 1 <= count <= MAX_ACCOUNTS_PER_REQUEST:
+        return jsonify({"error": f"count must be between 1 and {MAX_ACCOUNTS_PER_REQUEST}"}), 400
+    if liquidity < 0 or any(quantity < 0 for quantity in assets.values()):
+        return jsonify({"error": "Balances cannot be negative"}), 400
+
+    error = mark_asset_price()
+    if error:
+        return error
+    ids = accounts.create_accounts(count, liquidity, assets)
+    return jsonify({"first_id": ids[0], "count": count}), 201
+
+@app.route('/api/accounts', methods=['GET'])
+def list_accounts():
+    """
+    Revalue every account at the current prices and return the totals plus one page of
+    accounts by id: ?offset=N (default 0) and ?limit=N (default 100).
+    """
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = min(int(request.args.get('limit', 100)), MAX_ACCOUNTS_PAGE)
+    except ValueError:
+        return jsonify({"error": "offset and limit must be integers"}), 400
+    if offset < 0 or limit < 0:
+        return jsonify({"error": "offset and limit cannot be negative"}), 400
+
+    error = mark_asset_price()
+    if error:
+        return error
+    values, pnls = accounts.mark_to_market()
+    page = range(offset, min(offset + limit, len(values)))
+    return jsonify({
+        "count": len(values),
+        "prices": accounts.prices(),
+        "total_value": round(column_sum(values), 2),
+        "total_pnl": round(column_sum(pnls), 2),
+        "accounts": [{"id": account_id,
+                      "total_value": round(float(values[account_id]), 2),
+                      "pnl": round(float(pnls[account_id]), 2)} for account_id in page]
+    })
+
+@app.route('/api/accounts/<int:account_id>', methods=['GET'])
+def get_account(account_id):
+    if account_id not in accounts:
+        return jsonify({"error": "Account not found"}), 404
+    error = mark_asset_price()
+    if error:
+        return error
+    return jsonify(rounded_account(accounts.account(account_id)))
+
+@app.route('/api/accounts/<int:account_id>/trade', methods=['POST'])
+def account_trade(account_id):
+    """
+    Trade for one account. Request JSON: type ("buy" or "sell"), amount (USD) and
+    optionally asset (default TOKEN), traded at that asset's current price.
+    """
+    if account_id not in accounts:
+        return jsonify({"error": "Account not found"}), 404
+    data = request.get_json(silent=True)
+    try:
+        trade_type, amount = parse_trade(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    asset = data.get("asset", portfolio.asset)
+    if not isinstance(asset, str):
+        return jsonify({"error": "Invalid asset"}), 400
+
+    error = mark_asset_price()
+    if error:
+        return error
+    try:
+        entry = accounts.trade(account_id, trade_type, asset, amount, accounts.prices().get(asset, 0.0))
+    except TradeRejected as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"trade": entry, "account": rounded_account(accounts.account(account_id))})
+
+@app.route('/api/accounts/trades', methods=['POST'])
+def account_trades_batch():
+    """
+    Apply a JSON array of {"account", "type", "amount", "asset"} trades in order, all at
+    the same prices. The response has one result per trade: the trade or {"error"}.
+    """
+    items = request.get_json(silent=True)
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty JSON array of trades"}), 400
+
+    results = [None] * len(items)
+    positions = []
+    trades = []
+    for i, data in enumerate(items):
+        try:
+            trade_type, amount = parse_trade(data)
+            account_id = int(data.get("account"))
+        except (TypeError, ValueError):
+            results[i] = {"error": "Invalid trade"}
+            continue
+        asset = data.get("asset", portfolio.asset)
+        if not isinstance(asset, str):
+            results[i] = {"error": "Invalid asset"}
+            continue
+        trades.append((account_id, trade_type, asset, amount))
+        positions.append(i)
+
+    error = mark_asset_price()
+    if error:
+        return error
+    for i, result in zip(positions, accounts.trade_many(trades)):
+        results[i] = result
+    applied = sum(1 for result in results if "error" not in result)
+    return jsonify({"applied": applied, "failed": len(items) - applied, "results": results})
+
+@app.route('/api/accounts/<int:account_id>/trades', methods=['GET'])
+def get_account_trades(account_id):
+    """Page through one account's trade log, like GET /api/trades."""
+    if account_id not in accounts:
+        return jsonify({"error": "Account not found"}), 404
+    try:
+        limit, before = parse_trades_page()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    trades, next_before = accounts.log(account_id).page(limit, before)
+    return jsonify({"trades": trades, "next_before": next_before})
+
+@app.route('/api/assets', methods=['POST'])
+def set_asset_price():
+    """
+    Register an asset the accounts can hold, or update its price. Request JSON: asset
+    and price (USD). The price of TOKEN always comes from the token service.
+    """
+    data = request.get_json(silent=True) or {}
+    asset = data.get("asset")
+    try:
+        price = float(data.get("price"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid price"}), 400
+    if not isinstance(asset, str) or not asset or asset == portfolio.asset:
+        return jsonify({"error": "Invalid asset"}), 400
+    if not price > 0:
+        return jsonify({"error": "Price must be positive"}), 400
+    accounts.set_price(asset, price)
+    return jsonify({"prices": accounts.prices()})
 
 @app.route('/api/watchdog', methods=['GET'])
 def watchdog_status():
@@ -175,6 +467,11 @@ def toggle_watchdog():
 def index():
     return render_template('index.html')
 
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Monitoring counters: HTTP connection reuse towards the other services."""
+    return jsonify({'http': http_client.stats()}), 200
+
 if __name__ == '__main__':
     # Run on port 5004.
     app.run(port=5004, debug=True)